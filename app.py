@@ -1,18 +1,31 @@
 import os
+from itertools import islice
+from typing import Optional
 
 import streamlit as st
 from dotenv import load_dotenv
 
+from utils.cache import LLMCache, ProductCache, SearchCache
 from utils.data import OpenFoodFactsAPI
+from utils.store import LocalProductStore
+from utils.search_index import SearchIndex
+from utils.autocomplete import Autocomplete
+from utils.barcode import BARCODE_LENGTHS, BarcodeIndex, is_valid
+from utils.category_index import CategoryIndex
+from utils.nutrient_knn import NutrientKNN
 from utils.charts import (
     create_comparison_chart,
     create_nutriscore_gauge,
     create_nutriments_pie,
 )
 from utils.chatbot import NutriChatbot
+from utils.semantic_cache import SemanticCache
 
 load_dotenv()
 
+RESULTS_PER_PAGE = 15
+MAX_SEARCH_RESULTS = 300
+
 st.set_page_config(
     page_title="🥗 NutriScan",
     page_icon="🥗",
@@ -662,7 +675,84 @@ st.markdown("""
 </script>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def init_data_layer() -> None:
+    """Configure une seule fois par process les caches partagés du client OpenFoodFacts"""
+    cache_dir = os.getenv("NUTRISCAN_CACHE_DIR", ".cache")
+    settings = {
+        "PRODUCT_CACHE": ProductCache(os.path.join(cache_dir, "products.sqlite")),
+        "SEARCH_CACHE": SearchCache(),
+    }
+
+    # Miroir local OpenFoodFacts (python -m utils.store ingest ...), si présent
+    local_db = os.getenv("NUTRISCAN_LOCAL_DB", os.path.join(cache_dir, "off.duckdb"))
+    data_source = os.getenv("NUTRISCAN_DATA_SOURCE", "api").lower()
+    if data_source != "api" and os.path.exists(local_db):
+        settings["DATA_SOURCE"] = data_source
+        settings["LOCAL_STORE"] = LocalProductStore(local_db, read_only=True)
+
+        # Index BM25 (python -m utils.store index): recherche locale classée par pertinence
+        search_index = os.getenv("NUTRISCAN_SEARCH_INDEX", os.path.join(cache_dir, "search_index.npz"))
+        if os.path.exists(search_index):
+            settings["LOCAL_STORE"].search_index = SearchIndex.load(search_index)
+
+    OpenFoodFactsAPI.configure(**settings)
+
+@st.cache_resource
+def load_llm_cache() -> LLMCache:
+    """Cache des réponses LLM (analyses, alternatives), partagé par toutes les sessions du process"""
+    cache_dir = os.getenv("NUTRISCAN_CACHE_DIR", ".cache")
+    ttl = float(os.getenv("NUTRISCAN_LLM_CACHE_TTL", 30 * 24 * 3600))
+    return LLMCache(os.path.join(cache_dir, "llm.sqlite"), ttl=ttl)
+
+@st.cache_resource
+def load_semantic_cache() -> SemanticCache:
+    """Réponses aux premières questions du chat, retrouvées par similarité, partagées par toutes les sessions"""
+    return SemanticCache(threshold=float(os.getenv("NUTRISCAN_SEMANTIC_THRESHOLD", 0.9)))
+
+@st.cache_resource
+def load_barcode_index() -> Optional[BarcodeIndex]:
+    """Index des codes-barres du miroir (python -m utils.store index), None s'il n'a pas été construit"""
+    path = os.getenv("NUTRISCAN_BARCODE_INDEX", os.path.join(os.getenv("NUTRISCAN_CACHE_DIR", ".cache"), "barcodes.npz"))
+    return BarcodeIndex.load(path) if os.path.exists(path) else None
+
+@st.cache_resource
+def load_category_index() -> Optional[CategoryIndex]:
+    """Index catégorie -> meilleurs produits (python -m utils.store index), mis à jour par refresh_category_index"""
+    path = os.getenv("NUTRISCAN_CATEGORY_INDEX", os.path.join(os.getenv("NUTRISCAN_CACHE_DIR", ".cache"), "categories.npz"))
+    if OpenFoodFactsAPI.LOCAL_STORE is None or not os.path.exists(path):
+        return None
+    return CategoryIndex.load(path)
+
+@st.cache_data(ttl=60)
+def store_version() -> tuple:
+    """Version du miroir (watermark, suppressions), relue au plus une fois par minute"""
+    return OpenFoodFactsAPI.LOCAL_STORE.version()
+
+def refresh_category_index(index: Optional[CategoryIndex]) -> None:
+    """Applique à l'index les produits modifiés ou supprimés par un sync depuis le dernier passage"""
+    if index is not None:
+        index.refresh_if_changed(OpenFoodFactsAPI.LOCAL_STORE, store_version())
+
+@st.cache_resource
+def load_knn() -> Optional[NutrientKNN]:
+    """Matrice des profils nutritionnels (python -m utils.store index), None si elle n'a pas été construite"""
+    path = os.getenv("NUTRISCAN_KNN_INDEX", os.path.join(os.getenv("NUTRISCAN_CACHE_DIR", ".cache"), "nutrients"))
+    return NutrientKNN.load(path) if os.path.exists(path) else None
+
+@st.cache_resource
+def load_autocomplete() -> Optional[Autocomplete]:
+    """Index d'autocomplétion (python -m utils.store index), None s'il n'a pas été construit"""
+    path = os.getenv("NUTRISCAN_AUTOCOMPLETE", os.path.join(os.getenv("NUTRISCAN_CACHE_DIR", ".cache"), "autocomplete.npz"))
+    return Autocomplete.load(path) if os.path.exists(path) else None
+
+init_data_layer()
 api = OpenFoodFactsAPI()
+autocomplete = load_autocomplete()
+barcode_index = load_barcode_index()
+category_index = load_category_index()
+refresh_category_index(category_index)
+knn = load_knn()
 
 st.sidebar.markdown("""
 <div style="text-align: center; padding: 2rem 1rem 1.5rem 1rem; background: linear-gradient(135deg, rgba(34, 197, 94, 0.1) 0%, transparent 100%); border-radius: 16px; margin-bottom: 1rem; border: 2px solid #243244;">
@@ -724,9 +814,22 @@ st.sidebar.markdown(f"""
 """, unsafe_allow_html=True)
 
 if "chatbot" not in st.session_state or st.session_state.get("provider") != selected_provider:
-    st.session_state.chatbot = NutriChatbot(provider=selected_provider)
+    st.session_state.chatbot = NutriChatbot(
+        provider=selected_provider, cache=load_llm_cache(), semantic_cache=load_semantic_cache()
+    )
     st.session_state.provider = selected_provider
 
+llm_stats = load_llm_cache().stats()
+st.sidebar.caption(
+    f"🗄️ Cache IA : {llm_stats['entries']:,} réponses, "
+    f"{llm_stats['hit_rate']:.0%} servies sans appel au modèle ({llm_stats['hits']:,})"
+)
+semantic_stats = load_semantic_cache().stats()
+st.sidebar.caption(
+    f"💬 Questions fréquentes : {semantic_stats['entries']:,} réponses, "
+    f"{semantic_stats['hit_rate']:.0%} retrouvées par similarité"
+)
+
 if "comparison_products" not in st.session_state:
     st.session_state.comparison_products = []
 
@@ -763,19 +866,44 @@ if page == "🔍 Recherche Produit":
     with col1:
         search_query = st.text_input(
             "Nom du produit ou code-barres",
-            placeholder="Ex: Nutella, 3017620422003 🍫"
+            placeholder="Ex: Nutella, 3017620422003 🍫",
+            key="search_query"
         )
     
     with col2:
         search_button = st.button("🔍 Rechercher", type="primary")
-    
+
+    # --- SUGGESTIONS ---
+    def use_suggestion(suggestion: str):
+        st.session_state.search_query = suggestion
+        st.session_state.run_search = True
+
+    if autocomplete is not None and search_query and not search_query.isdigit():
+        suggestions = [s for s in autocomplete.complete(search_query, k=5) if s != search_query]
+        if suggestions:
+            for col, suggestion in zip(st.columns(len(suggestions)), suggestions):
+                col.button(suggestion, key=f"suggestion_{suggestion}", on_click=use_suggestion, args=(suggestion,), width='stretch')
+
     # --- RECHERCHE ---
-    if search_button and search_query:
+    if (search_button or st.session_state.pop("run_search", False)) and search_query:
         with st.spinner("Recherche en cours..."):
-            if search_query.isdigit() and len(search_query) >= 8:
-                products = api.get_product(search_query)
+            # Code-barres partiel ou mal saisi: résolu localement par l'index des codes connus
+            barcodes = barcode_index.resolve(search_query) if barcode_index is not None else []
+            if not barcodes and search_query.isdigit() and len(search_query) >= 8:
+                barcodes = [search_query]
+
+            if barcodes:
+                if len(search_query) in BARCODE_LENGTHS and not is_valid(search_query):
+                    st.info(f"Code-barres {search_query} invalide, codes proches : {', '.join(barcodes)}")
+                found, _ = api.get_products(barcodes)
+                products = [p for p in found if p]
+                st.session_state.search_iterator = None
             else:
-                products = api.search_products(search_query, page_size=15)
+                # Résultats chargés page par page (page suivante préchargée)
+                st.session_state.search_iterator = api.iter_search(
+                    search_query, page_size=RESULTS_PER_PAGE, max_results=MAX_SEARCH_RESULTS, prefetch=1
+                )
+                products = islice(st.session_state.search_iterator, RESULTS_PER_PAGE)
 
             st.session_state.search_results = [api.extract_product_info(p) for p in products]
     
@@ -790,10 +918,19 @@ if page == "🔍 Recherche Produit":
         ]
 
         selected_idx = st.selectbox("Sélectionnez un produit:", range(len(product_names)), format_func=lambda x: product_names[x])
+
+        def load_more_results():
+            more = [api.extract_product_info(p) for p in islice(st.session_state.search_iterator, RESULTS_PER_PAGE)]
+            st.session_state.search_results.extend(more)
+            if len(more) < RESULTS_PER_PAGE:
+                st.session_state.search_iterator = None
+
+        if st.session_state.get("search_iterator") is not None and products and len(products) % RESULTS_PER_PAGE == 0:
+            st.button("⬇️ Charger plus de résultats", on_click=load_more_results)
         
         if selected_idx is not None:
-            selected_product = products[selected_idx]
-            product_info = api.extract_product_info(selected_product)
+            # Les résultats sont déjà extraits lors de la recherche
+            product_info = products[selected_idx]
             
             col1, col2 = st.columns([1, 2])
             
@@ -841,13 +978,22 @@ if page == "🔍 Recherche Produit":
                     if not api_key_ok:
                         st.warning("⚠️ Clé API manquante ou invalide pour le fournisseur sélectionné.")
                     else:
-                        with st.spinner("Génération de l'analyse..."):
-                            analysis = st.session_state.chatbot.analyze_product(product_info)
-                            st.markdown(analysis)
+                        # Analyse en cache servie immédiatement; "Régénérer" interroge le modèle et remplace l'entrée
+                        regenerate = st.button("🔄 Régénérer", key=f"regenerate_{product_info['code']}")
+                        # Affichage au fil de la génération: le premier mot arrive sans attendre la réponse complète
+                        st.write_stream(
+                            st.session_state.chatbot.analyze_product_stream(product_info, use_cache=not regenerate)
+                        )
                 
                 with st.expander("📋 Informations détaillées"):
                     st.write("**Catégories:**", product_info["categories"])
                     st.write("**Allergènes:**", product_info["allergens"])
+                    if product_info["detected_allergens"]:
+                        st.write("**Allergènes détectés:**", ", ".join(product_info["detected_allergens"]))
+                    if product_info["additives"]:
+                        st.write("**Additifs:**", ", ".join(product_info["additives"]))
+                    if product_info["ultra_processing"]:
+                        st.write("**Marqueurs d'ultra-transformation:**", ", ".join(product_info["ultra_processing"]))
                     st.write("**Ingrédients:**", product_info["ingredients"])
             
             st.markdown("""
@@ -876,28 +1022,35 @@ if page == "🔍 Recherche Produit":
             """, unsafe_allow_html=True)
             
             with st.spinner("🔍 Recherche d'alternatives..."):
-                category = product_info["categories"].split(",")[0] if product_info["categories"] else product_info["product_name"].split()[0]
-                alternatives = api.search_products(category, page_size=5)
-                
-                alternatives = [
-                    api.extract_product_info(alt) for alt in alternatives
-                    if alt.get("nutriscore_grade", "Z") < product_info["nutriscore_grade"]
-                ][:3]
-                
-                if alternatives:
-                    suggestion_text = st.session_state.chatbot.suggest_alternatives(
-                        product_info, alternatives
-                    )
-                    st.info(suggestion_text)
-                    
-                    cols = st.columns(len(alternatives))
-                    for idx, alt in enumerate(alternatives):
-                        with cols[idx]:
-                            st.image(alt["image_url"] if alt["image_url"] else "https://via.placeholder.com/150", width=150)
-                            st.write(f"**{alt['product_name'][:30]}**")
-                            st.write(f"Nutri-Score: **{alt['nutriscore_grade']}**")
+                if knn is not None or category_index is not None:
+                    # Profil nutritionnel le plus proche d'abord, complété par les meilleurs de la catégorie
+                    codes = knn.similar_better(product_info, k=3) if knn is not None else []
+                    if len(codes) < 3 and category_index is not None:
+                        codes += [
+                            c for c in category_index.better_products(
+                                product_info["categories"], product_info["nutriscore_grade"], limit=3
+                            ) if c not in codes
+                        ][:3 - len(codes)]
+                    found, _ = api.get_products(codes)
+                    alternatives = [api.extract_product_info(p) for p in found if p]
                 else:
-                    st.warning("Aucune alternative trouvée avec un meilleur Nutri-Score")
+                    # Sans index: recherche dans la catégorie (session HTTP persistante et cache des recherches)
+                    candidates = api.search_products(api.alternatives_query(product_info), page_size=5)
+                    alternatives = api.better_alternatives(candidates, product_info["nutriscore_grade"], limit=3)
+
+            if alternatives:
+                # Alternatives affichées tout de suite, l'explication IA s'écrit ensuite au fil de la génération
+                cols = st.columns(len(alternatives))
+                for idx, alt in enumerate(alternatives):
+                    with cols[idx]:
+                        st.image(alt["image_url"] if alt["image_url"] else "https://via.placeholder.com/150", width=150)
+                        st.write(f"**{alt['product_name'][:30]}**")
+                        st.write(f"Nutri-Score: **{alt['nutriscore_grade']}**")
+
+                with st.container(border=True):
+                    st.write_stream(st.session_state.chatbot.suggest_alternatives_stream(product_info, alternatives))
+            else:
+                st.warning("Aucune alternative trouvée avec un meilleur Nutri-Score")
     else:
         st.info("🔍 Utilisez la barre de recherche ci-dessus pour trouver des produits alimentaires et analyser leurs informations nutritionnelles.")
 
@@ -983,19 +1136,26 @@ elif page == "⚖️ Comparateur":
         col1, col2 = st.columns(2)
         with col1:
             if st.button("🤖 Analyse comparative IA", type="primary", width='stretch'):
-                with st.spinner("🧠 Génération de l'analyse..."):
-                    comparison_text = "\n".join([
-                        f"- {p['product_name']} (Nutri-Score {p['nutriscore_grade']}, NOVA {p['nova_group']})"
-                        for p in st.session_state.comparison_products
-                    ])
-                    
-                    prompt = f"Compare ces produits et dis lequel est le meilleur choix nutritionnel:\n{comparison_text}"
-                    analysis = st.session_state.chatbot.chat(prompt)
-                    st.markdown(f"""
+                products = st.session_state.comparison_products
+                # Une carte par produit, remplie dès que son analyse arrive (en parallèle, les analyses en cache d'abord)
+                placeholders = []
+                for product in products:
+                    placeholders.append(st.empty())
+                    placeholders[-1].info(f"⏳ Analyse de {product['product_name'][:40]}...")
+                analyses = {}
+                for idx, analysis in st.session_state.chatbot.analyze_products(products):
+                    analyses[idx] = analysis
+                    placeholders[idx].markdown(f"""
 <div style="background: linear-gradient(135deg, rgba(34, 197, 94, 0.1) 0%, #1E293B 100%); padding: 1.5rem; border-radius: 12px; border-left: 4px solid #22C55E; margin-top: 1rem;">
+    <p style="margin: 0 0 0.5rem 0; color: #22C55E; font-weight: 700;">{products[idx]['product_name']} (Nutri-Score {products[idx]['nutriscore_grade']}, NOVA {products[idx]['nova_group']})</p>
     <p style="margin: 0; color: #E5E7EB; line-height: 1.6;">{analysis}</p>
 </div>
                     """, unsafe_allow_html=True)
+                # Verdict final: un appel court sur les analyses déjà reçues
+                if len(products) > 1:
+                    with st.container(border=True):
+                        st.write("**🏆 Synthèse**")
+                        st.write_stream(st.session_state.chatbot.compare_products_stream(products, analyses))
         
         with col2:
             if st.button("🗑️ Vider le comparateur", width='stretch'):
@@ -1018,7 +1178,8 @@ elif page == "💬 Chatbot Nutrition":
         with st.chat_message(message["role"]):
             st.write(message["content"])
     
-    user_input = st.chat_input("Posez votre question...")
+    # Question saisie, ou question suggérée cliquée dans la barre latérale au passage précédent
+    user_input = st.chat_input("Posez votre question...") or st.session_state.pop("pending_question", None)
     
     if user_input:
         st.session_state.chat_history.append({"role": "user", "content": user_input})
@@ -1026,10 +1187,8 @@ elif page == "💬 Chatbot Nutrition":
             st.write(user_input)
         
         with st.chat_message("assistant"):
-            with st.spinner("Réflexion..."):
-                response = st.session_state.chatbot.chat(user_input)
-                st.write(response)
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
+            response = st.write_stream(st.session_state.chatbot.chat_stream(user_input))
+            st.session_state.chat_history.append({"role": "assistant", "content": response})
     
     st.sidebar.markdown("""
     <div style="padding: 0.75rem 1rem; background: linear-gradient(135deg, #1E293B 0%, #16213A 100%); border-radius: 12px; margin-bottom: 1rem; border: 2px solid #243244;">
@@ -1047,10 +1206,8 @@ elif page == "💬 Chatbot Nutrition":
     
     for emoji, suggestion in suggestions:
         if st.sidebar.button(f"{emoji} {suggestion}", width=True):
-            st.session_state.chat_history.append({"role": "user", "content": suggestion})
-            with st.spinner("Réflexion..."):
-                response = st.session_state.chatbot.chat(suggestion)
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
+            # Répondue (en streaming) dans la conversation au prochain passage
+            st.session_state.pending_question = suggestion
             st.rerun()
 
 st.sidebar.markdown("<div style='margin: 2rem 0 1.5rem 0; border-top: 2px solid #243244;'></div>", unsafe_allow_html=True)
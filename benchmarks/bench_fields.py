@@ -0,0 +1,127 @@
+"""Benchmark: taille et temps de parsing JSON avec/sans projection fields=
+
+Usage:
+    uv run python -m benchmarks.bench_fields           # produits synthétiques (hors ligne)
+    uv run python -m benchmarks.bench_fields --live    # vraie API OpenFoodFacts
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+from utils.data import OpenFoodFactsAPI
+
+LIVE_BARCODES = ["3017620422003", "3274080005003", "5449000000996", "3228857000166", "7622210449283"]
+
+
+def synthetic_full_product(i: int) -> Dict:
+    """Produit au format OFF complet: quelques champs utiles noyés dans les sous-objets images/emballages/écoscore"""
+    images = {
+        f"{kind}_{lang}": {
+            "imgid": str(n),
+            "rev": str(n + 3),
+            "sizes": {size: {"h": 400, "w": 300} for size in ("100", "200", "400", "full")},
+            "geometry": "0x0-0-0",
+            "angle": "0",
+            "x1": "0", "x2": "0", "y1": "0", "y2": "0",
+        }
+        for n, (kind, lang) in enumerate(
+            (k, l) for k in ("front", "ingredients", "nutrition", "packaging") for l in ("fr", "en", "de", "it", "es")
+        )
+    }
+    nutriments = {}
+    for name in ("energy-kcal", "energy", "fat", "saturated-fat", "carbohydrates", "sugars", "fiber", "proteins", "salt", "sodium"):
+        for suffix, value in (("", 10.0), ("_100g", 10.0), ("_serving", 1.5), ("_value", 10.0), ("_unit", "g")):
+            nutriments[f"{name}{suffix}"] = value
+    ingredients = [
+        {"id": f"en:ingredient-{k}", "text": f"ingrédient {k}", "percent_estimate": 10.0,
+         "percent_min": 0, "percent_max": 100, "vegan": "maybe", "vegetarian": "yes",
+         "ciqual_food_code": "31016", "rank": k}
+        for k in range(12)
+    ]
+    return {
+        "code": f"{3000000000000 + i}",
+        "product_name": f"Produit {i}",
+        "brands": "Marque",
+        "nutriscore_grade": "c",
+        "nova_group": 4,
+        "image_url": f"https://images.openfoodfacts.org/{i}/front_fr.jpg",
+        "ingredients_text": ", ".join(f"ingrédient {k}" for k in range(12)),
+        "ingredients": ingredients,
+        "allergens": "en:nuts",
+        "nutriments": nutriments,
+        "categories": "Snacks, Snacks sucrés, Pâtes à tartiner",
+        "images": images,
+        "selected_images": {kind: {"display": {l: f"https://img/{kind}_{l}.jpg" for l in ("fr", "en", "de")}} for kind in ("front", "ingredients", "nutrition")},
+        "packagings": [{"material": "en:glass", "shape": "en:jar", "recycling": "en:recycle", "number_of_units": 1, "weight_measured": 180}] * 3,
+        "ecoscore_data": {
+            "adjustments": {"origins_of_ingredients": {"aggregated_origins": [{"origin": "en:unknown", "percent": 100}] * 5,
+                                                       "epi_score": 0, "transportation_scores": {c: 0 for c in ("fr", "de", "it", "es", "be", "nl", "uk", "us")}}},
+            "agribalyse": {k: 0.123456 for k in ("co2_agriculture", "co2_consumption", "co2_distribution", "co2_packaging", "co2_processing", "co2_total", "co2_transportation", "ef_agriculture", "ef_total")},
+            "scores": {c: 42 for c in ("fr", "de", "it", "es", "be", "nl", "uk", "us", "world")},
+        },
+        "nutriscore": {year: {"grade": "c", "score": 5, "data": {k: 1.0 for k in ("energy", "sugars", "saturated_fat", "sodium", "fiber", "proteins", "fruits_vegetables_nuts")}} for year in ("2021", "2023")},
+        "categories_tags": ["en:snacks", "en:sweet-snacks", "en:spreads"],
+        "ingredients_analysis_tags": ["en:palm-oil", "en:non-vegan", "en:vegetarian"],
+        "languages_codes": {"fr": 6, "en": 3},
+    }
+
+
+def project(product: Dict) -> Dict:
+    """Même projection que celle demandée à l'API"""
+    return {key: product[key] for key in OpenFoodFactsAPI.FIELDS if key in product}
+
+
+def measure(payloads: List[bytes], repeat: int) -> Dict[str, float]:
+    """Octets totaux et temps moyen de json.loads sur l'ensemble des payloads"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for payload in payloads:
+            json.loads(payload)
+    elapsed = (time.perf_counter() - started) / repeat
+    return {"bytes": sum(len(p) for p in payloads), "parse_ms": elapsed * 1000}
+
+
+def fetch_live() -> Dict[str, List[bytes]]:
+    """Réponses brutes de l'API, complètes et projetées"""
+    session = OpenFoodFactsAPI.get_session()
+    timeout = (OpenFoodFactsAPI.CONNECT_TIMEOUT, OpenFoodFactsAPI.READ_TIMEOUT)
+    full, projected = [], []
+    for barcode in LIVE_BARCODES:
+        url = f"{OpenFoodFactsAPI.BASE_URL}/api/v0/product/{barcode}.json"
+        full.append(session.get(url, timeout=timeout).content)
+        projected.append(session.get(url, params={"fields": OpenFoodFactsAPI.fields_param()}, timeout=timeout).content)
+    return {"full": full, "projected": projected}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="mesurer sur la vraie API")
+    parser.add_argument("--products", type=int, default=200, help="nombre de produits synthétiques")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.live:
+        payloads = fetch_live()
+    else:
+        products = [synthetic_full_product(i) for i in range(args.products)]
+        payloads = {
+            "full": [json.dumps({"status": 1, "product": p}).encode() for p in products],
+            "projected": [json.dumps({"status": 1, "product": project(p)}).encode() for p in products],
+        }
+
+    full = measure(payloads["full"], args.repeat)
+    projected = measure(payloads["projected"], args.repeat)
+
+    print(f"{'':<12}{'octets':>12}{'parse (ms)':>14}")
+    print(f"{'complet':<12}{full['bytes']:>12,}{full['parse_ms']:>14.2f}")
+    print(f"{'projeté':<12}{projected['bytes']:>12,}{projected['parse_ms']:>14.2f}")
+    print(
+        f"réduction: {1 - projected['bytes'] / full['bytes']:.0%} d'octets, "
+        f"{1 - projected['parse_ms'] / full['parse_ms']:.0%} de temps de parsing"
+    )
+
+
+if __name__ == "__main__":
+    main()
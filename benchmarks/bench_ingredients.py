@@ -0,0 +1,48 @@
+"""Benchmark: débit de l'extraction d'additifs, d'allergènes et de marqueurs d'ultra-transformation
+
+Usage:
+    uv run python -m benchmarks.bench_ingredients [--products 20000]
+"""
+
+import argparse
+import random
+import time
+
+from utils.ingredients import IngredientMatcher
+
+WORDS = [
+    "sucre", "huile de palme", "noisettes", "cacao maigre", "lait écrémé en poudre", "lactosérum", "émulsifiant",
+    "lécithines de soja", "vanilline", "farine de blé", "sel", "levure", "E330", "E 471", "arômes naturels",
+    "sirop de glucose-fructose", "amidon modifié", "eau", "tomates", "oignons", "noix de coco", "œufs frais",
+]
+
+
+def synthetic_ingredients(n: int, seed: int = 0) -> list:
+    """Listes d'ingrédients aléatoires de 5 à 25 éléments, toutes différentes"""
+    rng = random.Random(seed)
+    return [
+        ", ".join(rng.choice(WORDS) + f" {rng.randint(1, 60)}%" for _ in range(rng.randint(5, 25)))
+        for _ in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    matcher = IngredientMatcher.default()
+    print(f"compilation : {(time.perf_counter() - started) * 1000:.0f} ms ({len(matcher.transitions):,} états)")
+
+    texts = synthetic_ingredients(args.products)
+    started = time.perf_counter()
+    matcher.extract_many(texts)
+    elapsed = time.perf_counter() - started
+    characters = sum(len(t) for t in texts)
+    print(f"extraction  : {len(texts) / elapsed:,.0f} produits/s ({characters / elapsed / 1e6:.2f} M caractères/s, "
+          f"{characters // len(texts)} caractères en moyenne)")
+
+
+if __name__ == "__main__":
+    main()
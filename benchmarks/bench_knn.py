@@ -0,0 +1,77 @@
+"""Benchmark: latence du kNN nutritionnel (alternatives plus saines) sur un catalogue synthétique
+
+Usage:
+    uv run python -m benchmarks.bench_knn [--products 1000000] [--queries 200]
+"""
+
+import argparse
+import tempfile
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from utils.nutrient_knn import KNN_FIELDS, NutrientKNN
+
+CATEGORIES = [f"Catégorie {i}" for i in range(2000)]
+
+
+def synthetic_products(n: int, seed: int = 0) -> Iterator[Dict]:
+    """Produits aux nutriments aléatoires (10% de valeurs manquantes), Nutri-Score et catégorie aléatoires"""
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(2.0, 5.0, size=(n, len(KNN_FIELDS))).round(1)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    grades = rng.choice(list("abcde"), size=n)
+    categories = rng.zipf(1.5, size=n) % len(CATEGORIES)
+    for i in range(n):
+        yield {
+            "code": f"{2000000000000 + i}",
+            "nutriscore_grade": grades[i],
+            "categories": f"Aliments, {CATEGORIES[categories[i]]}",
+            "nutriments": dict(zip(KNN_FIELDS, values[i].tolist())),
+        }
+
+
+def percentiles(latencies: List[float]) -> str:
+    latencies = sorted(latencies)
+    return f"p50 {latencies[len(latencies) // 2]:.2f} ms, p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    knn = NutrientKNN.build(synthetic_products(args.products))
+    print(f"construction : {time.perf_counter() - started:.1f}s pour {len(knn):,} produits ({knn.matrix.nbytes / 1e6:.0f} Mo)")
+
+    # Requêtes sur l'index projeté en mémoire, comme dans l'application
+    directory = tempfile.TemporaryDirectory()
+    knn.save(directory.name)
+    started = time.perf_counter()
+    knn = NutrientKNN.load(directory.name)
+    print(f"chargement   : {(time.perf_counter() - started) * 1000:.1f} ms (np.memmap)")
+
+    rng = np.random.default_rng(1)
+    queries = [
+        {
+            "code": knn.codes[row].decode(),
+            "nutriscore_grade": "E",  # pire cas: tous les produits A-D sont candidats
+            "categories": f"Aliments, {knn.category_names[knn.category_ids[row]]}",
+        }
+        for row in rng.integers(0, len(knn), size=args.queries)
+    ]
+
+    for label, same_category in (("toutes catégories", False), ("même catégorie", True)):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            knn.similar_better(query, k=3, same_category=same_category)
+            latencies.append((time.perf_counter() - started) * 1000)
+        print(f"{label:<18}: {percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
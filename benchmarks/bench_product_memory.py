@@ -0,0 +1,45 @@
+"""Benchmark: mémoire occupée par N fiches produit (dict historique vs ProductInfo)
+
+Usage:
+    uv run python -m benchmarks.bench_product_memory [--products 1000]
+"""
+
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.bench_fields import project, synthetic_full_product
+from utils.data import OpenFoodFactsAPI
+
+
+def as_dict(product: Dict) -> Dict:
+    """Ancien format: dict complet avec le dict nutriments brut"""
+    return OpenFoodFactsAPI.extract_product_info(product).to_dict() | {"nutriments": dict(product["nutriments"])}
+
+
+def measure(build: Callable[[Dict], object], products: List[Dict]) -> int:
+    """Octets alloués et conservés pour construire toutes les fiches"""
+    tracemalloc.start()
+    kept = [build(p) for p in products]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    args = parser.parse_args()
+
+    products = [project(synthetic_full_product(i)) for i in range(args.products)]
+    legacy = measure(as_dict, products)
+    compact = measure(OpenFoodFactsAPI.extract_product_info, products)
+
+    print(f"dict        : {legacy / args.products:>8.0f} octets/produit")
+    print(f"ProductInfo : {compact / args.products:>8.0f} octets/produit")
+    print(f"réduction   : {1 - compact / legacy:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark: latence de l'index BM25 sur un catalogue synthétique
+
+Usage:
+    uv run python -m benchmarks.bench_search_index [--products 1000000] [--queries 200]
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, Iterator
+
+import numpy as np
+
+from utils.search_index import SearchIndex
+
+WORDS = (
+    "yaourt nature fraise chocolat noir lait biscuit sablé beurre pâte tartiner noisette céréales "
+    "avoine miel compote pomme poire jus orange eau gazeuse fromage emmental comté jambon poulet "
+    "riz basmati pâtes complètes sauce tomate basilic huile olive vinaigre moutarde confiture abricot "
+    "chips sel crème dessert vanille glace café thé vert soupe légumes pain mie brioche"
+).split()
+BRANDS = ("Danone", "Nestlé", "Carrefour", "Lu", "Bonne Maman", "Président", "Fleury Michon", "Panzani", "Herta", "Andros")
+CATEGORIES = ("Produits laitiers", "Snacks sucrés", "Boissons", "Épicerie", "Plats préparés", "Desserts", "Céréales")
+# Vocabulaire de fond (variétés, recettes, gammes): la plupart des termes réels sont rares
+RARE_WORDS = [f"gamme{i}" for i in range(50_000)]
+
+
+def synthetic_products(n: int, seed: int = 0) -> Iterator[Dict]:
+    """Produits: 1 à 3 mots courants tirés selon une loi de Zipf + 1 ou 2 mots rares"""
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.3, size=(n, 3)) - 1, len(WORDS) - 1)
+    lengths = rng.integers(1, 4, size=n)
+    rare = rng.integers(0, len(RARE_WORDS), size=(n, 2))
+    for i in range(n):
+        words = [WORDS[r] for r in ranks[i, : lengths[i]]] + [RARE_WORDS[r] for r in rare[i, : 1 + i % 2]]
+        yield {
+            "code": f"{2000000000000 + i}",
+            "product_name": " ".join(words),
+            "brands": BRANDS[i % len(BRANDS)],
+            "categories": CATEGORIES[i % len(CATEGORIES)],
+            "unique_scans_n": int(rng.integers(0, 10_000)),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = SearchIndex.build(synthetic_products(args.products))
+    print(f"construction : {time.perf_counter() - started:.1f}s pour {len(index):,} produits, {len(index.terms):,} termes")
+
+    rng = random.Random(1)
+    # Requêtes typiques: un mot courant, éventuellement précisé par un mot rare ou un second mot courant
+    queries = [
+        " ".join([rng.choice(WORDS), rng.choice((rng.choice(RARE_WORDS), rng.choice(WORDS), ""))])
+        for _ in range(args.queries)
+    ]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, page_size=20)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    print(f"recherche    : p50 {latencies[len(latencies) // 2]:.2f} ms, p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Tests unitaires pour utils/async_data.py (contre un serveur HTTP local)"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+from utils.async_data import AsyncOpenFoodFactsAPI
+from utils.data import OpenFoodFactsAPI
+
+
+class StubOFFHandler(BaseHTTPRequestHandler):
+    """Imite les endpoints OpenFoodFacts utilisés par le client"""
+
+    flaky_calls = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if url.path == "/cgi/search.pl":
+            params = parse_qs(url.query)
+            query = params["search_terms"][0]
+            size = int(params["page_size"][0])
+            products = [{"code": str(i), "product_name": f"{query} {i}", "nutriscore_grade": "a"} for i in range(size)]
+            self._send(200, {"products": products})
+        elif url.path == "/api/v0/product/slow.json":
+            time.sleep(2)
+            try:
+                self._send(200, {"status": 0})
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client parti après annulation
+        elif url.path == "/api/v0/product/flaky.json":
+            StubOFFHandler.flaky_calls += 1
+            if StubOFFHandler.flaky_calls == 1:
+                self._send(503, {})
+            else:
+                self._send(200, {"status": 1, "product": {"code": "flaky"}})
+        elif url.path == "/api/v0/product/404.json":
+            self._send(200, {"status": 0})
+        elif url.path == "/api/v0/product/500.json":
+            self._send(500, {})
+        elif url.path.startswith("/api/v0/product/"):
+            barcode = url.path.rsplit("/", 1)[-1].removesuffix(".json")
+            fields = parse_qs(url.query).get("fields", [""])[0]
+            self._send(200, {"status": 1, "product": {"code": barcode, "product_name": "Nutella", "fields": fields}})
+        else:
+            self._send(404, {})
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    """Serveur HTTP local démarré pour le module"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOFFHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def run(coro_factory, base_url):
+    """Exécute une coroutine avec un client ouvert sur le serveur local"""
+    async def _main():
+        async with AsyncOpenFoodFactsAPI(base_url=base_url, max_connections=4) as client:
+            return await coro_factory(client)
+    return asyncio.run(_main())
+
+
+class TestAsyncOpenFoodFactsAPI:
+    """Tests pour le client asynchrone"""
+
+    def test_search_products(self, stub_server):
+        """Recherche de produits"""
+        results = run(lambda c: c.search_products("nutella", page_size=3), stub_server)
+
+        assert len(results) == 3
+        assert results[0]["product_name"] == "nutella 0"
+
+    def test_get_product(self, stub_server):
+        """Récupération par code-barres"""
+        product = run(lambda c: c.get_product("3017620422003"), stub_server)
+
+        assert product["code"] == "3017620422003"
+
+    def test_get_product_not_found(self, stub_server):
+        """Produit introuvable"""
+        assert run(lambda c: c.get_product("404"), stub_server) is None
+
+    def test_get_product_server_error(self, stub_server):
+        """Erreur serveur persistante: None après les retries"""
+        with patch.object(OpenFoodFactsAPI, "BACKOFF_FACTOR", 0), patch.object(OpenFoodFactsAPI, "BACKOFF_JITTER", 0):
+            assert run(lambda c: c.get_product("500"), stub_server) is None
+
+    def test_retry_on_503(self, stub_server):
+        """Un 503 transitoire est rejoué"""
+        StubOFFHandler.flaky_calls = 0
+        with patch.object(OpenFoodFactsAPI, "BACKOFF_FACTOR", 0), patch.object(OpenFoodFactsAPI, "BACKOFF_JITTER", 0):
+            product = run(lambda c: c.get_product("flaky"), stub_server)
+
+        assert product == {"code": "flaky"}
+        assert StubOFFHandler.flaky_calls == 2
+
+    def test_get_products_batch(self, stub_server):
+        """Lot: ordre d'entrée conservé et erreurs par code-barres"""
+        products, errors = run(lambda c: c.get_products(["1", "404", "2", "1"]), stub_server)
+
+        assert [p["code"] if p else None for p in products] == ["1", None, "2", "1"]
+        assert errors == {"404": "Produit introuvable"}
+
+    def test_extract_product_info(self):
+        """Même extraction que le client synchrone"""
+        raw = {"code": "1", "product_name": "Nutella", "nutriscore_grade": "e"}
+        assert AsyncOpenFoodFactsAPI.extract_product_info(raw) == OpenFoodFactsAPI.extract_product_info(raw)
+
+    def test_extra_fields(self, stub_server):
+        """Champs supplémentaires demandés en plus des champs par défaut, sans passer par le cache produit"""
+        with patch.object(OpenFoodFactsAPI, "PRODUCT_CACHE") as mock_cache:
+            product = run(lambda c: c.get_product("3017620422003", extra_fields=["packaging"]), stub_server)
+
+        assert product["fields"].split(",")[-1] == "packaging"
+        assert "product_name" in product["fields"]
+        mock_cache.get.assert_not_called()
+        mock_cache.set.assert_not_called()
+
+    def test_retry_on_connect_error(self, stub_server):
+        """Une erreur de connexion transitoire est rejouée, comme par la session synchrone"""
+        async def flaky_connect(client):
+            real_get = client._client.get
+            calls = []
+
+            async def get(*args, **kwargs):
+                calls.append(args)
+                if len(calls) == 1:
+                    raise httpx.ConnectError("connexion refusée")
+                return await real_get(*args, **kwargs)
+
+            client._client.get = get
+            return await client.get_product("3017620422003"), len(calls)
+
+        with patch.object(OpenFoodFactsAPI, "BACKOFF_FACTOR", 0), patch.object(OpenFoodFactsAPI, "BACKOFF_JITTER", 0):
+            product, calls = run(flaky_connect, stub_server)
+
+        assert product["code"] == "3017620422003"
+        assert calls == 2
+
+    def test_connect_error_gives_up(self):
+        """Serveur injoignable: None après MAX_RETRIES tentatives supplémentaires"""
+        with patch.object(OpenFoodFactsAPI, "BACKOFF_FACTOR", 0), patch.object(OpenFoodFactsAPI, "BACKOFF_JITTER", 0), \
+                patch.object(OpenFoodFactsAPI, "PRODUCT_CACHE", None), \
+                patch.object(httpx.AsyncClient, "get", side_effect=httpx.ConnectError("refusée")) as mock_get:
+            assert run(lambda c: c.get_product("3017620422003"), "http://127.0.0.1:9") is None
+
+        assert mock_get.call_count == OpenFoodFactsAPI.MAX_RETRIES + 1
+
+    def test_cancellation(self, stub_server):
+        """Une requête lente est annulée par le timeout appelant"""
+        async def slow(client):
+            async with asyncio.timeout(0.2):
+                await client.get_product("slow")
+
+        started = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            run(slow, stub_server)
+        assert time.perf_counter() - started < 1.5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,87 @@
+"""Tests unitaires pour utils/autocomplete.py"""
+
+import pytest
+from utils.autocomplete import Autocomplete, build_from_store
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+
+PRODUCTS = [
+    {"code": "1", "product_name": "Pâte à tartiner aux noisettes", "brands": "Nutella", "unique_scans_n": 5000},
+    {"code": "2", "product_name": "Nocciolata", "brands": "Rigoni di Asiago", "unique_scans_n": 800},
+    {"code": "3", "product_name": "Yaourt nature", "brands": "Danone", "unique_scans_n": 3000},
+    {"code": "4", "product_name": "Yaourt à la fraise", "brands": "Danone", "unique_scans_n": 100},
+    {"code": "5", "product_name": "Yaourt nature", "brands": "Carrefour", "unique_scans_n": 9000},
+    {"code": "6", "product_name": "yaourt   NATURE", "brands": "Carrefour, Carrefour Bio", "unique_scans_n": 0},
+    {"code": "7", "product_name": "Nutella B-ready", "brands": "Nutella, Ferrero", "unique_scans_n": 1200},
+]
+
+
+@pytest.fixture(params=[1024, 1], ids=["scan", "precalcul"])
+def completions(request):
+    """Même index, avec et sans préfixes chauds précalculés"""
+    return Autocomplete.build(PRODUCTS, top_k=5, hot_threshold=request.param)
+
+
+class TestAutocomplete:
+    """Tests pour la complétion par préfixe"""
+
+    def test_prefix_match_by_popularity(self, completions):
+        """Complétions triées par popularité cumulée"""
+        assert completions.complete("yao", k=3) == ["Yaourt nature", "Yaourt à la fraise"]
+
+    def test_same_name_merged(self, completions):
+        """Un même nom (casse, espaces) n'apparaît qu'une fois, sous sa forme la plus populaire"""
+        assert completions.complete("yaourt n") == ["Yaourt nature"]
+
+    def test_accents_and_case(self, completions):
+        """La saisie est normalisée comme les clés"""
+        assert completions.complete("PÂTE")[0] == "Pâte à tartiner aux noisettes"
+        assert completions.complete("pate")[0] == "Pâte à tartiner aux noisettes"
+
+    def test_word_start_match(self, completions):
+        """Un mot à l'intérieur du nom complète aussi ("tartiner")"""
+        assert completions.complete("tartin") == ["Pâte à tartiner aux noisettes"]
+
+    def test_brands_are_suggested(self, completions):
+        """Les marques sont des complétions à part entière, chacune une fois"""
+        results = completions.complete("nu", k=5)
+
+        assert results[:2] == ["Nutella", "Nutella B-ready"]
+        assert completions.complete("carrefour", k=5) == ["Carrefour", "Carrefour Bio"]
+
+    def test_k_limits_results(self, completions):
+        """Au plus k complétions"""
+        assert len(completions.complete("n", k=2)) == 2
+
+    def test_no_match(self, completions):
+        """Préfixe inconnu ou vide: aucune complétion"""
+        assert completions.complete("zzz") == []
+        assert completions.complete("  ") == []
+
+    def test_save_load_roundtrip(self, completions, tmp_path):
+        """L'index rechargé donne les mêmes complétions"""
+        path = str(tmp_path / "autocomplete.npz")
+        completions.save(path)
+        loaded = Autocomplete.load(path)
+
+        for prefix in ("y", "yaourt n", "nu", "tartin"):
+            assert loaded.complete(prefix) == completions.complete(prefix)
+
+    def test_hot_prefixes_precomputed(self):
+        """Les préfixes qui couvrent beaucoup de clés ont leur top-k précalculé"""
+        completions = Autocomplete.build(PRODUCTS, top_k=5, hot_threshold=2)
+
+        assert b"n" in completions.hot_prefixes.tolist()
+        assert b"tartin" not in completions.hot_prefixes.tolist()
+
+    def test_build_from_store(self, tmp_path):
+        """Construit depuis le miroir local"""
+        store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        store.upsert_frame(to_store_frame(products_to_frame(PRODUCTS)))
+        try:
+            assert build_from_store(store, batch_size=3).complete("yaourt", k=1) == ["Yaourt nature"]
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
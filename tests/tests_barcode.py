@@ -0,0 +1,124 @@
+"""Tests unitaires pour utils/barcode.py"""
+
+import pytest
+from utils.barcode import BarcodeIndex, build_from_store, check_digit, correction_candidates, is_valid
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+
+NUTELLA = "3017620422003"
+CODES = [
+    NUTELLA,
+    "3017620425035",   # Nutella 1kg
+    "3274080005003",   # Cristaline
+    "5449000000996",   # Coca-Cola
+    "96385074",        # EAN-8
+    "036000291452",    # UPC-A
+    "not-a-barcode",
+]
+
+
+@pytest.fixture
+def index():
+    return BarcodeIndex.build(CODES)
+
+
+class TestChecksum:
+    """Tests pour la validation GS1"""
+
+    def test_valid_codes(self):
+        """EAN-13, EAN-8, UPC-A et GTIN-14 valides"""
+        for code in (NUTELLA, "96385074", "036000291452", "0" + "036000291452", "10012345678902"):
+            assert is_valid(code), code
+
+    def test_invalid_codes(self):
+        """Mauvais chiffre de contrôle, longueur ou caractères"""
+        assert not is_valid("3017620422004")
+        assert not is_valid("30176204220")
+        assert not is_valid("30176204220O3")
+        assert not is_valid("")
+
+    def test_check_digit(self):
+        """Le dernier chiffre est celui calculé sur les autres"""
+        assert check_digit(NUTELLA[:-1]) == 3
+
+
+class TestCorrectionCandidates:
+    """Tests pour les corrections à une faute près"""
+
+    def test_single_digit_error(self):
+        """Un chiffre faux: le bon code fait partie des candidats"""
+        assert NUTELLA in correction_candidates("3017620462003")
+
+    def test_transposition(self):
+        """Deux chiffres voisins inversés: le bon code fait partie des candidats"""
+        assert "5449000000996" in correction_candidates("5449000009096")
+
+    def test_all_candidates_valid(self):
+        """Seuls des codes au chiffre de contrôle correct sont proposés"""
+        candidates = correction_candidates("3017620462003")
+
+        assert candidates and all(is_valid(c) for c in candidates)
+        assert len(candidates) == len(set(candidates))
+
+    def test_wrong_length(self):
+        """Pas de correction pour une saisie partielle"""
+        assert correction_candidates("301762") == []
+
+
+class TestBarcodeIndex:
+    """Tests pour l'index des codes-barres"""
+
+    def test_build_ignores_non_numeric(self, index):
+        """Seuls les codes numériques sont indexés"""
+        assert len(index) == 6
+        assert NUTELLA in index
+        assert "not-a-barcode" not in index
+
+    def test_resolve_exact(self, index):
+        """Code exact: lui seul"""
+        assert index.resolve(NUTELLA) == [NUTELLA]
+
+    def test_resolve_upc_ean_variants(self, index):
+        """UPC-A et EAN-13 préfixé d'un 0 désignent le même produit"""
+        assert index.resolve("0036000291452") == ["036000291452"]
+
+    def test_resolve_typo(self, index):
+        """Code mal saisi: les codes connus à une faute près"""
+        assert index.resolve("3017620462003") == [NUTELLA]
+        assert index.resolve("5449000009096") == ["5449000000996"]
+
+    def test_resolve_prefix(self, index):
+        """Saisie partielle: codes connus commençant par ces chiffres"""
+        assert index.resolve("3017620") == [NUTELLA, "3017620425035"]
+        assert index.resolve("30", limit=1) == [NUTELLA]
+
+    def test_resolve_nothing(self, index):
+        """Texte ou code inconnu valide: aucun résultat"""
+        assert index.resolve("nutella") == []
+        assert index.resolve("4006381333931") == []
+
+    def test_save_load_roundtrip(self, index, tmp_path):
+        """L'index rechargé résout de la même façon"""
+        path = str(tmp_path / "barcodes.npz")
+        index.save(path)
+
+        assert BarcodeIndex.load(path).resolve("3017620462003") == [NUTELLA]
+
+    def test_empty_index(self):
+        """Index vide: rien n'est trouvé, sans erreur"""
+        empty = BarcodeIndex.build([])
+
+        assert NUTELLA not in empty
+        assert empty.resolve("3017620462003") == []
+
+    def test_build_from_store(self, tmp_path):
+        """Construit depuis le miroir local"""
+        store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        store.upsert_frame(to_store_frame(products_to_frame([{"code": c} for c in CODES[:3]])))
+        try:
+            assert build_from_store(store).resolve("3274") == ["3274080005003"]
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,178 @@
+"""Tests unitaires pour utils/cache.py"""
+
+import time
+import pytest
+from unittest.mock import patch
+from utils.cache import LLMCache, PersistentCache, ProductCache, SearchCache, normalize_query
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache produits temporaire"""
+    product_cache = ProductCache(str(tmp_path / "products.sqlite"), ttl=60, max_entries=3)
+    yield product_cache
+    product_cache.close()
+
+
+class TestProductCache:
+    """Tests pour le cache persistant des produits"""
+
+    def test_set_and_get(self, cache):
+        """Une entrée stockée est relue à l'identique"""
+        cache.set("3017620422003", {"product_name": "Nutella", "nova_group": 4})
+
+        assert cache.get("3017620422003") == {"product_name": "Nutella", "nova_group": 4}
+
+    def test_missing_key(self, cache):
+        """Clé absente: None et miss comptabilisé"""
+        assert cache.get("0000000000000") is None
+        assert cache.misses == 1
+
+    def test_hit_miss_counters(self, cache):
+        """Compteurs et taux de hit"""
+        cache.set("1", {"code": "1"})
+        cache.get("1")
+        cache.get("1")
+        cache.get("2")
+
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == pytest.approx(2 / 3)
+        assert stats["entries"] == 1
+
+    def test_ttl_expiration(self, cache):
+        """Une entrée expirée n'est plus servie"""
+        cache.set("1", {"code": "1"}, ttl=10)
+
+        with patch("utils.cache.time.time", return_value=time.time() + 11):
+            assert cache.get("1") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self, cache):
+        """Au-delà de max_entries, l'entrée la moins récemment lue est évincée"""
+        now = time.time()
+        with patch("utils.cache.time.time", side_effect=[now, now + 1, now + 2, now + 3, now + 4]):
+            cache.set("a", 1)
+            cache.set("b", 2)
+            cache.set("c", 3)
+            cache.get("a")
+            cache.set("d", 4)
+
+        assert len(cache) == 3
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("d") == 4
+
+    def test_persistence_across_instances(self, tmp_path):
+        """Les entrées survivent à un redémarrage"""
+        path = str(tmp_path / "products.sqlite")
+        first = PersistentCache(path)
+        first.set("3017620422003", {"product_name": "Nutella"})
+        first.close()
+
+        second = PersistentCache(path)
+        assert second.get("3017620422003") == {"product_name": "Nutella"}
+        second.close()
+
+    def test_clear(self, cache):
+        """clear() vide le cache et les compteurs"""
+        cache.set("1", 1)
+        cache.get("1")
+        cache.clear()
+
+        assert len(cache) == 0
+        assert cache.hits == 0
+
+
+class TestLLMCache:
+    """Tests pour le cache des réponses LLM"""
+
+    MESSAGES = [{"role": "user", "content": "Analyse Nutella"}]
+
+    def test_key_is_stable(self):
+        """Même provider, modèle, température et prompt: même clé (SHA-256 hexadécimal)"""
+        key = LLMCache.make_key("openai", "gpt-4o-mini", 0.7, self.MESSAGES)
+
+        assert key == LLMCache.make_key("openai", "gpt-4o-mini", 0.7, [dict(self.MESSAGES[0])])
+        assert len(key) == 64
+
+    @pytest.mark.parametrize("provider,model,temperature,content", [
+        ("ollama", "gpt-4o-mini", 0.7, "Analyse Nutella"),
+        ("openai", "gpt-4o", 0.7, "Analyse Nutella"),
+        ("openai", "gpt-4o-mini", 0.2, "Analyse Nutella"),
+        ("openai", "gpt-4o-mini", 0.7, "Analyse Nutella "),
+    ])
+    def test_key_changes(self, provider, model, temperature, content):
+        """Chaque composante de la clé compte"""
+        reference = LLMCache.make_key("openai", "gpt-4o-mini", 0.7, self.MESSAGES)
+        key = LLMCache.make_key(provider, model, temperature, [{"role": "user", "content": content}])
+
+        assert key != reference
+
+    def test_persists_responses(self, tmp_path):
+        """Les réponses survivent à la réouverture du cache"""
+        path = str(tmp_path / "llm.sqlite")
+        cache = LLMCache(path)
+        cache.set("k", "Analyse complète")
+        cache.close()
+
+        reopened = LLMCache(path)
+        assert reopened.get("k") == "Analyse complète"
+        reopened.close()
+
+
+class TestSearchCache:
+    """Tests pour le cache mémoire des recherches"""
+
+    @pytest.mark.parametrize("query,expected", [
+        ("Nutella", "nutella"),
+        ("  Yaourt   Nature ", "yaourt nature"),
+        ("CRÈME brûlée", "creme brulee"),
+        ("pâte\tà  tartiner", "pate a tartiner"),
+    ])
+    def test_normalize_query(self, query, expected):
+        """Casse, accents et espaces sont normalisés"""
+        assert normalize_query(query) == expected
+
+    def test_equivalent_queries_share_entry(self):
+        """Deux saisies équivalentes tombent sur la même entrée"""
+        cache = SearchCache()
+        cache.set(SearchCache.make_key("Crème Brûlée", 20), [{"code": "1"}])
+
+        assert cache.get(SearchCache.make_key("creme   brulee", 20)) == [{"code": "1"}]
+        assert cache.get(SearchCache.make_key("creme brulee", 10)) is None
+
+    def test_ttl_expiration(self):
+        """Les résultats expirés ne sont plus servis"""
+        cache = SearchCache(ttl=10)
+        key = SearchCache.make_key("nutella", 20)
+        cache.set(key, [])
+
+        with patch("utils.cache.time.time", return_value=time.time() + 11):
+            assert cache.get(key) is None
+        assert len(cache) == 0
+
+    def test_memory_budget_eviction(self):
+        """Le budget mémoire évince les entrées les moins récemment utilisées"""
+        payload = [{"product_name": "x" * 100}]
+        cache = SearchCache(max_bytes=300)
+        cache.set("a", payload)
+        cache.set("b", payload)
+        cache.get("a")
+        cache.set("c", payload)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == payload
+        assert cache.size_bytes <= 300
+
+    def test_oversized_value_not_stored(self):
+        """Une valeur plus grosse que le budget n'est pas stockée"""
+        cache = SearchCache(max_bytes=10)
+        cache.set("a", ["x" * 100])
+
+        assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,165 @@
+"""Tests unitaires pour utils/category_index.py"""
+
+import pytest
+from unittest.mock import patch
+from utils.category_index import CategoryIndex, build_from_store, split_categories
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+
+SPREADS = "Petit-déjeuners, Produits à tartiner, Pâtes à tartiner"
+PRODUCTS = [
+    {"code": "nutella", "categories": SPREADS, "nutriscore_grade": "e", "nova_group": 4,
+     "unique_scans_n": 5000, "last_modified_t": 100},
+    {"code": "nocciolata", "categories": SPREADS, "nutriscore_grade": "d", "nova_group": 4,
+     "unique_scans_n": 800, "last_modified_t": 100},
+    {"code": "bio", "categories": SPREADS, "nutriscore_grade": "d", "nova_group": 3,
+     "unique_scans_n": 10, "last_modified_t": 100},
+    {"code": "puree", "categories": "Petit-déjeuners, Produits à tartiner, Purées d'oléagineux",
+     "nutriscore_grade": "a", "nova_group": 1, "unique_scans_n": 300, "last_modified_t": 100},
+    {"code": "confiture", "categories": "Petit-déjeuners, Produits à tartiner, Confitures",
+     "nutriscore_grade": "c", "nova_group": 3, "unique_scans_n": 2000, "last_modified_t": 100},
+    {"code": "inconnu", "categories": SPREADS, "unique_scans_n": 9999, "last_modified_t": 100},
+    {"code": "eau", "categories": "Boissons, Eaux", "nutriscore_grade": "a", "last_modified_t": 200},
+    {"code": "sans-categorie", "nutriscore_grade": "a"},
+]
+
+
+@pytest.fixture
+def index():
+    return CategoryIndex.build(PRODUCTS)
+
+
+class TestCategoryIndex:
+    """Tests pour l'index catégorie -> meilleurs produits"""
+
+    def test_split_categories(self):
+        """Hiérarchie normalisée, de la plus générale à la plus précise"""
+        assert split_categories("Snacks, Snacks sucrés,, ") == ["snacks", "snacks sucres"]
+        assert split_categories(None) == []
+
+    def test_build(self, index):
+        """Tous les niveaux de la hiérarchie sont indexés, produits sans catégorie ignorés"""
+        assert len(index) == 7
+        assert {"petit-dejeuners", "produits a tartiner", "pates a tartiner", "eaux"} <= set(index.categories)
+        assert index.watermark == 200
+
+    def test_most_specific_category_first(self, index):
+        """Alternatives de la catégorie la plus précise, triées par Nutri-Score puis NOVA"""
+        assert index.better_products(SPREADS, "E", limit=2) == ["bio", "nocciolata"]
+
+    def test_walks_up_the_hierarchy(self, index):
+        """Pas assez d'alternatives: complétées par les catégories parentes"""
+        assert index.better_products(SPREADS, "E", limit=4) == ["bio", "nocciolata", "puree", "confiture"]
+
+    def test_strictly_better_only(self, index):
+        """Même Nutri-Score ou moins bon: exclu"""
+        assert index.better_products(SPREADS, "D", limit=5) == ["puree", "confiture"]
+        assert index.better_products(SPREADS, "A") == []
+
+    def test_unknown_grade_returns_graded_products(self, index):
+        """Nutri-Score inconnu: les meilleurs produits notés"""
+        assert index.better_products(SPREADS, "N/A", limit=1) == ["bio"]
+
+    def test_unknown_category(self, index):
+        """Catégorie absente de l'index: aucune alternative"""
+        assert index.better_products("Surgelés", "E") == []
+        assert index.better_products("", "E") == []
+
+    def test_save_load_roundtrip(self, index, tmp_path):
+        """L'index rechargé répond de la même façon"""
+        path = str(tmp_path / "categories.npz")
+        index.save(path)
+        loaded = CategoryIndex.load(path)
+
+        assert loaded.better_products(SPREADS, "E", limit=4) == index.better_products(SPREADS, "E", limit=4)
+        assert loaded.watermark == 200
+
+
+class TestIncrementalUpdates:
+    """Tests pour la mise à jour incrémentale"""
+
+    def test_update_changes_ranking(self, index):
+        """Un produit reformulé remplace son ancienne entrée"""
+        index.update([{"code": "nocciolata", "categories": SPREADS, "nutriscore_grade": "b", "last_modified_t": 300}])
+
+        assert index.better_products(SPREADS, "E", limit=2) == ["nocciolata", "bio"]
+        assert index.better_products(SPREADS, "C", limit=5) == ["nocciolata", "puree"]
+        assert index.synced_to == 300
+
+    def test_update_twice(self, index):
+        """Seule la dernière version d'un produit compte"""
+        index.update([{"code": "x", "categories": SPREADS, "nutriscore_grade": "a"}])
+        index.update([{"code": "x", "categories": "Boissons", "nutriscore_grade": "a"}])
+
+        assert "x" not in index.better_products(SPREADS, "E", limit=10)
+        assert set(index.better_products("Boissons", "B")) == {"x", "eau"}
+
+    def test_new_category(self, index):
+        """Un produit peut introduire une catégorie inconnue de l'index de base"""
+        index.update([{"code": "kombucha", "categories": "Boissons, Boissons fermentées", "nutriscore_grade": "b"}])
+
+        assert index.better_products("Boissons, Boissons fermentées", "C") == ["kombucha", "eau"]
+
+    def test_remove(self, index):
+        """Un produit supprimé n'est plus proposé"""
+        index.remove(["bio"])
+
+        assert index.better_products(SPREADS, "E", limit=1) == ["nocciolata"]
+
+    def test_refresh_from_store(self, tmp_path):
+        """refresh ne relit que les produits modifiés depuis la construction"""
+        store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        try:
+            store.upsert_frame(to_store_frame(products_to_frame(PRODUCTS)))
+            index = build_from_store(store)
+
+            assert index.refresh(store) == 0
+
+            store.upsert_frame(to_store_frame(products_to_frame([
+                {"code": "nutella", "categories": SPREADS, "nutriscore_grade": "b", "last_modified_t": 500},
+            ])))
+
+            assert index.refresh(store) == 1
+            assert index.better_products(SPREADS, "C", limit=1) == ["nutella"]
+            assert index.refresh(store) == 0
+        finally:
+            store.close()
+
+    def test_refresh_removes_compacted(self, tmp_path):
+        """refresh retire les produits supprimés du miroir par compact_tombstones"""
+        store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        try:
+            store.upsert_frame(to_store_frame(products_to_frame(PRODUCTS)))
+            index = build_from_store(store)
+            assert "nocciolata" in index.better_products(SPREADS, "E", limit=5)
+
+            store.apply_delta(to_store_frame(products_to_frame([])), {"nocciolata": 500}, 500)
+            assert store.compact_tombstones() == 1
+
+            assert index.refresh(store) == 1
+            assert "nocciolata" not in index.better_products(SPREADS, "E", limit=5)
+            assert index.refresh(store) == 0
+        finally:
+            store.close()
+
+    def test_refresh_if_changed(self, tmp_path):
+        """Le miroir n'est relu que si sa version a changé"""
+        store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        try:
+            store.upsert_frame(to_store_frame(products_to_frame(PRODUCTS)))
+            index = build_from_store(store)
+            index.refresh_if_changed(store, store.version())
+
+            store.apply_delta(to_store_frame(products_to_frame([])), {"nocciolata": 500}, 500)
+            store.compact_tombstones()
+            with patch.object(index, "refresh", wraps=index.refresh) as mock_refresh:
+                assert index.refresh_if_changed(store, store.version()) == 1
+                assert index.refresh_if_changed(store, store.version()) == 0
+
+            mock_refresh.assert_called_once()
+            assert "nocciolata" not in index.better_products(SPREADS, "E", limit=5)
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
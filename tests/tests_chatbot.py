@@ -1,9 +1,14 @@
 """Tests unitaires pour utils/chatbot.py"""
 
 import os
+import threading
+import time
 import pytest
 from unittest.mock import patch, Mock
-from utils.chatbot import NutriChatbot
+from utils.cache import LLMCache
+from utils import chatbot as chatbot_module
+from utils.chatbot import NutriChatbot, estimate_tokens, provider_concurrency
+from utils.semantic_cache import SemanticCache
 
 
 class TestNutriChatbot:
@@ -280,6 +285,33 @@ class TestNutriChatbot:
         assert "NOVA" in prompt
         assert "3 parties" in prompt or "parties" in prompt
 
+    @patch('utils.chatbot.completion')
+    def test_analyze_product_ingredient_facts(self, mock_completion):
+        """Les faits extraits des ingrédients figurent dans le prompt, seulement s'ils existent"""
+        mock_response = Mock()
+        mock_response.choices = [Mock(message=Mock(content="Analyse"))]
+        mock_completion.return_value = mock_response
+
+        chatbot = NutriChatbot(provider="openai")
+
+        product_info = {
+            "name": "Coca-Cola",
+            "brands": "Coca-Cola",
+            "nutriscore": "E",
+            "nova_group": 4,
+            "ingredients": "Eau gazéifiée, sucre, colorant : E150d, arômes naturels",
+            "additives": ("E150d",),
+            "detected_allergens": (),
+            "ultra_processing": ("arômes", "colorant"),
+        }
+
+        chatbot.analyze_product(product_info)
+
+        prompt = mock_completion.call_args[1]["messages"][0]["content"]
+        assert "Additifs: E150d" in prompt
+        assert "Marqueurs d'ultra-transformation: arômes, colorant" in prompt
+        assert "Allergènes détectés" not in prompt
+
     @patch('utils.chatbot.completion')
     def test_ollama_api_base_kwargs(self, mock_completion):
         """Test que les kwargs Ollama sont bien passés"""
@@ -331,6 +363,494 @@ class TestNutriChatbot:
         assert "Alt4" not in prompt
 
 
+def stream_chunks(*parts):
+    """Réponse LiteLLM en streaming (delta vide en fin de flux, comme les vrais providers)"""
+    return iter([Mock(choices=[Mock(delta=Mock(content=part))]) for part in (*parts, None)])
+
+
+class TestNutriChatbotStreaming:
+    """Tests pour les variantes en streaming"""
+
+    @patch('utils.chatbot.completion')
+    def test_analyze_product_stream(self, mock_completion):
+        """Les morceaux sont renvoyés dans l'ordre, avec stream=True et le prompt d'analyse"""
+        mock_completion.return_value = stream_chunks("Produit ", "très ", "sucré.")
+
+        chatbot = NutriChatbot(provider="openai")
+        product_info = {"name": "Nutella", "brands": "Ferrero", "nutriscore": "E", "nova_group": 4, "ingredients": "Sucre"}
+
+        assert list(chatbot.analyze_product_stream(product_info)) == ["Produit ", "très ", "sucré."]
+        call_kwargs = mock_completion.call_args[1]
+        assert call_kwargs["stream"] is True
+        assert call_kwargs["temperature"] == 0.7
+        assert "nutritionniste" in call_kwargs["messages"][0]["content"].lower()
+
+    @patch('utils.chatbot.completion')
+    def test_suggest_alternatives_stream(self, mock_completion):
+        """Explication des alternatives en streaming"""
+        mock_completion.return_value = stream_chunks("Moins ", "de sucre.")
+
+        chatbot = NutriChatbot(provider="openai")
+        result = "".join(chatbot.suggest_alternatives_stream(
+            {"name": "Nutella", "nutriscore": "E"}, [{"name": "Purée d'amande", "nutriscore": "A"}]
+        ))
+
+        assert result == "Moins de sucre."
+        assert "Purée d'amande" in mock_completion.call_args[1]["messages"][0]["content"]
+
+    @patch('utils.chatbot.completion')
+    def test_chat_stream_history(self, mock_completion):
+        """La réponse complète est ajoutée à l'historique une fois le flux terminé"""
+        mock_completion.return_value = stream_chunks("Le Nutri-Score ", "va de A à E.")
+
+        chatbot = NutriChatbot(provider="openai")
+        stream = chatbot.chat_stream("C'est quoi le Nutri-Score ?")
+
+        assert next(stream) == "Le Nutri-Score "
+        assert len(chatbot.conversation_history) == 1
+        assert list(stream) == ["va de A à E."]
+        assert chatbot.conversation_history[-1] == {"role": "assistant", "content": "Le Nutri-Score va de A à E."}
+        assert mock_completion.call_args[1]["messages"][0]["role"] == "system"
+
+    @patch('utils.chatbot.completion')
+    def test_chat_stream_interrupted(self, mock_completion):
+        """Lecture arrêtée en cours de route: la partie reçue reste dans l'historique"""
+        mock_completion.return_value = stream_chunks("Début", " et suite")
+
+        chatbot = NutriChatbot(provider="openai")
+        stream = chatbot.chat_stream("Question")
+        next(stream)
+        stream.close()
+
+        assert chatbot.conversation_history[-1] == {"role": "assistant", "content": "Début"}
+
+    @patch('utils.chatbot.completion')
+    def test_chat_stream_error(self, mock_completion):
+        """Erreur du provider: message d'erreur renvoyé, rien d'ajouté pour l'assistant"""
+        mock_completion.side_effect = Exception("Timeout")
+
+        chatbot = NutriChatbot(provider="openai")
+        result = list(chatbot.chat_stream("Question"))
+
+        assert result == ["❌ Erreur: Timeout"]
+        assert [m["role"] for m in chatbot.conversation_history] == ["user"]
+
+    @patch('utils.chatbot.completion')
+    def test_analyze_product_stream_error(self, mock_completion):
+        """Erreur du provider en streaming: même message que la version bloquante"""
+        mock_completion.side_effect = Exception("API Error")
+
+        chatbot = NutriChatbot(provider="openai")
+        product_info = {"name": "X", "brands": "Y", "nutriscore": "C", "nova_group": 3, "ingredients": ""}
+
+        assert list(chatbot.analyze_product_stream(product_info)) == ["❌ Erreur d'analyse: API Error"]
+
+
+class TestNutriChatbotCache:
+    """Tests pour le cache des réponses"""
+
+    PRODUCT = {"name": "Nutella", "brands": "Ferrero", "nutriscore": "E", "nova_group": 4, "ingredients": "Sucre"}
+
+    @pytest.fixture
+    def chatbot(self):
+        chatbot = NutriChatbot(provider="openai", cache=LLMCache(":memory:"))
+        yield chatbot
+        chatbot.cache.close()
+
+    @patch('utils.chatbot.completion')
+    def test_analysis_cached(self, mock_completion, chatbot):
+        """Deuxième analyse du même produit: servie par le cache, sans appel au modèle"""
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Trop sucré."))])
+
+        assert chatbot.analyze_product(self.PRODUCT) == "Trop sucré."
+        assert chatbot.analyze_product(self.PRODUCT) == "Trop sucré."
+        assert mock_completion.call_count == 1
+        assert chatbot.cache.stats()["hit_rate"] == 0.5
+
+    @patch('utils.chatbot.completion')
+    def test_stream_shares_cache(self, mock_completion, chatbot):
+        """Réponse streamée mise en cache une fois complète, puis renvoyée d'un bloc"""
+        mock_completion.return_value = stream_chunks("Trop ", "sucré.")
+
+        assert list(chatbot.analyze_product_stream(self.PRODUCT)) == ["Trop ", "sucré."]
+        assert list(chatbot.analyze_product_stream(self.PRODUCT)) == ["Trop sucré."]
+        assert chatbot.analyze_product(self.PRODUCT) == "Trop sucré."
+        assert mock_completion.call_count == 1
+
+    @patch('utils.chatbot.completion')
+    def test_interrupted_stream_not_cached(self, mock_completion, chatbot):
+        """Flux abandonné en cours de route: rien n'est mis en cache"""
+        mock_completion.return_value = stream_chunks("Trop ", "sucré.")
+
+        stream = chatbot.analyze_product_stream(self.PRODUCT)
+        next(stream)
+        stream.close()
+
+        assert len(chatbot.cache) == 0
+
+    @patch('utils.chatbot.completion')
+    def test_bypass_regenerates(self, mock_completion, chatbot):
+        """use_cache=False: nouvel appel, la nouvelle réponse remplace l'ancienne"""
+        mock_completion.side_effect = [
+            Mock(choices=[Mock(message=Mock(content="Version 1"))]),
+            Mock(choices=[Mock(message=Mock(content="Version 2"))]),
+        ]
+
+        chatbot.analyze_product(self.PRODUCT)
+        assert chatbot.analyze_product(self.PRODUCT, use_cache=False) == "Version 2"
+        assert chatbot.analyze_product(self.PRODUCT) == "Version 2"
+        assert mock_completion.call_count == 2
+
+    @patch('utils.chatbot.completion')
+    def test_errors_not_cached(self, mock_completion, chatbot):
+        """Une erreur du provider n'est jamais mise en cache"""
+        mock_completion.side_effect = [Exception("Timeout"), Mock(choices=[Mock(message=Mock(content="OK"))])]
+
+        assert "Timeout" in chatbot.analyze_product(self.PRODUCT)
+        assert chatbot.analyze_product(self.PRODUCT) == "OK"
+
+    @patch('utils.chatbot.completion')
+    def test_key_includes_model(self, mock_completion, chatbot):
+        """Un autre modèle ne réutilise pas la réponse"""
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Réponse"))])
+        chatbot.analyze_product(self.PRODUCT)
+
+        other = NutriChatbot(provider="openai", model="gpt-4o", cache=chatbot.cache)
+        other.analyze_product(self.PRODUCT)
+
+        assert mock_completion.call_count == 2
+
+    @patch('utils.chatbot.completion')
+    def test_chat_not_cached(self, mock_completion, chatbot):
+        """Le chat (dépendant de l'historique) n'utilise pas ce cache"""
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Réponse"))])
+
+        chatbot.chat("Question")
+
+        assert len(chatbot.cache) == 0
+
+
+class TestNutriChatbotSemanticCache:
+    """Tests pour le cache des premières questions du chat"""
+
+    @pytest.fixture
+    def chatbot(self):
+        return NutriChatbot(provider="openai", semantic_cache=SemanticCache())
+
+    @patch('utils.chatbot.completion')
+    def test_first_question_shared(self, mock_completion, chatbot):
+        """Question proche dans une nouvelle conversation: réponse en cache, ajoutée à l'historique"""
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Un logo A-E."))])
+        chatbot.chat("C'est quoi le Nutri-Score ?")
+
+        other = NutriChatbot(provider="openai", semantic_cache=chatbot.semantic_cache)
+
+        assert other.chat("Qu'est-ce que le nutriscore") == "Un logo A-E."
+        assert mock_completion.call_count == 1
+        assert other.conversation_history[-1] == {"role": "assistant", "content": "Un logo A-E."}
+
+    @patch('utils.chatbot.completion')
+    def test_stream_first_question(self, mock_completion, chatbot):
+        """Réponse streamée complète mise en cache, puis renvoyée d'un bloc"""
+        mock_completion.return_value = stream_chunks("Un logo ", "A-E.")
+        list(chatbot.chat_stream("C'est quoi le Nutri-Score ?"))
+
+        other = NutriChatbot(provider="openai", semantic_cache=chatbot.semantic_cache)
+
+        assert list(other.chat_stream("c'est quoi le Nutri-Score")) == ["Un logo A-E."]
+        assert mock_completion.call_count == 1
+
+    @patch('utils.chatbot.completion')
+    def test_follow_up_not_cached(self, mock_completion, chatbot):
+        """Questions suivantes (dépendantes de l'historique) et questions avec contexte: jamais en cache"""
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Réponse"))])
+
+        chatbot.chat("Bonjour", context="Produit: Nutella")
+        chatbot.chat("C'est quoi le Nutri-Score ?")
+
+        assert len(chatbot.semantic_cache) == 0
+
+    @patch('utils.chatbot.completion')
+    def test_bypass(self, mock_completion, chatbot):
+        """use_cache=False: appel au modèle même si une question proche est en cache"""
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Réponse"))])
+        chatbot.chat("C'est quoi le Nutri-Score ?")
+
+        other = NutriChatbot(provider="openai", semantic_cache=chatbot.semantic_cache)
+        other.chat("C'est quoi le Nutri-Score ?", use_cache=False)
+
+        assert mock_completion.call_count == 2
+
+    @patch('utils.chatbot.completion')
+    def test_errors_not_cached(self, mock_completion, chatbot):
+        """Réponse en erreur ou interrompue: rien n'est mis en cache"""
+        mock_completion.side_effect = Exception("Timeout")
+        chatbot.chat("C'est quoi le Nutri-Score ?")
+
+        mock_completion.side_effect = None
+        mock_completion.return_value = stream_chunks("Un logo ", "A-E.")
+        stream = NutriChatbot(provider="openai", semantic_cache=chatbot.semantic_cache).chat_stream("Nutri-Score ?")
+        next(stream)
+        stream.close()
+
+        assert len(chatbot.semantic_cache) == 0
+
+
+class TestNutriChatbotMemory:
+    """Tests pour la mémoire bornée de la conversation"""
+
+    @staticmethod
+    def reply(content):
+        return Mock(choices=[Mock(message=Mock(content=content))])
+
+    @patch('utils.chatbot.completion')
+    def test_under_budget_kept(self, mock_completion):
+        """Sous le budget: historique complet, aucun résumé"""
+        mock_completion.return_value = self.reply("Réponse")
+        chatbot = NutriChatbot(provider="openai", memory_tokens=1000)
+
+        for i in range(5):
+            chatbot.chat(f"Question {i}")
+
+        assert len(chatbot.conversation_history) == 10
+        assert chatbot.summary == ""
+        assert mock_completion.call_count == 5
+
+    @patch('utils.chatbot.completion')
+    def test_old_turns_summarized(self, mock_completion):
+        """Au-delà du budget: anciens échanges résumés, derniers échanges gardés tels quels"""
+        mock_completion.side_effect = lambda **kwargs: self.reply(
+            "Résumé: questions sur le sucre" if kwargs["temperature"] == 0.3 else "x" * 800
+        )
+        chatbot = NutriChatbot(provider="openai", memory_tokens=500, keep_turns=2)
+
+        for i in range(4):
+            chatbot.chat(f"Question {i}")
+        chatbot._apply_compaction()
+
+        assert chatbot.summary == "Résumé: questions sur le sucre"
+        assert [m["content"] for m in chatbot.conversation_history if m["role"] == "user"] == ["Question 2", "Question 3"]
+        assert estimate_tokens(chatbot._chat_messages()) <= 500
+        # Résumé envoyé dans le message système du message suivant
+        chatbot.chat("Question 4")
+        system = [c for c in mock_completion.call_args_list if c.kwargs["temperature"] == 0.8][-1].kwargs["messages"][0]["content"]
+        assert "questions sur le sucre" in system
+
+    @patch('utils.chatbot.completion')
+    def test_prompt_size_bounded(self, mock_completion):
+        """Longue conversation: taille des messages envoyés bornée"""
+        mock_completion.side_effect = lambda **kwargs: self.reply("Résumé" if kwargs["temperature"] == 0.3 else "y" * 200)
+        chatbot = NutriChatbot(provider="ollama", memory_tokens=400)
+
+        for i in range(30):
+            chatbot.chat(f"Question {i}")
+
+        sizes = [estimate_tokens(c.kwargs["messages"]) for c in mock_completion.call_args_list]
+        assert max(sizes) <= 400 + 60
+
+    @patch('utils.chatbot.completion')
+    def test_summary_error_fallback(self, mock_completion):
+        """Résumé impossible: texte des anciens échanges tronqué, mémoire toujours bornée"""
+        mock_completion.side_effect = lambda **kwargs: (
+            (_ for _ in ()).throw(Exception("Timeout")) if kwargs["temperature"] == 0.3 else self.reply("z" * 400)
+        )
+        chatbot = NutriChatbot(provider="openai", memory_tokens=300, keep_turns=1)
+
+        for i in range(3):
+            chatbot.chat(f"Question {i}")
+        chatbot._apply_compaction()
+
+        assert 0 < len(chatbot.summary) <= 300
+        assert len(chatbot.conversation_history) == 2
+
+    @patch('utils.chatbot.completion')
+    def test_stream_compacts(self, mock_completion):
+        """Réponses streamées: même mémoire bornée"""
+        mock_completion.side_effect = lambda **kwargs: (
+            stream_chunks("w" * 300, "w" * 300) if kwargs.get("stream") else self.reply("Résumé")
+        )
+        chatbot = NutriChatbot(provider="openai", memory_tokens=300, keep_turns=1)
+
+        for i in range(3):
+            list(chatbot.chat_stream(f"Question {i}"))
+        chatbot._apply_compaction()
+
+        assert chatbot.summary == "Résumé"
+        assert len(chatbot.conversation_history) == 2
+
+    @patch('utils.chatbot.completion')
+    def test_summary_in_background(self, mock_completion):
+        """La réponse n'attend pas le résumé, appliqué avant le message suivant"""
+        def reply(**kwargs):
+            if kwargs["temperature"] == 0.3:
+                time.sleep(0.5)
+                return self.reply("Résumé")
+            return self.reply("x" * 1200)
+        mock_completion.side_effect = reply
+        chatbot = NutriChatbot(provider="openai", memory_tokens=500, keep_turns=1)
+        chatbot.chat("Question 0")
+
+        start = time.perf_counter()
+        chatbot.chat("Question 1")
+        assert time.perf_counter() - start < 0.3
+        assert chatbot.summary == ""
+
+        chatbot.chat("Question 2")
+        system = [c for c in mock_completion.call_args_list if c.kwargs["temperature"] == 0.8][-1].kwargs["messages"][0]["content"]
+        assert "Résumé" in system
+
+    @patch('utils.chatbot.completion')
+    def test_one_off_not_remembered(self, mock_completion):
+        """remember=False: question envoyée sans l'historique, qui reste inchangé"""
+        mock_completion.return_value = self.reply("Réponse")
+        chatbot = NutriChatbot(provider="openai")
+        chatbot.chat("Bonjour")
+
+        chatbot.chat("Compare ces produits", remember=False)
+
+        assert len(mock_completion.call_args.kwargs["messages"]) == 2
+        assert len(chatbot.conversation_history) == 2
+
+    def test_budget_per_provider(self):
+        """Budget par provider, modifiable par variable d'environnement"""
+        with patch.dict(os.environ, {"NUTRISCAN_MEMORY_TOKENS_OLLAMA": "1234"}, clear=False):
+            assert NutriChatbot(provider="ollama").memory_tokens == 1234
+        assert NutriChatbot(provider="gemini").memory_tokens > NutriChatbot(provider="ollama", memory_tokens=2000).memory_tokens
+
+
+class TestNutriChatbotBatch:
+    """Tests pour l'analyse de plusieurs produits en parallèle"""
+
+    @staticmethod
+    def product(name):
+        return {"name": name, "brands": "Marque", "nutriscore": "C", "nova_group": 3, "ingredients": "Sucre"}
+
+    @pytest.fixture(autouse=True)
+    def fresh_semaphores(self):
+        """Sémaphores recréés pour chaque test (limites lues dans l'environnement)"""
+        chatbot_module._semaphores.clear()
+        yield
+        chatbot_module._semaphores.clear()
+
+    @patch('utils.chatbot.completion')
+    def test_concurrent(self, mock_completion):
+        """10 analyses de 0,2 s: durée proche d'une seule analyse"""
+        def slow(**kwargs):
+            time.sleep(0.2)
+            return Mock(choices=[Mock(message=Mock(content=kwargs["messages"][0]["content"].split("Produit: ")[1][:2]))])
+        mock_completion.side_effect = slow
+        chatbot = NutriChatbot(provider="openai")
+        products = [self.product(f"P{i}") for i in range(10)]
+
+        with patch.dict(os.environ, {"NUTRISCAN_CONCURRENCY_OPENAI": "10"}):
+            start = time.perf_counter()
+            results = dict(chatbot.analyze_products(products))
+            elapsed = time.perf_counter() - start
+
+        assert results == {i: f"P{i}" for i in range(10)}
+        assert elapsed < 1.0
+
+    @patch('utils.chatbot.completion')
+    def test_concurrency_limit(self, mock_completion):
+        """Jamais plus d'appels simultanés que la limite du provider"""
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def tracked(**kwargs):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return Mock(choices=[Mock(message=Mock(content="OK"))])
+        mock_completion.side_effect = tracked
+
+        with patch.dict(os.environ, {"NUTRISCAN_CONCURRENCY_GEMINI": "2"}):
+            results = list(NutriChatbot(provider="gemini").analyze_products([self.product(f"P{i}") for i in range(6)]))
+
+        assert len(results) == 6
+        assert peak[0] == 2
+
+    @patch('utils.chatbot.completion')
+    def test_cached_first(self, mock_completion):
+        """Analyses en cache renvoyées d'abord, sans appel au modèle; les nouvelles mises en cache"""
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Analyse"))])
+        chatbot = NutriChatbot(provider="openai", cache=LLMCache(":memory:"))
+        chatbot.analyze_product(self.product("Déjà vu"))
+
+        results = list(chatbot.analyze_products([self.product("Nouveau"), self.product("Déjà vu")]))
+
+        assert results[0] == (1, "Analyse")
+        assert mock_completion.call_count == 2
+        assert len(chatbot.cache) == 2
+        chatbot.cache.close()
+
+    @patch('utils.chatbot.completion')
+    def test_errors_per_product(self, mock_completion):
+        """Une erreur n'interrompt pas les autres analyses"""
+        mock_completion.side_effect = lambda **kwargs: (
+            (_ for _ in ()).throw(Exception("Timeout")) if "P1" in kwargs["messages"][0]["content"]
+            else Mock(choices=[Mock(message=Mock(content="OK"))])
+        )
+
+        results = dict(NutriChatbot(provider="openai").analyze_products([self.product(f"P{i}") for i in range(3)]))
+
+        assert results[0] == results[2] == "OK"
+        assert "Timeout" in results[1]
+
+    @patch('utils.chatbot.completion')
+    def test_comparison_synthesis(self, mock_completion):
+        """La synthèse reprend les analyses de chaque produit dans un seul appel"""
+        mock_completion.return_value = stream_chunks("Privilégier ", "P1.")
+        products = [self.product("P0"), self.product("P1")]
+
+        chunks = list(NutriChatbot(provider="openai").compare_products_stream(products, {0: "Trop sucré", 1: "Équilibré"}))
+
+        assert "".join(chunks) == "Privilégier P1."
+        assert mock_completion.call_count == 1
+        prompt = mock_completion.call_args[1]["messages"][0]["content"]
+        assert "1. P0" in prompt and "Trop sucré" in prompt
+        assert "2. P1" in prompt and "Équilibré" in prompt
+
+    def test_empty(self):
+        """Aucun produit: aucun résultat"""
+        assert list(NutriChatbot(provider="openai").analyze_products([])) == []
+
+    @patch('utils.chatbot.completion')
+    def test_every_call_takes_semaphore(self, mock_completion):
+        """Chat, résumé et streaming comptent aussi dans la limite du provider"""
+        with patch.dict(os.environ, {"NUTRISCAN_CONCURRENCY_OPENAI": "1"}):
+            semaphore = chatbot_module.provider_semaphore("openai")
+        held = []
+
+        def check(**kwargs):
+            held.append(not semaphore.acquire(blocking=False))
+            if not held[-1]:
+                semaphore.release()
+            if kwargs.get("stream"):
+                return stream_chunks("a", "b")
+            return Mock(choices=[Mock(message=Mock(content="OK"))])
+        mock_completion.side_effect = check
+
+        chatbot = NutriChatbot(provider="openai")
+        chatbot.chat("Question")
+        chatbot._summarize([{"role": "user", "content": "Question"}])
+        stream = chatbot.chat_stream("Question")
+        next(stream)
+        assert not semaphore.acquire(blocking=False)
+        list(stream)
+
+        assert held == [True, True, True]
+        assert semaphore.acquire(blocking=False)
+        semaphore.release()
+
+    def test_concurrency_per_provider(self):
+        """Limite par provider, modifiable par variable d'environnement"""
+        assert provider_concurrency("ollama") == 1
+        with patch.dict(os.environ, {"NUTRISCAN_CONCURRENCY_OPENAI": "3"}):
+            assert provider_concurrency("openai") == 3
+
+
 class TestNutriChatbotProviders:
     """Tests spécifiques aux différents providers"""
 
@@ -1,14 +1,18 @@
 """Tests unitaires pour utils/data.py"""
 
+import time
+import pandas as pd
 import pytest
+from itertools import islice
 from unittest.mock import patch, Mock
+from utils.cache import ProductCache, SearchCache
 from utils.data import OpenFoodFactsAPI
 
 
 class TestOpenFoodFactsAPI:
     """Tests pour la classe OpenFoodFactsAPI"""
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_search_products_success(self, mock_get):
         """Test recherche de produits - succès"""
         # Mock de la réponse API
@@ -44,7 +48,7 @@ class TestOpenFoodFactsAPI:
         call_args = mock_get.call_args
         assert "nutella" in str(call_args)
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_search_products_no_results(self, mock_get):
         """Test recherche sans résultats"""
         mock_response = Mock()
@@ -57,7 +61,7 @@ class TestOpenFoodFactsAPI:
 
         assert results == []
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_search_products_api_error(self, mock_get):
         """Test gestion d'erreur API"""
         mock_get.side_effect = Exception("API Error")
@@ -67,7 +71,7 @@ class TestOpenFoodFactsAPI:
 
         assert results == []
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_get_product_success(self, mock_get):
         """Test récupération produit par code-barres - succès"""
         mock_response = Mock()
@@ -91,7 +95,7 @@ class TestOpenFoodFactsAPI:
         assert product["product_name"] == "Nutella"
         assert product["nova_group"] == 4
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_get_product_not_found(self, mock_get):
         """Test produit non trouvé"""
         mock_response = Mock()
@@ -104,7 +108,7 @@ class TestOpenFoodFactsAPI:
 
         assert product is None
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_get_product_api_error(self, mock_get):
         """Test gestion erreur lors de la récupération"""
         mock_get.side_effect = Exception("Network Error")
@@ -179,7 +183,7 @@ class TestOpenFoodFactsAPI:
 
         assert info["nutriscore"] == "A"  # doit être majuscule
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_search_products_custom_page_size(self, mock_get):
         """Test avec page_size personnalisé"""
         mock_response = Mock()
@@ -195,7 +199,7 @@ class TestOpenFoodFactsAPI:
         assert call_args[1]["params"]["page_size"] == 50
         assert len(results) == 50
 
-    @patch('utils.data.requests.get')
+    @patch('utils.data.requests.Session.get')
     def test_base_url_correct(self, mock_get):
         """Test que l'URL de base est correcte"""
         mock_response = Mock()
@@ -210,6 +214,405 @@ class TestOpenFoodFactsAPI:
         call_args = mock_get.call_args
         assert "world.openfoodfacts.org" in call_args[0][0]
 
+    @patch('utils.data.requests.Session.get')
+    def test_get_product_uses_cache(self, mock_get, tmp_path):
+        """Un produit déjà récupéré est servi depuis le cache persistant"""
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            "status": 1,
+            "product": {"code": "3017620422003", "product_name": "Nutella"}
+        }
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        cache = ProductCache(str(tmp_path / "products.sqlite"))
+        with patch.object(OpenFoodFactsAPI, "PRODUCT_CACHE", cache):
+            first = OpenFoodFactsAPI.get_product("3017620422003")
+            second = OpenFoodFactsAPI.get_product("3017620422003")
+
+        assert first == second
+        mock_get.assert_called_once()
+        assert cache.stats()["hits"] == 1
+
+    @patch('utils.data.requests.Session.get')
+    def test_get_product_not_found_not_cached(self, mock_get, tmp_path):
+        """Un produit introuvable n'est pas mis en cache"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"status": 0}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        cache = ProductCache(str(tmp_path / "products.sqlite"))
+        with patch.object(OpenFoodFactsAPI, "PRODUCT_CACHE", cache):
+            OpenFoodFactsAPI.get_product("0000000000000")
+
+        assert len(cache) == 0
+
+    @patch('utils.data.requests.Session.get')
+    def test_search_products_uses_shared_cache(self, mock_get):
+        """Les requêtes équivalentes sont servies depuis le cache de recherche"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"products": [{"product_name": "Yaourt nature"}]}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        with patch.object(OpenFoodFactsAPI, "SEARCH_CACHE", SearchCache()):
+            first = OpenFoodFactsAPI.search_products("Yaourt")
+            second = OpenFoodFactsAPI().search_products("  yaourt ")
+
+        assert first == second
+        mock_get.assert_called_once()
+
+    @patch('utils.data.requests.Session.get')
+    def test_search_products_error_not_cached(self, mock_get):
+        """Une erreur réseau n'est pas mise en cache"""
+        mock_get.side_effect = Exception("API Error")
+
+        cache = SearchCache()
+        with patch.object(OpenFoodFactsAPI, "SEARCH_CACHE", cache):
+            OpenFoodFactsAPI.search_products("nutella")
+
+        assert len(cache) == 0
+
+
+class TestOpenFoodFactsBatch:
+    """Tests pour la récupération groupée de produits"""
+
+    @staticmethod
+    def _fake_get(url, **kwargs):
+        """Réponse simulée selon le code-barres de l'URL"""
+        barcode = url.rsplit("/", 1)[-1].removesuffix(".json")
+        if barcode == "500":
+            raise Exception("Server Error")
+
+        response = Mock()
+        response.raise_for_status = Mock()
+        if barcode == "404":
+            response.json.return_value = {"status": 0}
+        else:
+            response.json.return_value = {"status": 1, "product": {"code": barcode}}
+        return response
+
+    @patch('utils.data.requests.Session.get')
+    def test_results_in_input_order(self, mock_get):
+        """Résultats dans l'ordre d'entrée, doublons conservés mais récupérés une fois"""
+        mock_get.side_effect = self._fake_get
+
+        products, errors = OpenFoodFactsAPI.get_products(["3", "1", "2", "1"])
+
+        assert [p["code"] for p in products] == ["3", "1", "2", "1"]
+        assert errors == {}
+        assert mock_get.call_count == 3
+
+    @patch('utils.data.requests.Session.get')
+    def test_per_barcode_errors(self, mock_get):
+        """Les erreurs sont reportées par code-barres sans bloquer le lot"""
+        mock_get.side_effect = self._fake_get
+
+        products, errors = OpenFoodFactsAPI.get_products(["1", "404", "500"])
+
+        assert products[0] == {"code": "1"}
+        assert products[1] is None
+        assert products[2] is None
+        assert errors["404"] == "Produit introuvable"
+        assert "Server Error" in errors["500"]
+
+    @patch('utils.data.requests.Session.get')
+    def test_cache_hits_served_first(self, mock_get, tmp_path):
+        """Les produits en cache ne déclenchent pas d'appel réseau"""
+        mock_get.side_effect = self._fake_get
+        cache = ProductCache(str(tmp_path / "products.sqlite"))
+        cache.set("1", {"code": "1", "product_name": "En cache"})
+
+        with patch.object(OpenFoodFactsAPI, "PRODUCT_CACHE", cache):
+            products, _ = OpenFoodFactsAPI.get_products(["1", "2"])
+
+        assert products[0]["product_name"] == "En cache"
+        assert mock_get.call_count == 1
+        assert cache.get("2") == {"code": "2"}
+
+    def test_empty_input(self):
+        """Liste vide: aucun appel, résultat vide"""
+        assert OpenFoodFactsAPI.get_products([]) == ([], {})
+
+
+class TestOpenFoodFactsPagination:
+    """Tests pour l'itérateur de recherche paginée"""
+
+    @staticmethod
+    def _paged_get(total):
+        """Simule search.pl avec `total` résultats au total"""
+        def fake_get(url, params=None, **kwargs):
+            start = (params["page"] - 1) * params["page_size"]
+            stop = min(start + params["page_size"], total)
+            response = Mock()
+            response.raise_for_status = Mock()
+            response.json.return_value = {"products": [{"code": str(i)} for i in range(start, stop)]}
+            return response
+        return fake_get
+
+    @patch('utils.data.requests.Session.get')
+    def test_streams_all_pages(self, mock_get):
+        """Toutes les pages sont parcourues jusqu'à la dernière page incomplète"""
+        mock_get.side_effect = self._paged_get(25)
+
+        codes = [p["code"] for p in OpenFoodFactsAPI.iter_search("yaourt", page_size=10)]
+
+        assert codes == [str(i) for i in range(25)]
+        assert mock_get.call_count == 3
+
+    @patch('utils.data.requests.Session.get')
+    def test_lazy_fetching(self, mock_get):
+        """Sans préchargement, la page suivante n'est demandée qu'à la consommation"""
+        mock_get.side_effect = self._paged_get(100)
+
+        results = OpenFoodFactsAPI.iter_search("yaourt", page_size=10)
+        assert mock_get.call_count == 0
+
+        first_page = list(islice(results, 10))
+        assert len(first_page) == 10
+        assert mock_get.call_count == 1
+
+        next(results)
+        assert mock_get.call_count == 2
+        results.close()
+
+    @patch('utils.data.requests.Session.get')
+    def test_prefetch_ahead(self, mock_get):
+        """Avec prefetch, les pages suivantes sont chargées en avance"""
+        mock_get.side_effect = self._paged_get(100)
+
+        results = OpenFoodFactsAPI.iter_search("yaourt", page_size=10, prefetch=2)
+        next(results)
+        # Les pages d'avance sont chargées par des threads: laisser le temps aux appels d'arriver
+        for _ in range(200):
+            if mock_get.call_count >= 3:
+                break
+            time.sleep(0.01)
+
+        pages = sorted(call[1]["params"]["page"] for call in mock_get.call_args_list)
+        assert pages == [1, 2, 3]
+        results.close()
+
+    @patch('utils.data.requests.Session.get')
+    def test_max_results_cap(self, mock_get):
+        """max_results borne le total et le nombre de pages demandées"""
+        mock_get.side_effect = self._paged_get(1000)
+
+        results = list(OpenFoodFactsAPI.iter_search("yaourt", page_size=10, max_results=15, prefetch=3))
+
+        assert len(results) == 15
+        assert mock_get.call_count == 2
+
+    @patch('utils.data.requests.Session.get')
+    def test_error_stops_iteration(self, mock_get):
+        """Une erreur réseau termine l'itération proprement"""
+        mock_get.side_effect = Exception("API Error")
+
+        assert list(OpenFoodFactsAPI.iter_search("yaourt")) == []
+
+
+class TestOpenFoodFactsFields:
+    """Tests pour la projection des champs (paramètre fields=)"""
+
+    @staticmethod
+    def _ok_response(payload):
+        response = Mock()
+        response.raise_for_status = Mock()
+        response.json.return_value = payload
+        return response
+
+    @patch('utils.data.requests.Session.get')
+    def test_search_requests_default_fields(self, mock_get):
+        """La recherche ne demande que les champs utiles"""
+        mock_get.return_value = self._ok_response({"products": []})
+
+        OpenFoodFactsAPI.search_products("nutella")
+
+        fields = mock_get.call_args[1]["params"]["fields"].split(",")
+        assert "product_name" in fields
+        assert "nutriments" in fields
+        assert "images" not in fields
+
+    @patch('utils.data.requests.Session.get')
+    def test_get_product_requests_default_fields(self, mock_get):
+        """La fiche produit ne demande que les champs utiles"""
+        mock_get.return_value = self._ok_response({"status": 0})
+
+        OpenFoodFactsAPI.get_product("3017620422003")
+
+        assert mock_get.call_args[1]["params"]["fields"] == ",".join(OpenFoodFactsAPI.FIELDS)
+
+    @patch('utils.data.requests.Session.get')
+    def test_extra_fields(self, mock_get):
+        """Les appelants peuvent demander des champs supplémentaires"""
+        mock_get.return_value = self._ok_response({"products": []})
+
+        OpenFoodFactsAPI.search_products("nutella", extra_fields=["ecoscore_grade", "code"])
+
+        fields = mock_get.call_args[1]["params"]["fields"].split(",")
+        assert fields[-1] == "ecoscore_grade"
+        assert fields.count("code") == 1
+
+    @patch('utils.data.requests.Session.get')
+    def test_projection_disabled(self, mock_get):
+        """FIELDS = None renvoie au JSON complet"""
+        mock_get.return_value = self._ok_response({"products": []})
+
+        with patch.object(OpenFoodFactsAPI, "FIELDS", None):
+            OpenFoodFactsAPI.search_products("nutella")
+
+        assert "fields" not in mock_get.call_args[1]["params"]
+
+    @patch('utils.data.requests.Session.get')
+    def test_extra_fields_bypass_product_cache(self, mock_get, tmp_path):
+        """Le cache (champs par défaut) n'est pas servi quand des champs en plus sont demandés"""
+        mock_get.return_value = self._ok_response({"status": 1, "product": {"code": "1", "ecoscore_grade": "b"}})
+        cache = ProductCache(str(tmp_path / "products.sqlite"))
+        cache.set("1", {"code": "1"})
+
+        with patch.object(OpenFoodFactsAPI, "PRODUCT_CACHE", cache):
+            product = OpenFoodFactsAPI.get_product("1", extra_fields=["ecoscore_grade"])
+
+        assert product["ecoscore_grade"] == "b"
+        assert cache.get("1") == {"code": "1"}
+
+    def test_extract_uses_ingredients_text(self):
+        """Sans liste d'ingrédients (réponse projetée), le texte brut est utilisé"""
+        info = OpenFoodFactsAPI.extract_product_info({"ingredients_text": "Sucre, huile de palme"})
+
+        assert info["ingredients"] == "Sucre, huile de palme"
+
+
+class TestOpenFoodFactsFrame:
+    """Tests pour l'extraction groupée en DataFrame"""
+
+    PRODUCTS = [
+        {"code": "1", "product_name": "Nutella", "nutriscore_grade": "e", "nova_group": 4,
+         "nutriments": {"sugars_100g": 56.3, "proteins_100g": "6.3"}},
+        {"code": "2", "product_name": "", "nutriscore": {"grade": "b"}, "nova_group": "3"},
+        {"code": "3", "nutriscore_grade": "unknown", "nutriments": {"sugars_100g": "n/a"}},
+        {"code": "4", "product_name": "Compote", "nutriscore_grade": "a", "nova_group": 1},
+    ]
+
+    def test_frame_columns_and_types(self):
+        """Colonnes typées: grade ordonné, NOVA entier nullable, nutriments float"""
+        frame = OpenFoodFactsAPI.extract_products_frame(self.PRODUCTS)
+
+        assert list(frame["code"]) == ["1", "2", "3", "4"]
+        assert frame["nutriscore_grade"].dtype.ordered
+        assert str(frame["nova_group"].dtype) == "Int8"
+        assert frame["sugars_100g"].dtype == "float64"
+        assert frame.loc[0, "proteins_100g"] == 6.3
+
+    def test_frame_missing_values(self):
+        """Valeurs absentes ou invalides: défauts textuels et NA"""
+        frame = OpenFoodFactsAPI.extract_products_frame(self.PRODUCTS)
+
+        assert frame.loc[1, "product_name"] == "Nom inconnu"
+        assert frame.loc[1, "nutriscore_grade"] == "B"
+        assert pd.isna(frame.loc[2, "nutriscore_grade"])
+        assert pd.isna(frame.loc[2, "nova_group"])
+        assert pd.isna(frame.loc[2, "sugars_100g"])
+
+    def test_frame_matches_single_extraction(self):
+        """Cohérent avec extract_product_info produit par produit"""
+        frame = OpenFoodFactsAPI.extract_products_frame(self.PRODUCTS)
+
+        for row, product in zip(frame.itertuples(), self.PRODUCTS):
+            info = OpenFoodFactsAPI.extract_product_info(product)
+            assert row.product_name == info["product_name"]
+            assert row.brands == info["brands"]
+
+    def test_empty_frame(self):
+        """Liste vide: DataFrame vide avec les colonnes attendues"""
+        frame = OpenFoodFactsAPI.extract_products_frame([])
+
+        assert frame.empty
+        assert "nutriscore_grade" in frame.columns
+
+    def test_better_alternatives(self):
+        """Alternatives strictement meilleures, triées par Nutri-Score"""
+        alternatives = OpenFoodFactsAPI.better_alternatives(self.PRODUCTS, "E")
+
+        assert [alt["code"] for alt in alternatives] == ["4", "2"]
+
+    def test_better_alternatives_ungraded_product(self):
+        """Produit sans grade: meilleurs produits notés"""
+        alternatives = OpenFoodFactsAPI.better_alternatives(self.PRODUCTS, "N/A", limit=1)
+
+        assert [alt["code"] for alt in alternatives] == ["4"]
+
+    @pytest.mark.parametrize("raw_grade", ["unknown", "not-applicable", ""])
+    def test_unknown_grade_is_computed(self, raw_grade):
+        """Grade OFF non attribué: calculé sur les nutriments, identique dans les deux extractions"""
+        product = {
+            "code": "9", "product_name": "Pâte à tartiner", "nutriscore_grade": raw_grade,
+            "categories": "Pâtes à tartiner",
+            "nutriments": {"energy-kcal_100g": 538, "saturated-fat_100g": 10.6, "sugars_100g": 56.3,
+                           "sodium_100g": 0.0428, "fiber_100g": 0, "proteins_100g": 6.3},
+        }
+
+        info = OpenFoodFactsAPI.extract_product_info(product)
+        frame = OpenFoodFactsAPI.extract_products_frame([product])
+
+        assert info["nutriscore"] == "E"
+        assert frame.loc[0, "nutriscore_grade"] == info["nutriscore"]
+
+    def test_alternatives_query(self):
+        """Recherche des alternatives: première catégorie, sinon premier mot du nom"""
+        assert OpenFoodFactsAPI.alternatives_query({"categories": "Pâtes à tartiner, Chocolat"}) == "Pâtes à tartiner"
+        assert OpenFoodFactsAPI.alternatives_query({"categories": "", "product_name": "Nutella B-ready"}) == "Nutella"
+
+
+class TestOpenFoodFactsSession:
+    """Tests pour la session HTTP partagée"""
+
+    def teardown_method(self):
+        OpenFoodFactsAPI.configure(CONNECT_TIMEOUT=3.05, READ_TIMEOUT=10.0, MAX_RETRIES=3)
+
+    def test_session_is_shared(self):
+        """La même session keep-alive est réutilisée"""
+        assert OpenFoodFactsAPI.get_session() is OpenFoodFactsAPI.get_session()
+
+    def test_session_retry_settings(self):
+        """Retries sur 429/5xx avec backoff et jitter"""
+        adapter = OpenFoodFactsAPI.get_session().get_adapter(OpenFoodFactsAPI.BASE_URL)
+        retry = adapter.max_retries
+
+        assert retry.total == OpenFoodFactsAPI.MAX_RETRIES
+        assert 429 in retry.status_forcelist
+        assert 503 in retry.status_forcelist
+        assert retry.backoff_jitter > 0
+        assert adapter._pool_maxsize == OpenFoodFactsAPI.POOL_SIZE
+
+    def test_configure_recreates_session(self):
+        """configure() applique les réglages à une nouvelle session"""
+        old_session = OpenFoodFactsAPI.get_session()
+        OpenFoodFactsAPI.configure(MAX_RETRIES=5)
+
+        new_session = OpenFoodFactsAPI.get_session()
+        assert new_session is not old_session
+        assert new_session.get_adapter(OpenFoodFactsAPI.BASE_URL).max_retries.total == 5
+
+    def test_configure_unknown_setting(self):
+        """Un réglage inconnu lève une erreur"""
+        with pytest.raises(ValueError):
+            OpenFoodFactsAPI.configure(timeout=1)
+
+    @patch('utils.data.requests.Session.get')
+    def test_timeouts_passed(self, mock_get):
+        """Les timeouts connexion/lecture sont transmis à chaque requête"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"products": []}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        OpenFoodFactsAPI.configure(CONNECT_TIMEOUT=1.5, READ_TIMEOUT=4.0)
+        OpenFoodFactsAPI.search_products("test")
+
+        assert mock_get.call_args[1]["timeout"] == (1.5, 4.0)
+
 
 # Tests d'intégration (optionnels, décommenter pour tester avec la vraie API)
 """
@@ -0,0 +1,171 @@
+"""Tests unitaires pour utils/ingest.py"""
+
+import gzip
+import json
+import os
+import pytest
+from unittest.mock import patch
+from utils.ingest import iter_raw_chunks, normalize_chunk, parallel_ingest
+from utils.store import LocalProductStore
+
+PRODUCTS = [
+    {"code": f"30000000000{i:02d}", "product_name": f"Produit {i}", "brands": "Marque",
+     "nutriscore_grade": "abcde"[i % 5], "nutriments": {"sugars_100g": i}, "unique_scans_n": i}
+    for i in range(10)
+]
+
+CSV_HEADER = ["code", "url", "product_name", "brands", "nutriscore_grade", "sugars_100g"]
+
+
+@pytest.fixture
+def jsonl_export(tmp_path):
+    """Export JSONL compressé de 10 produits (avec une ligne invalide)"""
+    path = tmp_path / "products.jsonl.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for i, product in enumerate(PRODUCTS):
+            f.write(json.dumps(product) + "\n")
+            if i == 4:
+                f.write("{tronqué\n")
+    return str(path)
+
+
+@pytest.fixture
+def csv_export(tmp_path):
+    """Export CSV tabulé compressé de 5 produits"""
+    path = tmp_path / "products.csv.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write("\t".join(CSV_HEADER) + "\n")
+        for i in range(5):
+            f.write("\t".join([f"40000000000{i:02d}", "http://x", f"Produit {i}", "Marque", "b", str(i)]) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    local_store = LocalProductStore(str(tmp_path / "off.duckdb"))
+    yield local_store
+    local_store.close()
+
+
+class TestChunks:
+    """Tests pour le découpage et la normalisation des lots"""
+
+    def test_iter_raw_chunks_numbers_chunks(self, jsonl_export):
+        """Lots numérotés à partir de 0, le dernier peut être incomplet"""
+        chunks = list(iter_raw_chunks(jsonl_export, chunk_size=4))
+
+        assert [index for index, _ in chunks] == [0, 1, 2]
+        assert [len(lines) for _, lines in chunks] == [4, 4, 3]
+
+    def test_iter_raw_chunks_skips_csv_header(self, csv_export):
+        """L'en-tête CSV n'est pas compté comme une ligne de données"""
+        chunks = list(iter_raw_chunks(csv_export, chunk_size=10))
+        assert len(chunks[0][1]) == 5
+
+    def test_normalize_chunk_skips_invalid_json(self):
+        """Une ligne JSON invalide est ignorée, pas le lot entier"""
+        frame = normalize_chunk(['{"code": "1", "nutriscore_grade": "b"}\n', "{tronqué\n", "\n"])
+
+        assert list(frame["code"]) == ["1"]
+        assert list(frame["nutriscore_grade"]) == ["B"]
+
+    def test_normalize_chunk_deduplicates(self):
+        """Un code-barres en double dans un lot garde la dernière version, les lignes sans code sont ignorées"""
+        frame = normalize_chunk([
+            '{"code": "1", "product_name": "v1"}\n', '{"code": "1", "product_name": "v2"}\n', '{"product_name": "sans code"}\n',
+        ])
+
+        assert list(frame["product_name"]) == ["v2"]
+
+    def test_normalize_chunk_csv(self):
+        """Avec un en-tête, le lot est lu comme du CSV tabulé"""
+        frame = normalize_chunk(["1\thttp://x\tNutella\tFerrero\te\t56.3\n"], header=CSV_HEADER)
+
+        assert frame.iloc[0]["product_name"] == "Nutella"
+        assert frame.iloc[0]["sugars_100g"] == 56.3
+        assert "url" not in frame.columns
+
+
+class TestParallelIngest:
+    """Tests pour l'import parallèle avec reprise"""
+
+    def test_ingest_jsonl(self, store, jsonl_export):
+        """Tous les produits valides sont importés, progression rapportée par lot"""
+        progress = []
+        total = parallel_ingest(store, jsonl_export, chunk_size=3, workers=2,
+                                progress=lambda *args: progress.append(args))
+
+        assert total == 10
+        assert store.count() == 10
+        assert [chunks for chunks, _, _ in progress] == [1, 2, 3, 4]
+        assert progress[-1][1] == 10
+        assert store.get_product("3000000000007")["nutriments"] == {"sugars_100g": 7.0}
+
+    def test_ingest_csv(self, store, csv_export):
+        """Export CSV: même résultat que l'import séquentiel"""
+        assert parallel_ingest(store, csv_export, chunk_size=2, workers=2, progress=None) == 5
+        assert store.get_product("4000000000003")["nutriscore_grade"] == "B"
+
+    def test_resume_after_failure(self, store, jsonl_export):
+        """Après une interruption, l'import reprend après le dernier lot validé"""
+        original = LocalProductStore.commit_chunk
+
+        def failing_commit(self, frame, source, chunk_index):
+            if chunk_index == 2:
+                raise RuntimeError("interrompu")
+            return original(self, frame, source, chunk_index)
+
+        with patch.object(LocalProductStore, "commit_chunk", failing_commit):
+            with pytest.raises(RuntimeError):
+                parallel_ingest(store, jsonl_export, chunk_size=3, workers=1, progress=None)
+
+        assert store.count() == 5  # lots 0 et 1 (dont la ligne invalide)
+        assert store.last_committed_chunk(jsonl_export) == 1
+
+        resumed = parallel_ingest(store, jsonl_export, chunk_size=3, workers=1, progress=None)
+
+        assert resumed == 5
+        assert store.count() == 10
+
+    def test_restart_reimports_everything(self, store, jsonl_export):
+        """resume=False ignore le point de reprise"""
+        parallel_ingest(store, jsonl_export, chunk_size=3, workers=1, progress=None)
+
+        assert parallel_ingest(store, jsonl_export, chunk_size=3, workers=1, progress=None) == 0
+        assert parallel_ingest(store, jsonl_export, chunk_size=3, workers=1, resume=False, progress=None) == 10
+        assert store.count() == 10
+
+    def test_new_export_same_path(self, store, jsonl_export):
+        """Nouvel export au même chemin (empreinte différente): import complet, pas de reprise"""
+        parallel_ingest(store, jsonl_export, chunk_size=3, workers=1, progress=None)
+        assert store.ingest_state(os.path.abspath(jsonl_export))["completed"]
+
+        with gzip.open(jsonl_export, "wt", encoding="utf-8") as f:
+            for product in PRODUCTS:
+                f.write(json.dumps({**product, "product_name": "Nouveau nom"}) + "\n")
+        os.utime(jsonl_export, ns=(0, 10**18))
+
+        assert parallel_ingest(store, jsonl_export, chunk_size=3, workers=1, progress=None) == 10
+        assert store.get_product("3000000000007")["product_name"] == "Nouveau nom"
+
+    def test_resume_with_other_chunk_size(self, store, jsonl_export):
+        """Taille de lots différente de l'import interrompu: l'import recommence au début"""
+        original = LocalProductStore.commit_chunk
+
+        def failing_commit(self, frame, source, chunk_index):
+            if chunk_index == 1:
+                raise RuntimeError("interrompu")
+            return original(self, frame, source, chunk_index)
+
+        with patch.object(LocalProductStore, "commit_chunk", failing_commit):
+            with pytest.raises(RuntimeError):
+                parallel_ingest(store, jsonl_export, chunk_size=2, workers=1, progress=None)
+
+        assert parallel_ingest(store, jsonl_export, chunk_size=5, workers=1, progress=None) == 10
+        assert store.count() == 10
+        state = store.ingest_state(os.path.abspath(jsonl_export))
+        assert (state["chunk_size"], state["rows"], state["completed"]) == (5, 10, True)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
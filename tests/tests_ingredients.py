@@ -0,0 +1,88 @@
+"""Tests unitaires pour utils/ingredients.py"""
+
+import pytest
+from utils.data import OpenFoodFactsAPI
+from utils.ingredients import IngredientFacts, IngredientMatcher, default_matcher, extract_facts, normalize_text
+
+NUTELLA = (
+    "Sucre, huile de palme, NOISETTES 13%, cacao maigre 7,4%, LAIT écrémé en poudre 6,6%, "
+    "LACTOSÉRUM en poudre, émulsifiants: lécithines [SOJA], vanilline."
+)
+COCA_COLA = (
+    "Eau gazéifiée, sucre, colorant : E150d, acidifiant : acide phosphorique, "
+    "arômes naturels (extraits végétaux dont caféine)."
+)
+
+
+class TestIngredientMatcher:
+    """Tests pour l'extraction d'additifs, d'allergènes et de marqueurs"""
+
+    def test_normalize_text(self):
+        """Minuscules, sans accents, ponctuation remplacée par des espaces"""
+        assert normalize_text("Lécithines [SOJA], Œufs") == "lecithines  soja   oeufs"
+
+    def test_nutella(self):
+        """Allergènes, additif nommé (lécithines -> E322) et émulsifiant"""
+        assert extract_facts(NUTELLA) == IngredientFacts(
+            additives=("E322",),
+            allergens=("fruits à coque", "lait", "soja"),
+            ultra_processing=("émulsifiant",),
+        )
+
+    def test_e_numbers(self):
+        """Codes E en toutes écritures, avec lettre de variante, mais pas au milieu d'un nombre"""
+        facts = extract_facts("E 322, E-471, e1000, E150d, conservateur (E223), e4711, lot 1E1002")
+
+        assert facts.additives == ("E150d", "E223", "E322", "E471", "E1000")
+
+    def test_sulfite_additives_are_allergens(self):
+        """E220 à E228: allergène sulfites"""
+        assert extract_facts("vin, conservateur : E224").allergens == ("sulfites",)
+
+    def test_whole_words_only(self):
+        """Un terme au milieu d'un mot n'est pas retenu (blé mais pas "tableau")"""
+        assert extract_facts("tableau, oeillet").allergens == ()
+        assert extract_facts("farine de BLÉ").allergens == ("gluten",)
+
+    def test_ignored_terms(self):
+        """Noix de coco, beurre de cacao: ni fruit à coque ni lait"""
+        assert extract_facts("noix de coco râpée, beurre de cacao, lait de coco").allergens == ()
+        assert extract_facts("noix de coco, noix de cajou").allergens == ("fruits à coque",)
+
+    def test_negations(self):
+        """Mentions "sans ...", "ni ...", "without ..." et "... free": termes non retenus"""
+        assert extract_facts("Sans gluten. Farine de riz").allergens == ()
+        assert extract_facts("riz, sucre, sans lactose ni oeufs").allergens == ()
+        assert extract_facts("rice flour, milk. Gluten-free, without eggs").allergens == ("lait",)
+        assert extract_facts("farine de blé, sans colorants").allergens == ("gluten",)
+        assert extract_facts("farine de blé, sans colorants").ultra_processing == ()
+
+    def test_overlapping_patterns(self):
+        """Motifs imbriqués trouvés en une passe (liens d'échec)"""
+        matcher = IngredientMatcher([("he", "t", "he"), ("she", "t", "she"), ("hers", "t", "hers")])
+
+        assert [label for _, _, _, label in matcher.matches("she hers")] == ["she", "hers"]
+        assert [label for _, _, _, label in matcher.matches("ushers")] == []
+
+    def test_empty(self):
+        """Texte vide ou absent: aucun fait"""
+        assert extract_facts("") == IngredientFacts()
+        assert extract_facts(None) == IngredientFacts()
+
+    def test_extract_many(self):
+        """Lot de textes: mêmes résultats que texte par texte"""
+        texts = [NUTELLA, COCA_COLA, None, NUTELLA]
+
+        assert default_matcher().extract_many(texts) == [extract_facts(t) for t in texts]
+
+    def test_product_info_fields(self):
+        """extract_product_info expose les faits comme champs structurés"""
+        info = OpenFoodFactsAPI.extract_product_info({"product_name": "Coca-Cola", "ingredients_text": COCA_COLA})
+
+        assert info["additives"] == ("E150d",)
+        assert info["ultra_processing"] == ("arômes", "colorant")
+        assert info["detected_allergens"] == ()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,141 @@
+"""Tests unitaires pour utils/nutrient_knn.py"""
+
+import numpy as np
+import pytest
+from utils.nutrient_knn import NutrientKNN, build_from_store, nutrient_vector
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+
+SPREADS = "Petit-déjeuners, Produits à tartiner, Pâtes à tartiner"
+JAMS = "Petit-déjeuners, Produits à tartiner, Confitures"
+
+
+def product(code, categories, grade, kcal, fat, sugars, proteins, **extra):
+    nutriments = {
+        "energy-kcal_100g": kcal,
+        "fat_100g": fat,
+        "saturated-fat_100g": fat / 3 if fat is not None else None,
+        "sugars_100g": sugars,
+        "salt_100g": 0.1,
+        "fiber_100g": 3,
+        "proteins_100g": proteins,
+    }
+    nutriments.update(extra)
+    return {"code": code, "categories": categories, "nutriscore_grade": grade, "nutriments": nutriments}
+
+
+PRODUCTS = [
+    product("nutella", SPREADS, "e", 539, 30.9, 56.3, 6.3),
+    product("nocciolata", SPREADS, "d", 545, 32, 48, 7),
+    product("allegee", SPREADS, "c", 450, 20, 35, 8),
+    product("puree", "Petit-déjeuners, Produits à tartiner, Purées d'oléagineux", "a", 620, 50, 5, 25),
+    product("confiture", JAMS, "c", 240, 0.1, 58, 0.5),
+    product("confiture-e", JAMS, "e", 250, 0.1, 60, 0.5),
+    product("inconnu", SPREADS, None, 540, 31, 55, 6),
+    {"code": "vide", "categories": SPREADS, "nutriscore_grade": "a", "nutriments": {}},
+]
+
+
+@pytest.fixture
+def knn():
+    return NutrientKNN.build(PRODUCTS)
+
+
+class TestNutrientKNN:
+    """Tests pour le kNN nutritionnel"""
+
+    def test_nutrient_vector(self):
+        """Nutriments imbriqués (OFF) ou à plat (miroir), NaN si absents"""
+        nested = nutrient_vector(PRODUCTS[0])
+        flat = nutrient_vector({"energy-kcal_100g": "539", "fat_100g": 30.9})
+
+        assert nested[0] == pytest.approx(539)
+        assert flat[0] == pytest.approx(539) and np.isnan(flat[2])
+
+    def test_build_ignores_empty_profiles(self, knn):
+        """Produits sans aucun nutriment ignorés"""
+        assert len(knn) == 7
+        assert knn.row("vide") is None
+        assert knn.row("nutella") is not None
+
+    def test_same_category_first(self, knn):
+        """Le profil le plus proche et mieux noté de la même catégorie d'abord"""
+        assert knn.similar_better(PRODUCTS[0], k=2) == ["nocciolata", "allegee"]
+
+    def test_fallback_to_all_categories(self, knn):
+        """Pas assez de candidats dans la catégorie: complétés par le catalogue entier"""
+        results = knn.similar_better(PRODUCTS[0], k=4)
+
+        assert results[:2] == ["nocciolata", "allegee"]
+        assert set(results[2:]) <= {"confiture", "puree"} and len(results) == 4
+
+    def test_strictly_better_only(self, knn):
+        """Même Nutri-Score ou moins bon: exclu, y compris le produit lui-même"""
+        results = knn.similar_better(PRODUCTS[2], k=5)
+
+        assert results == ["puree"]
+        assert knn.similar_better(PRODUCTS[3]) == []
+
+    def test_nearest_distances(self, knn):
+        """Distances croissantes, produit exclu sur demande"""
+        results = knn.nearest(nutrient_vector(PRODUCTS[1]), "E", k=3, exclude="nocciolata")
+        distances = [d for _, d in results]
+
+        assert "nocciolata" not in [c for c, _ in results]
+        assert distances == sorted(distances)
+
+    def test_unknown_product(self, knn):
+        """Produit absent de la matrice: interrogé par son vecteur, valeurs manquantes complétées"""
+        query = product("nouveau", JAMS, "d", 245, None, 59, None)
+
+        assert knn.similar_better(query, k=1) == ["confiture"]
+
+    def test_unknown_grade_and_category(self, knn):
+        """Nutri-Score inconnu: n'importe quel produit noté; catégorie inconnue: tout le catalogue"""
+        assert knn.similar_better(PRODUCTS[6], k=1) == ["nutella"]
+        assert knn.similar_better(product("x", "Surgelés", "e", 540, 31, 55, 6), k=1) == ["nocciolata"]
+
+    def test_empty_vector(self, knn):
+        """Aucun nutriment connu: aucune alternative"""
+        assert knn.similar_better({"code": "x", "nutriscore_grade": "e"}) == []
+
+    def test_save_load_roundtrip(self, knn, tmp_path):
+        """La matrice rechargée répond de la même façon"""
+        path = str(tmp_path / "nutrients")
+        knn.save(path)
+
+        assert NutrientKNN.load(path).similar_better(PRODUCTS[0], k=4) == knn.similar_better(PRODUCTS[0], k=4)
+
+    def test_load_is_memory_mapped(self, knn, tmp_path):
+        """Tableaux projetés en lecture seule depuis les fichiers, codes-barres à largeur fixe"""
+        path = str(tmp_path / "nutrients")
+        knn.save(path)
+        loaded = NutrientKNN.load(path)
+
+        assert isinstance(loaded.matrix, np.memmap) and not loaded.matrix.flags.writeable
+        assert isinstance(loaded.barcodes, np.memmap) and loaded.barcodes.dtype.kind == "S"
+        assert loaded.row("nutella") == knn.row("nutella")
+        assert loaded.row("code-barres-plus-long-que-tous-les-autres") is None
+
+    def test_load_in_memory(self, knn, tmp_path):
+        """mmap=False: copie en mémoire, mêmes réponses"""
+        path = str(tmp_path / "nutrients")
+        knn.save(path)
+        loaded = NutrientKNN.load(path, mmap=False)
+
+        assert not isinstance(loaded.matrix, np.memmap)
+        assert loaded.similar_better(PRODUCTS[0], k=2) == ["nocciolata", "allegee"]
+
+    def test_build_from_store(self, tmp_path):
+        """Construit depuis les colonnes à plat du miroir local"""
+        store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        try:
+            store.upsert_frame(to_store_frame(products_to_frame(PRODUCTS)))
+            knn = build_from_store(store)
+
+            assert knn.similar_better(PRODUCTS[0], k=2) == ["nocciolata", "allegee"]
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,123 @@
+"""Tests unitaires pour utils/nutriscore.py"""
+
+import numpy as np
+import pytest
+from utils.data import OpenFoodFactsAPI
+from utils.nutriscore import (
+    BEVERAGE, CHEESE, GENERAL, compute_grade, compute_grades, nutrient_matrix, nutriscore_grades,
+    nutriscore_scores, product_kind, validate_against_store,
+)
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+
+# Produits OFF réels (nutriments pour 100g) et leur Nutri-Score officiel
+NUTELLA = {
+    "code": "3017620422003",
+    "categories": "Petit-déjeuners, Produits à tartiner, Produits à tartiner sucrés, Pâtes à tartiner",
+    "nutriments": {
+        "energy_100g": 2252, "fat_100g": 30.9, "saturated-fat_100g": 10.6, "sugars_100g": 56.3,
+        "fiber_100g": 0, "proteins_100g": 6.3, "salt_100g": 0.107,
+    },
+}
+COCA_COLA = {
+    "code": "5449000000996",
+    "categories": "Boissons, Boissons gazeuses, Sodas, Sodas au cola",
+    "nutriments": {
+        "energy_100g": 180, "fat_100g": 0, "saturated-fat_100g": 0, "sugars_100g": 10.6,
+        "proteins_100g": 0, "salt_100g": 0,
+    },
+}
+CRISTALINE = {
+    "code": "3274080005003",
+    "categories": "Boissons, Eaux, Eaux de sources",
+    "nutriments": {"energy_100g": 0, "fat_100g": 0, "saturated-fat_100g": 0, "sugars_100g": 0, "salt_100g": 0},
+}
+OATS = {
+    "code": "flocons",
+    "categories": "Céréales et pommes de terre, Céréales pour petit-déjeuner, Flocons d'avoine",
+    "nutriments": {
+        "energy_100g": 1555, "fat_100g": 7, "saturated-fat_100g": 1.3, "sugars_100g": 1.1,
+        "fiber_100g": 10, "proteins_100g": 13, "salt_100g": 0.01,
+    },
+}
+OFFICIAL = {"3017620422003": "E", "5449000000996": "E", "3274080005003": "A", "flocons": "A"}
+
+
+class TestNutriScore:
+    """Tests pour le calcul du Nutri-Score"""
+
+    def test_official_grades(self):
+        """Même grade que le Nutri-Score officiel des produits de référence"""
+        products = [NUTELLA, COCA_COLA, CRISTALINE, OATS]
+
+        assert compute_grades(products) == [OFFICIAL[p["code"]] for p in products]
+
+    def test_nutella_score(self):
+        """Détail des points: N = 6 + 10 + 10 + 0, protéines ignorées (N >= 11)"""
+        scores = nutriscore_scores(nutrient_matrix([NUTELLA]), [GENERAL])
+
+        assert scores[0] == 26
+
+    def test_product_kind(self):
+        """Famille déduite de la catégorie OFF"""
+        assert product_kind(COCA_COLA["categories"]) == BEVERAGE
+        assert product_kind("Produits laitiers, Fromages, Fromages de vache") == CHEESE
+        assert product_kind(NUTELLA["categories"]) == GENERAL
+
+    def test_cheese_counts_proteins(self):
+        """Fromages: protéines comptées même quand N >= 11"""
+        cheese = nutrient_matrix([{"nutriments": {
+            "energy_100g": 1500, "saturated-fat_100g": 17, "sugars_100g": 0.5, "salt_100g": 1.6, "proteins_100g": 22,
+        }}])
+
+        assert nutriscore_scores(cheese, [CHEESE])[0] == nutriscore_scores(cheese, [GENERAL])[0] - 5
+
+    def test_energy_in_kcal_and_sodium(self):
+        """Énergie en kcal et sodium acceptés à défaut de kJ et de sel"""
+        product = {"nutriments": {
+            "energy-kcal_100g": 538, "saturated-fat_100g": 10.6, "sugars_100g": 56.3, "sodium_100g": 0.0428,
+        }}
+
+        assert compute_grade(product) == "E"
+
+    def test_missing_required_nutrients(self):
+        """Nutriment requis absent ou boisson alcoolisée: pas de grade"""
+        assert compute_grade({"nutriments": {"energy_100g": 100, "sugars_100g": 1}}) is None
+        assert compute_grade({}) is None
+        assert compute_grade({**COCA_COLA, "categories": "Boissons, Boissons alcoolisées, Bières"}) is None
+
+    def test_batch_matches_single(self):
+        """Un lot vectorisé donne les mêmes grades que produit par produit"""
+        products = [NUTELLA, {}, COCA_COLA, OATS, CRISTALINE] * 20
+        kinds = np.array([product_kind(p.get("categories") or "") for p in products])
+        grades = nutriscore_grades(nutrient_matrix(products), kinds)
+
+        assert [g or None for g in grades.tolist()] == [compute_grade(p) for p in products]
+
+    def test_extract_product_info_fills_missing_grade(self):
+        """Produit sans grade: Nutri-Score calculé; grade officiel conservé sinon"""
+        assert OpenFoodFactsAPI.extract_product_info(NUTELLA)["nutriscore_grade"] == "E"
+        assert OpenFoodFactsAPI.extract_product_info({**NUTELLA, "nutriscore_grade": "d"})["nutriscore_grade"] == "D"
+
+    def test_better_alternatives_with_computed_grades(self):
+        """Les produits sans grade officiel participent au filtre des alternatives"""
+        alternatives = OpenFoodFactsAPI.better_alternatives([NUTELLA, OATS, COCA_COLA], "E")
+
+        assert [a["code"] for a in alternatives] == ["flocons"]
+
+    def test_validate_against_store(self, tmp_path):
+        """Comparaison aux grades officiels du miroir local"""
+        products = [{**p, "nutriscore_grade": OFFICIAL[p["code"]].lower()} for p in (NUTELLA, COCA_COLA, CRISTALINE, OATS)]
+        products.append({"code": "sans-nutriments", "nutriscore_grade": "c"})
+        store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        try:
+            store.upsert_frame(to_store_frame(products_to_frame(products)))
+
+            assert validate_against_store(store, batch_size=2) == {
+                "graded": 5, "computed": 4, "matching": 4, "within_one": 4,
+            }
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,73 @@
+"""Tests unitaires pour utils/product.py"""
+
+import math
+import pytest
+from utils.product import NUTRIENT_FIELDS, ProductInfo
+
+
+@pytest.fixture
+def nutella():
+    """Fiche produit de référence"""
+    return ProductInfo(
+        code="3017620422003",
+        product_name="Nutella",
+        brands="Ferrero",
+        nutriscore_grade="E",
+        nova_group=4,
+        nutriments={"proteins_100g": 6.3, "fat_100g": "30.9", "sugars_100g": None, "unknown_100g": 1},
+        categories="Pâtes à tartiner",
+    )
+
+
+class TestProductInfo:
+    """Tests pour la fiche produit compacte"""
+
+    def test_dict_access(self, nutella):
+        """Accès par clé comme l'ancien dict"""
+        assert nutella["product_name"] == "Nutella"
+        assert nutella.get("brands") == "Ferrero"
+        assert nutella.get("missing", "défaut") == "défaut"
+        assert nutella["nova_group"] == 4
+
+    def test_missing_key(self, nutella):
+        """Une clé inconnue lève KeyError"""
+        with pytest.raises(KeyError):
+            nutella["images"]
+
+    def test_keys_shape(self, nutella):
+        """Clés du dict historique, plus les faits extraits des ingrédients"""
+        assert set(nutella.keys()) == {
+            "code", "product_name", "brands", "nutriscore_grade", "nova_group",
+            "image_url", "ingredients", "allergens", "nutriments", "categories",
+            "additives", "detected_allergens", "ultra_processing",
+        }
+
+    def test_legacy_aliases(self, nutella):
+        """Les anciens noms de clés restent lisibles"""
+        assert nutella["name"] == "Nutella"
+        assert nutella["nutriscore"] == "E"
+        assert "name" not in list(nutella)
+
+    def test_nutriments_view(self, nutella):
+        """Seuls les nutriments renseignés et connus sont exposés"""
+        assert nutella["nutriments"] == {"proteins_100g": 6.3, "fat_100g": 30.9}
+        assert math.isnan(nutella.nutrient("sugars_100g"))
+
+    def test_empty_nutriments(self):
+        """Sans nutriments, la vue est un dict vide (falsy)"""
+        assert ProductInfo()["nutriments"] == {}
+        assert len(ProductInfo()._nutrients) == len(NUTRIENT_FIELDS)
+
+    def test_slots(self, nutella):
+        """Pas de __dict__ par instance"""
+        assert not hasattr(nutella, "__dict__")
+        with pytest.raises(AttributeError):
+            nutella.extra = 1
+
+    def test_equality_with_dict(self, nutella):
+        """Comparable au dict équivalent"""
+        assert nutella == nutella.to_dict()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,155 @@
+"""Tests unitaires pour utils/search_index.py"""
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+from utils.data import OpenFoodFactsAPI
+from utils.search_index import SearchIndex, build_from_store, stem, tokenize
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+
+PRODUCTS = [
+    {"code": "1", "product_name": "Pâte à tartiner aux noisettes", "brands": "Nutella",
+     "categories": "Pâtes à tartiner, Snacks sucrés", "unique_scans_n": 5000},
+    {"code": "2", "product_name": "Nocciolata", "brands": "Rigoni di Asiago",
+     "categories": "Pâtes à tartiner", "unique_scans_n": 800},
+    {"code": "3", "product_name": "Yaourt nature", "brands": "Danone",
+     "categories": "Produits laitiers, Yaourts", "unique_scans_n": 3000},
+    {"code": "4", "product_name": "Yaourts à la fraise", "brands": "Danone",
+     "categories": "Produits laitiers, Yaourts aux fruits", "unique_scans_n": 100},
+    {"code": "5", "product_name": "Yaourt nature", "brands": "Carrefour",
+     "categories": "Produits laitiers, Yaourts", "unique_scans_n": 9000},
+    {"product_name": "Sans code-barres"},
+]
+
+
+@pytest.fixture
+def index():
+    return SearchIndex.build(PRODUCTS)
+
+
+class TestTokenize:
+    """Tests pour la tokenisation française"""
+
+    def test_accents_case_and_stop_words(self):
+        """Minuscules, sans accents, sans mots vides"""
+        assert tokenize("Crème Brûlée À LA vanille") == ["crem", "brul", "vanill"]
+
+    def test_light_stemming(self):
+        """Pluriels et féminins se ramènent à la même racine"""
+        assert stem("yaourts") == stem("yaourt")
+        assert stem("sucrees") == stem("sucre") == "sucr"
+        assert stem("gateaux") == "gateau"
+        assert stem("1000") == "1000"
+
+    def test_empty(self):
+        """Texte vide ou None: aucun terme"""
+        assert tokenize("") == []
+        assert tokenize(None) == []
+
+
+class TestSearchIndex:
+    """Tests pour le classement BM25"""
+
+    def test_build_skips_products_without_code(self, index):
+        """Seuls les produits avec un code-barres sont indexés"""
+        assert len(index) == 5
+
+    def test_name_match_ranks_first(self, index):
+        """Un terme du nom compte plus qu'une catégorie"""
+        assert index.search("pate a tartiner")[0] == "1"
+        assert set(index.search("pate a tartiner")) == {"1", "2"}
+
+    def test_plural_and_accents_match(self, index):
+        """Pluriel et majuscules accentuées retrouvent le produit"""
+        assert set(index.search("yaourts")) == {"3", "4", "5"}
+        assert "1" in index.search("PÂTES")
+
+    def test_popularity_breaks_ties(self, index):
+        """À score égal, le produit le plus scanné d'abord"""
+        assert index.search("yaourt nature")[:2] == ["5", "3"]
+
+    def test_more_matching_terms_rank_higher(self, index):
+        """Les produits qui contiennent plus de termes de la requête passent devant"""
+        assert index.search("yaourt danone fraise")[0] == "4"
+
+    def test_pagination(self, index):
+        """Pages successives sans doublon"""
+        first = index.search("yaourt", page_size=2)
+        second = index.search("yaourt", page_size=2, page=2)
+
+        assert len(first) == 2 and len(second) == 1
+        assert not set(first) & set(second)
+
+    def test_unknown_terms(self, index):
+        """Requête sans terme connu: aucun résultat"""
+        assert index.search("quinoa") == []
+        assert index.search("les de la") == []
+
+    def test_save_load_roundtrip(self, index, tmp_path):
+        """L'index rechargé donne les mêmes résultats"""
+        path = str(tmp_path / "index.npz")
+        index.save(path)
+        loaded = SearchIndex.load(path)
+
+        assert len(loaded) == len(index)
+        assert loaded.search("yaourt nature") == index.search("yaourt nature")
+        assert loaded.search("nutella") == ["1"]
+
+    def test_single_term_impact_order(self, index):
+        """Un seul mot: meilleurs scores puis plus scannés, pages cohérentes avec une page unique"""
+        assert index.search("nature") == ["5", "3"]
+        pages = [code for page in (1, 2, 3) for code in index.search("yaourt", page_size=1, page=page)]
+        assert pages == index.search("yaourt", page_size=10)
+
+    def test_load_unordered_index(self, index, tmp_path):
+        """Index sauvegardé avant le rangement par impact: rangé au chargement, mêmes résultats"""
+        path = str(tmp_path / "old.npz")
+        vocabulary = sorted(index.terms, key=index.terms.get)
+        # Postings de chaque terme remis dans l'ordre des produits, comme l'ancien format
+        order = np.lexsort((index.postings, np.repeat(np.arange(len(index.offsets) - 1), np.diff(index.offsets))))
+        np.savez(
+            path, codes=index.codes, popularity=index.popularity, terms=np.asarray(vocabulary, dtype=str),
+            offsets=index.offsets, postings=index.postings[order], weights=index.weights[order],
+        )
+
+        loaded = SearchIndex.load(path)
+
+        for query in ("yaourt", "nature", "tartiner", "yaourt danone"):
+            assert loaded.search(query) == index.search(query)
+
+
+class TestStoreBackend:
+    """Tests pour l'index comme moteur de recherche du miroir local"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        local_store = LocalProductStore(str(tmp_path / "off.duckdb"))
+        local_store.upsert_frame(to_store_frame(products_to_frame(PRODUCTS)))
+        local_store.search_index = build_from_store(local_store, batch_size=2)
+        yield local_store
+        local_store.close()
+
+    def test_store_search_uses_index(self, store):
+        """search_products garde sa signature et renvoie des produits dans l'ordre BM25"""
+        results = store.search_products("yaourts nature", page_size=2)
+
+        assert [p["code"] for p in results] == ["5", "3"]
+        assert results[0]["brands"] == "Carrefour"
+
+    def test_get_many_keeps_order(self, store):
+        """Produits dans l'ordre demandé, codes inconnus ignorés"""
+        assert [p["code"] for p in store.get_many(["4", "inconnu", "1"])] == ["4", "1"]
+
+    def test_api_search_through_index(self, store):
+        """OpenFoodFactsAPI.search_products passe par l'index en mode local"""
+        with patch.object(OpenFoodFactsAPI, "DATA_SOURCE", "local"), \
+                patch.object(OpenFoodFactsAPI, "LOCAL_STORE", store), \
+                patch("utils.data.requests.Session.get") as mock_get:
+            results = OpenFoodFactsAPI.search_products("tartiner")
+
+        mock_get.assert_not_called()
+        assert [p["code"] for p in results] == ["1", "2"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
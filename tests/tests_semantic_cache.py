@@ -0,0 +1,129 @@
+"""Tests unitaires pour utils/semantic_cache.py"""
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+from utils.semantic_cache import SemanticCache, question_terms, vectorize
+
+
+@pytest.fixture
+def cache():
+    """Cache sémantique de petite taille"""
+    return SemanticCache(max_entries=3)
+
+
+class TestVectorize:
+    """Tests pour la vectorisation des questions"""
+
+    def test_normalized(self):
+        """Vecteur de norme 1, identique d'un appel à l'autre"""
+        vector = vectorize("C'est quoi le Nutri-Score ?")
+
+        assert vector.shape == (1024,)
+        assert np.linalg.norm(vector) == pytest.approx(1.0)
+        assert np.array_equal(vector, vectorize("C'est quoi le Nutri-Score ?"))
+
+    @pytest.mark.parametrize("variant", [
+        "Qu'est-ce que le Nutri-Score ?",
+        "c'est quoi le nutriscore",
+        "Le Nutri-Score, c'est quoi ?",
+    ])
+    def test_rewordings_match(self, variant):
+        """Reformulations (tournure, casse, accents, tiret) quasi identiques"""
+        assert vectorize(variant) @ vectorize("C'est quoi le Nutri-Score ?") >= 0.9
+
+    def test_distinct_questions(self):
+        """Questions différentes sous le seuil par défaut"""
+        assert vectorize("Quels sont les additifs cachés ?") @ vectorize("Quels sont les sucres cachés ?") < 0.9
+        assert vectorize("Comment lire le Nutri-Score ?") @ vectorize("C'est quoi le Nutri-Score ?") < 0.9
+
+    def test_single_letters_kept(self):
+        """Lettres isolées et chiffres gardés, élisions retirées"""
+        assert question_terms("C'est quoi un Nutri-Score A ?") == ["nutri", "score", "a"]
+        assert question_terms("Vitamine C et groupe NOVA 4") == ["vitamine", "c", "et", "groupe", "nova", "4"]
+
+    def test_empty(self):
+        """Texte sans mot: vecteur nul"""
+        assert not vectorize("?").any()
+
+
+class TestSemanticCache:
+    """Tests pour le cache des questions proches"""
+
+    def test_near_duplicate_hit(self, cache):
+        """Question reformulée: réponse en cache"""
+        cache.set("Qu'est-ce que le groupe NOVA ?", "Classification NOVA...")
+
+        assert cache.get("c'est quoi le groupe nova") == "Classification NOVA..."
+        assert cache.stats()["hits"] == 1
+
+    def test_miss(self, cache):
+        """Question différente: None et miss comptabilisé"""
+        cache.set("Quels sont les sucres cachés ?", "Sirop de glucose...")
+
+        assert cache.get("Qu'est-ce que le groupe NOVA ?") is None
+        assert cache.stats() == {"hits": 0, "misses": 1, "hit_rate": 0.0, "entries": 1}
+
+    @pytest.mark.parametrize("cached,question", [
+        ("Que veut dire un Nutri-Score A ?", "Que veut dire un Nutri-Score E ?"),
+        ("Bienfaits de la vitamine C ?", "Bienfaits de la vitamine D ?"),
+        ("Pourquoi éviter les additifs ?", "Pourquoi éviter les additifs E171 ?"),
+        ("Aliments du groupe NOVA 1 ?", "Aliments du groupe NOVA 4 ?"),
+        ("Produits sans gluten ?", "Produits avec gluten ?"),
+    ])
+    def test_near_identical_questions_miss(self, cache, cached, question):
+        """Questions presque identiques mais de réponses différentes: jamais servies par le cache"""
+        cache.set(cached, "Réponse")
+
+        assert cache.get(question) is None
+        assert cache.get(cached) == "Réponse"
+
+    def test_threshold(self):
+        """Seuil configurable"""
+        cache = SemanticCache(threshold=0.5)
+        cache.set("Pourquoi éviter les additifs ?", "Réponse")
+
+        assert cache.get("Pourquoi éviter le sucre ?") == "Réponse"
+
+    def test_namespaces(self, cache):
+        """Réponses séparées par namespace (provider/modèle)"""
+        cache.set("C'est quoi le Nutri-Score ?", "Réponse GPT", "openai:gpt-4o-mini")
+
+        assert cache.get("C'est quoi le Nutri-Score ?", "ollama:ollama/mistral") is None
+        assert cache.get("C'est quoi le Nutri-Score ?", "openai:gpt-4o-mini") == "Réponse GPT"
+
+    def test_expiration(self):
+        """Entrée expirée ignorée"""
+        cache = SemanticCache(ttl=60)
+        with patch("utils.semantic_cache.time.time", return_value=1000.0):
+            cache.set("C'est quoi le Nutri-Score ?", "Réponse")
+        with patch("utils.semantic_cache.time.time", return_value=1061.0):
+            assert cache.get("C'est quoi le Nutri-Score ?") is None
+
+    def test_oldest_replaced(self, cache):
+        """Cache plein: la plus ancienne entrée est remplacée"""
+        for question in ("Nutri-Score", "groupe NOVA", "additifs", "sucres cachés"):
+            cache.set(question, question.upper())
+
+        assert len(cache) == 3
+        assert cache.get("Nutri-Score") is None
+        assert cache.get("sucres cachés") == "SUCRES CACHÉS"
+
+    def test_long_text_ignored(self, cache):
+        """Texte long (contexte, liste de produits): jamais mis en cache"""
+        cache.set("produit " * 50, "Réponse")
+
+        assert len(cache) == 0
+
+    def test_clear(self, cache):
+        """Vide les entrées et les compteurs"""
+        cache.set("C'est quoi le Nutri-Score ?", "Réponse")
+        cache.get("C'est quoi le Nutri-Score ?")
+        cache.clear()
+
+        assert cache.get("C'est quoi le Nutri-Score ?") is None
+        assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,198 @@
+"""Tests unitaires pour utils/store.py"""
+
+import asyncio
+import gzip
+import json
+import subprocess
+import sys
+import pytest
+from unittest.mock import patch
+from utils.async_data import AsyncOpenFoodFactsAPI
+from utils.data import OpenFoodFactsAPI
+from utils.ingest import parallel_ingest
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+
+CSV_HEADER = [
+    "code", "url", "product_name", "brands", "categories", "nutriscore_grade", "nova_group",
+    "image_url", "ingredients_text", "allergens", "unique_scans_n", "last_modified_t",
+    "energy-kcal_100g", "fat_100g", "sugars_100g", "proteins_100g", "salt_100g",
+]
+CSV_ROWS = [
+    ["3017620422003", "http://x", "Nutella", "Ferrero", "Pâtes à tartiner", "e", "4",
+     "https://img/nutella.jpg", "Sucre, huile de palme, noisettes", "en:nuts", "5000", "1700000000",
+     "539", "30.9", "56.3", "6.3", "0.107"],
+    ["8000500310427", "http://x", "Nocciolata", "Rigoni di Asiago", "Pâtes à tartiner", "d", "4",
+     "", "", "", "800", "1700000001", "", "", "", "", ""],
+    ["3560070791460", "http://x", "Crème dessert chocolat", "Carrefour", "Desserts", "c", "", "", "",
+     "", "", "1700000002", "", "", "", "", ""],
+]
+
+JSONL_PRODUCTS = [
+    {"code": "3274080005003", "product_name": "Eau de source", "brands": "Cristaline",
+     "nutriscore_grade": "a", "nova_group": 1, "nutriments": {"energy-kcal_100g": 0, "salt_100g": 0.01},
+     "unique_scans_n": 9000, "images": {"front": {"sizes": {}}}},
+    {"code": "3017620422003", "product_name": "Nutella 750g", "brands": "Ferrero", "nutriscore": {"grade": "e"}},
+]
+
+
+@pytest.fixture
+def csv_export(tmp_path):
+    """Export CSV tabulé compressé, au format OFF"""
+    path = tmp_path / "products.csv.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write("\t".join(CSV_HEADER) + "\n")
+        for row in CSV_ROWS:
+            f.write("\t".join(row) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def jsonl_export(tmp_path):
+    """Export JSONL, au format OFF"""
+    path = tmp_path / "products.jsonl"
+    path.write_text("\n".join(json.dumps(p) for p in JSONL_PRODUCTS) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path, csv_export):
+    """Miroir alimenté avec l'export CSV"""
+    local_store = LocalProductStore(str(tmp_path / "off.duckdb"))
+    parallel_ingest(local_store, csv_export, chunk_size=2, workers=1, progress=None)
+    yield local_store
+    local_store.close()
+
+
+class TestLocalProductStore:
+    """Tests pour le miroir local DuckDB"""
+
+    def test_ingest_csv(self, store):
+        """Toutes les lignes de l'export sont importées"""
+        assert store.count() == 3
+
+    def test_get_product_api_shape(self, store):
+        """Le produit a la forme d'une réponse API (nutriments imbriqués)"""
+        product = store.get_product("3017620422003")
+
+        assert product["product_name"] == "Nutella"
+        assert product["nova_group"] == 4
+        assert product["nutriments"]["sugars_100g"] == 56.3
+        assert "url" not in product
+
+    def test_get_product_compatible_with_extract(self, store):
+        """Les produits du miroir passent par extract_product_info"""
+        info = OpenFoodFactsAPI.extract_product_info(store.get_product("8000500310427"))
+
+        assert info["nutriscore_grade"] == "D"
+        assert info["image_url"] == ""
+        assert info["nutriments"] == {}
+
+    def test_get_product_missing(self, store):
+        """Code-barres inconnu: None"""
+        assert store.get_product("0000000000000") is None
+
+    def test_search_products(self, store):
+        """Recherche insensible à la casse et aux accents, la plus scannée d'abord"""
+        results = store.search_products("PATE", page_size=10)
+        assert results == []
+
+        results = store.search_products("creme chocolat")
+        assert [p["code"] for p in results] == ["3560070791460"]
+
+        results = store.search_products("o", page_size=1, page=2)
+        assert [p["code"] for p in results] == ["8000500310427"]
+
+    def test_ingest_jsonl_upserts(self, store, jsonl_export):
+        """Un export JSONL met à jour les produits existants par code-barres"""
+        parallel_ingest(store, jsonl_export, workers=1, progress=None)
+
+        assert store.count() == 4
+        assert store.get_product("3017620422003")["product_name"] == "Nutella 750g"
+        assert store.get_product("3017620422003")["nutriscore_grade"] == "E"
+
+    def test_read_only_does_not_block_writer(self, store):
+        """Miroir ouvert en lecture seule: un autre process peut écrire (sync) entre deux requêtes"""
+        store.close()
+        reader = LocalProductStore(store.path, read_only=True, lock_timeout=0)
+        try:
+            assert reader.get_product("3017620422003")["brands"] == "Ferrero"
+            writer = subprocess.run(
+                [sys.executable, "-c", f"from utils.store import LocalProductStore; LocalProductStore({store.path!r}).close()"],
+                capture_output=True, text=True,
+            )
+            assert writer.returncode == 0, writer.stderr
+            assert reader.count() == 3
+        finally:
+            reader.close()
+
+    def test_version_changes_with_sync(self, store):
+        """La version change quand le watermark ou le journal des suppressions avance"""
+        before = store.version()
+        store.apply_delta(to_store_frame(products_to_frame([])), {"8000500310427": 1800000000}, 0)
+        store.compact_tombstones()
+
+        assert store.version() != before
+        assert store.version()[1] == 1
+
+
+class TestDataSourceModes:
+    """Tests pour OpenFoodFactsAPI adossé au miroir local"""
+
+    def test_local_mode_never_calls_api(self, store):
+        """Mode local: réponses du miroir uniquement"""
+        with patch.object(OpenFoodFactsAPI, "DATA_SOURCE", "local"), \
+                patch.object(OpenFoodFactsAPI, "LOCAL_STORE", store), \
+                patch("utils.data.requests.Session.get") as mock_get:
+            assert OpenFoodFactsAPI.get_product("3017620422003")["brands"] == "Ferrero"
+            assert OpenFoodFactsAPI.get_product("0000000000000") is None
+            assert len(OpenFoodFactsAPI.search_products("nutella")) == 1
+            products, errors = OpenFoodFactsAPI.get_products(["3017620422003", "0"])
+
+        mock_get.assert_not_called()
+        assert products[1] is None
+        assert errors == {"0": "Produit introuvable"}
+
+    def test_auto_mode_falls_back_to_api(self, store):
+        """Mode auto: l'API n'est appelée que pour ce que le miroir ne connaît pas"""
+        with patch.object(OpenFoodFactsAPI, "DATA_SOURCE", "auto"), \
+                patch.object(OpenFoodFactsAPI, "LOCAL_STORE", store), \
+                patch.object(OpenFoodFactsAPI, "_fetch_product", return_value={"code": "42"}) as mock_fetch:
+            assert OpenFoodFactsAPI.get_product("3017620422003")["product_name"] == "Nutella"
+            assert OpenFoodFactsAPI.get_product("42") == {"code": "42"}
+
+        mock_fetch.assert_called_once()
+
+    def test_api_mode_ignores_store(self, store):
+        """Mode api: le miroir n'est pas consulté"""
+        with patch.object(OpenFoodFactsAPI, "LOCAL_STORE", store), \
+                patch.object(OpenFoodFactsAPI, "_fetch_product", return_value=None) as mock_fetch:
+            assert OpenFoodFactsAPI.get_product("3017620422003") is None
+
+        mock_fetch.assert_called_once()
+
+    def test_async_get_products_follows_mode(self, store):
+        """Le client async consulte le miroir comme le client synchrone"""
+        async def _fetch(barcode):
+            return {"code": barcode}
+
+        async def _main():
+            async with AsyncOpenFoodFactsAPI() as client:
+                return await client.get_products(["3017620422003", "42"])
+
+        with patch.object(OpenFoodFactsAPI, "LOCAL_STORE", store), \
+                patch.object(AsyncOpenFoodFactsAPI, "_fetch_product", side_effect=_fetch) as mock_fetch:
+            with patch.object(OpenFoodFactsAPI, "DATA_SOURCE", "local"):
+                products, errors = asyncio.run(_main())
+            assert products[0]["brands"] == "Ferrero"
+            assert products[1] is None
+            assert errors == {"42": "Produit introuvable"}
+            mock_fetch.assert_not_called()
+
+            with patch.object(OpenFoodFactsAPI, "DATA_SOURCE", "auto"):
+                products, errors = asyncio.run(_main())
+            assert products[1] == {"code": "42"}
+            mock_fetch.assert_called_once_with("42")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,216 @@
+"""Tests unitaires pour utils/sync.py"""
+
+import gzip
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from utils.ingest import parallel_ingest
+from utils.store import LocalProductStore, products_to_frame, to_store_frame
+from utils.sync import collect_delta_files, delta_window, download_deltas, sync_deltas
+
+
+def write_jsonl(path, products):
+    """Écrit un fichier de delta JSONL (compressé si .gz)"""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        for product in products:
+            f.write(json.dumps(product) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Miroir avec 3 produits, synchronisé jusqu'à t=1000"""
+    local_store = LocalProductStore(str(tmp_path / "off.duckdb"))
+    base = write_jsonl(tmp_path / "base.jsonl", [
+        {"code": "1", "product_name": "Nutella", "nutriscore_grade": "e", "last_modified_t": 900},
+        {"code": "2", "product_name": "Eau", "nutriscore_grade": "a", "last_modified_t": 950},
+        {"code": "3", "product_name": "Biscuit", "nutriscore_grade": "d", "last_modified_t": 1000},
+    ])
+    sync_deltas(local_store, [base])
+    yield local_store
+    local_store.close()
+
+
+@pytest.fixture
+def delta_dir(tmp_path):
+    """Deux deltas quotidiens au format OFF"""
+    directory = tmp_path / "deltas"
+    directory.mkdir()
+    write_jsonl(directory / "openfoodfacts_products_1000_2000.json.gz", [
+        {"code": "1", "product_name": "Nutella 750g", "nutriscore_grade": "e", "last_modified_t": 1500},
+        {"code": "4", "product_name": "Compote", "nutriscore_grade": "a", "last_modified_t": 1600},
+        {"code": "2", "deleted": "on", "last_modified_t": 1700},
+    ])
+    write_jsonl(directory / "openfoodfacts_products_2000_3000.json.gz", [
+        {"code": "3", "deleted": True, "last_modified_t": 2500},
+        {"code": "3", "product_name": "Biscuit recette 2024", "nutriscore_grade": "c", "last_modified_t": 2600},
+    ])
+    return str(directory)
+
+
+class TestDeltaFiles:
+    """Tests pour le repérage des fichiers de delta"""
+
+    def test_delta_window(self):
+        """La période est lue dans le nom des deltas OFF"""
+        assert delta_window("/x/openfoodfacts_products_1700000000_1700086400.json.gz") == (1700000000, 1700086400)
+        assert delta_window("produits.jsonl") is None
+
+    def test_collect_orders_chronologically(self, tmp_path):
+        """Deltas OFF dans l'ordre de leur fin de période, puis les JSONL quelconques"""
+        for name in ("openfoodfacts_products_20_30.json.gz", "manuel.jsonl", "openfoodfacts_products_3_10.json.gz"):
+            (tmp_path / name).write_text("")
+        (tmp_path / "notes.txt").write_text("")
+
+        names = [path.rsplit("/", 1)[-1] for path in collect_delta_files([str(tmp_path)])]
+        assert names == ["openfoodfacts_products_3_10.json.gz", "openfoodfacts_products_20_30.json.gz", "manuel.jsonl"]
+
+
+class TestSyncDeltas:
+    """Tests pour la synchronisation incrémentale"""
+
+    def test_initial_sync_sets_watermark(self, store):
+        """Le watermark est la dernière modification appliquée"""
+        assert store.count() == 3
+        assert store.get_watermark() == 1000
+
+    def test_apply_deltas(self, store, delta_dir):
+        """Upserts par code-barres, suppressions compactées, recréation respectée"""
+        report = sync_deltas(store, [delta_dir])
+
+        assert report == {"files": 2, "upserted": 3, "deleted": 1, "watermark": 3000}
+        assert store.get_product("1")["product_name"] == "Nutella 750g"
+        assert store.get_product("4")["nutriscore_grade"] == "A"
+        assert store.get_product("2") is None
+        assert store.get_product("3")["product_name"] == "Biscuit recette 2024"
+        assert store.count() == 3
+
+    def test_sync_is_idempotent(self, store, delta_dir):
+        """Un delta déjà couvert par le watermark n'est pas relu"""
+        sync_deltas(store, [delta_dir])
+
+        with patch("utils.sync._open_text") as mock_open:
+            report = sync_deltas(store, [delta_dir])
+
+        mock_open.assert_not_called()
+        assert report["files"] == 0
+        assert store.count() == 3
+
+    def test_old_rows_are_skipped(self, store, tmp_path):
+        """Dans un JSONL quelconque, seules les lignes plus récentes que le watermark comptent"""
+        path = write_jsonl(tmp_path / "export.jsonl", [
+            {"code": "1", "product_name": "Ancienne version", "last_modified_t": 500},
+            {"code": "5", "product_name": "Nouveau", "last_modified_t": 1200},
+        ])
+
+        report = sync_deltas(store, [path])
+
+        assert report["upserted"] == 1
+        assert store.get_product("1")["product_name"] == "Nutella"
+        assert store.get_watermark() == 1200
+
+    def test_interrupted_file_is_replayed(self, store, tmp_path):
+        """Interruption en cours de fichier (lignes non triées): watermark inchangé, aucune ligne perdue"""
+        path = write_jsonl(tmp_path / "export.jsonl", [
+            {"code": "5", "product_name": "Récent", "last_modified_t": 1900},
+            {"code": "6", "product_name": "Plus ancien", "last_modified_t": 1200},
+        ])
+        original = LocalProductStore.apply_delta
+        calls = []
+
+        def failing_apply(self, frame, deleted, watermark):
+            calls.append(watermark)
+            if len(calls) == 2:
+                raise RuntimeError("interrompu")
+            return original(self, frame, deleted, watermark)
+
+        with patch.object(LocalProductStore, "apply_delta", failing_apply):
+            with pytest.raises(RuntimeError):
+                sync_deltas(store, [path], batch_size=1)
+
+        assert store.get_product("5") is not None
+        assert store.get_watermark() == 1000
+
+        sync_deltas(store, [path], batch_size=1)
+
+        assert store.get_product("6")["product_name"] == "Plus ancien"
+        assert store.get_watermark() == 1900
+
+    def test_tombstone_for_unknown_product(self, store, tmp_path):
+        """Supprimer un produit absent du miroir ne casse rien"""
+        path = write_jsonl(tmp_path / "openfoodfacts_products_1000_1100.json", [
+            {"code": "999", "deleted": "on", "last_modified_t": 1050},
+        ])
+
+        report = sync_deltas(store, [path])
+
+        assert report["deleted"] == 0
+        assert store.count() == 3
+
+    def test_older_delta_never_rolls_back(self, tmp_path):
+        """Un delta plus ancien que l'export importé ne remplace pas la version plus récente"""
+        local_store = LocalProductStore(str(tmp_path / "fresh.duckdb"))
+        try:
+            dump = write_jsonl(tmp_path / "dump.jsonl", [
+                {"code": "1", "product_name": "Nutella 2024", "last_modified_t": 2000},
+                {"code": "2", "product_name": "Eau", "last_modified_t": 800},
+            ])
+            parallel_ingest(local_store, dump, workers=1, progress=None)
+            assert local_store.get_watermark() == 2000
+
+            delta = write_jsonl(tmp_path / "openfoodfacts_products_1000_1500.json.gz", [
+                {"code": "1", "product_name": "Nutella 2019", "last_modified_t": 1200},
+            ])
+            sync_deltas(local_store, [delta])
+            assert local_store.get_product("1")["product_name"] == "Nutella 2024"
+
+            # Même sans watermark, l'upsert garde la version la plus récente
+            local_store.apply_delta(to_store_frame(products_to_frame([
+                {"code": "1", "product_name": "Nutella 2019", "last_modified_t": 1200},
+                {"code": "2", "product_name": "Eau de source", "last_modified_t": 900},
+            ])), {}, 0)
+            assert local_store.get_product("1")["product_name"] == "Nutella 2024"
+            assert local_store.get_product("2")["product_name"] == "Eau de source"
+        finally:
+            local_store.close()
+
+    def test_undated_tombstone_on_unsynced_store(self, tmp_path):
+        """Tombstone sans date dans un JSONL quelconque, miroir jamais synchronisé: produit supprimé"""
+        local_store = LocalProductStore(str(tmp_path / "fresh.duckdb"))
+        try:
+            local_store.upsert_frame(to_store_frame(products_to_frame([
+                {"code": "1", "product_name": "Nutella", "last_modified_t": 900},
+            ])))
+            path = write_jsonl(tmp_path / "suppressions.jsonl", [{"code": "1", "deleted": "on"}])
+
+            report = sync_deltas(local_store, [path])
+
+            assert report["deleted"] == 1
+            assert local_store.get_product("1") is None
+        finally:
+            local_store.close()
+
+
+class TestDownloadDeltas:
+    """Tests pour le téléchargement des deltas OFF"""
+
+    @patch("utils.data.OpenFoodFactsAPI.get_session")
+    def test_download_only_new_deltas(self, mock_session, tmp_path):
+        """Seuls les deltas postérieurs au watermark et absents du disque sont téléchargés"""
+        index = MagicMock(text="openfoodfacts_products_1_100.json.gz\nopenfoodfacts_products_100_200.json.gz\n")
+        delta = MagicMock()
+        delta.__enter__.return_value.iter_content.return_value = [b"abc"]
+        mock_session.return_value.get.side_effect = [index, delta]
+
+        paths = download_deltas(str(tmp_path), since=100, base_url="https://example.org/delta")
+
+        assert [path.rsplit("/", 1)[-1] for path in paths] == ["openfoodfacts_products_100_200.json.gz"]
+        assert (tmp_path / "openfoodfacts_products_100_200.json.gz").read_bytes() == b"abc"
+        mock_session.return_value.get.assert_called_with(
+            "https://example.org/delta/openfoodfacts_products_100_200.json.gz", timeout=(3.05, 10.0), stream=True
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
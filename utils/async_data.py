@@ -0,0 +1,182 @@
+import asyncio
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from utils.cache import SearchCache
+from utils.data import OpenFoodFactsAPI
+
+
+class AsyncOpenFoodFactsAPI:
+    """Client asynchrone pour l'API OpenFoodFacts (même interface que OpenFoodFactsAPI)
+
+    Partage les réglages (timeouts, retries) et les caches de OpenFoodFactsAPI.
+    Toutes les méthodes sont annulables: une tâche annulée libère sa connexion.
+    """
+
+    extract_product_info = staticmethod(OpenFoodFactsAPI.extract_product_info)
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+    ):
+        pool_size = max_connections or OpenFoodFactsAPI.POOL_SIZE
+        self.base_url = base_url or OpenFoodFactsAPI.BASE_URL
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=max_keepalive or pool_size,
+            ),
+            timeout=httpx.Timeout(
+                OpenFoodFactsAPI.READ_TIMEOUT,
+                connect=OpenFoodFactsAPI.CONNECT_TIMEOUT,
+            ),
+            headers={"User-Agent": OpenFoodFactsAPI.USER_AGENT},
+        )
+
+    async def __aenter__(self) -> "AsyncOpenFoodFactsAPI":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Ferme les connexions du pool"""
+        await self._client.aclose()
+
+    async def _get(self, url: str, params: Optional[Dict] = None) -> httpx.Response:
+        """GET avec retries et backoff (avec jitter) sur erreurs réseau et 429/5xx, comme la session synchrone"""
+        api = OpenFoodFactsAPI
+        for attempt in range(api.MAX_RETRIES + 1):
+            delay = api.BACKOFF_FACTOR * 2 ** attempt
+            try:
+                response = await self._client.get(url, params=params)
+            except httpx.TransportError:
+                # Connexion refusée, timeout, connexion coupée: rejoués comme par le Retry de urllib3
+                if attempt == api.MAX_RETRIES:
+                    raise
+            else:
+                if response.status_code not in api.RETRY_STATUSES or attempt == api.MAX_RETRIES:
+                    break
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = float(retry_after)
+            await asyncio.sleep(delay + random.uniform(0, api.BACKOFF_JITTER))
+
+        response.raise_for_status()
+        return response
+
+    async def search_products(
+        self, query: str, page_size: int = 20, extra_fields: Optional[Sequence[str]] = None
+    ) -> List[Dict]:
+        """Recherche des produits par nom (extra_fields: champs OFF supplémentaires)"""
+        store = OpenFoodFactsAPI._local_store()
+        if store is not None:
+            products = store.search_products(query, page_size)
+            if products or OpenFoodFactsAPI.DATA_SOURCE == "local":
+                return products
+
+        cache = OpenFoodFactsAPI.SEARCH_CACHE
+        key_extra = (OpenFoodFactsAPI.fields_param(extra_fields),) if extra_fields else ()
+        cache_key = SearchCache.make_key(query, page_size, *key_extra)
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        params = {
+            "search_terms": query,
+            "search_simple": 1,
+            "action": "process",
+            "json": 1,
+            "page_size": page_size,
+        }
+        fields = OpenFoodFactsAPI.fields_param(extra_fields)
+        if fields:
+            params["fields"] = fields
+
+        try:
+            response = await self._get(f"{self.base_url}/cgi/search.pl", params=params)
+            products = response.json().get("products", [])
+            if cache is not None:
+                cache.set(cache_key, products)
+            return products
+        except Exception as e:
+            print(f"Erreur recherche: {e}")
+            return []
+
+    async def _fetch_product(self, barcode: str, extra_fields: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """Appel réseau brut: le produit, None s'il est introuvable (les erreurs remontent)"""
+        fields = OpenFoodFactsAPI.fields_param(extra_fields)
+        response = await self._get(
+            f"{self.base_url}/api/v0/product/{barcode}.json",
+            params={"fields": fields} if fields else None,
+        )
+        data = response.json()
+
+        if data.get("status") == 1:
+            return data.get("product")
+        return None
+
+    async def get_product(self, barcode: str, extra_fields: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """Récupère un produit par son code-barres (extra_fields: champs OFF supplémentaires)"""
+        store = OpenFoodFactsAPI._local_store()
+        if store is not None:
+            product = store.get_product(barcode)
+            if product is not None or OpenFoodFactsAPI.DATA_SOURCE == "local":
+                return product
+
+        cache = OpenFoodFactsAPI.PRODUCT_CACHE
+        # Le cache ne contient que les champs par défaut
+        if cache is not None and not extra_fields:
+            cached = cache.get(barcode)
+            if cached is not None:
+                return cached
+
+        try:
+            product = await self._fetch_product(barcode, extra_fields)
+            if cache is not None and product and not extra_fields:
+                cache.set(barcode, product)
+            return product
+        except Exception as e:
+            print(f"Erreur produit: {e}")
+            return None
+
+    async def get_products(self, barcodes: List[str]) -> Tuple[List[Optional[Dict]], Dict[str, str]]:
+        """Récupère plusieurs produits en parallèle (même contrat que OpenFoodFactsAPI.get_products)"""
+        unique = list(dict.fromkeys(barcodes))
+        found: Dict[str, Dict] = {}
+        errors: Dict[str, str] = {}
+
+        cache = OpenFoodFactsAPI.PRODUCT_CACHE
+        store = OpenFoodFactsAPI._local_store()
+        misses = []
+        for barcode in unique:
+            cached = cache.get(barcode) if cache is not None else None
+            if cached is None and store is not None:
+                cached = store.get_product(barcode)
+            if cached is not None:
+                found[barcode] = cached
+            elif OpenFoodFactsAPI.DATA_SOURCE == "local" and store is not None:
+                errors[barcode] = "Produit introuvable"
+            else:
+                misses.append(barcode)
+
+        results = await asyncio.gather(
+            *(self._fetch_product(barcode) for barcode in misses),
+            return_exceptions=True,
+        )
+        for barcode, result in zip(misses, results):
+            if isinstance(result, BaseException):
+                errors[barcode] = str(result)
+            elif result:
+                found[barcode] = result
+                if cache is not None:
+                    cache.set(barcode, result)
+            else:
+                errors[barcode] = "Produit introuvable"
+
+        return [found.get(barcode) for barcode in barcodes], errors
@@ -0,0 +1,166 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from utils.cache import normalize_query
+
+MAX_KEY_BYTES = 48
+MAX_LABEL_BYTES = 80
+MAX_WORD_STARTS = 4
+
+
+def _encode(text: str, max_bytes: int) -> bytes:
+    return text.encode("utf-8")[:max_bytes]
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="ignore")
+
+
+class Autocomplete:
+    """Complétion par préfixe sur les noms de produits et les marques, pondérée par la popularité.
+
+    Tableau trié de clés normalisées (UTF-8, largeur fixe) interrogé par
+    recherche dichotomique. Chaque libellé est indexé à chacun de ses premiers
+    débuts de mot ("tartiner" complète "Pâte à tartiner"). Le top-k des préfixes
+    "chauds" (plus de `hot_threshold` clés: "y", "ya", "yaourt"...) est
+    précalculé; pour les autres, la plage à parcourir reste courte.
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        key_labels: np.ndarray,
+        labels: np.ndarray,
+        weights: np.ndarray,
+        hot_prefixes: np.ndarray,
+        hot_top: np.ndarray,
+    ):
+        self.keys = keys
+        self.key_labels = key_labels
+        self.labels = labels
+        self.weights = weights
+        self.hot_prefixes = hot_prefixes
+        self.hot_top = hot_top
+        self._hot = {prefix: row for row, prefix in enumerate(hot_prefixes.tolist())}
+
+    @classmethod
+    def build(
+        cls, products: Iterable[Dict], top_k: int = 10, hot_threshold: int = 1024
+    ) -> "Autocomplete":
+        """Construit l'index depuis des produits OFF (product_name, brands, unique_scans_n)"""
+        # libellé normalisé -> [libellé affiché, poids, popularité de ce libellé affiché]
+        entries: Dict[str, List] = {}
+
+        def add(label: str, popularity: int) -> None:
+            label = " ".join(label.split())
+            key = normalize_query(label)
+            if len(key) < 2:
+                return
+            weight = popularity + 1
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = [label, weight, weight]
+            else:
+                entry[1] += weight
+                if weight > entry[2]:
+                    entry[0], entry[2] = label, weight
+
+        for product in products:
+            popularity = int(product.get("unique_scans_n") or 0)
+            if product.get("product_name"):
+                add(str(product["product_name"]), popularity)
+            for brand in str(product.get("brands") or "").split(","):
+                add(brand, popularity)
+
+        normalized = list(entries)
+        labels = np.array([_encode(entries[k][0], MAX_LABEL_BYTES) for k in normalized], dtype=f"S{MAX_LABEL_BYTES}")
+        weights = np.array([entries[k][1] for k in normalized], dtype=np.int64)
+
+        pairs: List[Tuple[bytes, int]] = []
+        for label_id, key in enumerate(normalized):
+            words = key.split(" ")
+            starts = [sum(len(w) + 1 for w in words[:i]) for i in range(min(len(words), MAX_WORD_STARTS))]
+            pairs.extend((_encode(key[start:], MAX_KEY_BYTES), label_id) for start in starts)
+        pairs.sort()
+
+        keys = np.array([key for key, _ in pairs], dtype=f"S{MAX_KEY_BYTES}")
+        key_labels = np.array([label_id for _, label_id in pairs], dtype=np.int32)
+
+        index = cls(keys, key_labels, labels, weights, np.array([], dtype="S1"), np.empty((0, top_k), dtype=np.int32))
+
+        # Préfixes chauds, octet par octet: seuls les sous-préfixes d'un préfixe chaud peuvent l'être
+        hot_prefixes: List[bytes] = []
+        hot_top: List[np.ndarray] = []
+        ranges = [(0, len(keys))]
+        for depth in range(1, MAX_KEY_BYTES + 1):
+            next_ranges = []
+            for start, end in ranges:
+                prefixes = keys[start:end].astype(f"S{depth}")
+                bounds = np.concatenate(([0], np.flatnonzero(prefixes[1:] != prefixes[:-1]) + 1, [end - start]))
+                for lo, hi in zip(bounds[:-1], bounds[1:]):
+                    if hi - lo > hot_threshold and len(prefixes[lo]) == depth:
+                        hot_prefixes.append(prefixes[lo])
+                        hot_top.append(index._top(start + lo, start + hi, top_k))
+                        next_ranges.append((start + lo, start + hi))
+            if not next_ranges:
+                break
+            ranges = next_ranges
+
+        top_matrix = np.full((len(hot_top), top_k), -1, dtype=np.int32)
+        for row, top in enumerate(hot_top):
+            top_matrix[row, : len(top)] = top
+
+        return cls(
+            keys, key_labels, labels, weights,
+            np.array(hot_prefixes, dtype=f"S{MAX_KEY_BYTES}"), top_matrix,
+        )
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _top(self, start: int, end: int, k: int) -> np.ndarray:
+        """Identifiants des k libellés les plus populaires parmi les clés [start, end)"""
+        candidates = np.unique(self.key_labels[start:end])
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-self.weights[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-self.weights[candidates], kind="stable")]
+
+    def complete(self, prefix: str, k: int = 8) -> List[str]:
+        """Les k complétions les plus populaires pour ce début de saisie"""
+        key = _encode(normalize_query(prefix), MAX_KEY_BYTES)
+        if not key:
+            return []
+
+        row = self._hot.get(key)
+        if row is not None and k <= self.hot_top.shape[1]:
+            top = self.hot_top[row]
+            top = top[top >= 0][:k]
+        else:
+            start = np.searchsorted(self.keys, key, side="left")
+            end = np.searchsorted(self.keys, key + b"\xff", side="left")
+            top = self._top(start, end, k)
+        return [_decode(label) for label in self.labels[top].tolist()]
+
+    def save(self, path: str) -> None:
+        """Sauvegarde compacte (.npz, tableaux à largeur fixe chargés sans parsing)"""
+        np.savez(
+            path,
+            keys=self.keys,
+            key_labels=self.key_labels,
+            labels=self.labels,
+            weights=self.weights,
+            hot_prefixes=self.hot_prefixes,
+            hot_top=self.hot_top,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "Autocomplete":
+        """Recharge un index sauvegardé avec save()"""
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+def build_from_store(store, top_k: int = 10, batch_size: int = 100_000) -> Autocomplete:
+    """Construit l'autocomplétion sur tout le miroir local (LocalProductStore)"""
+    return Autocomplete.build(store.iter_rows(("product_name", "brands", "unique_scans_n"), batch_size), top_k=top_k)
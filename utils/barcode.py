@@ -0,0 +1,128 @@
+from typing import Iterable, List
+
+import numpy as np
+
+# EAN-8, UPC-A, EAN-13, GTIN-14
+BARCODE_LENGTHS = (8, 12, 13, 14)
+MAX_CODE_BYTES = 14
+
+
+def check_digit(body: str) -> int:
+    """Chiffre de contrôle GS1 (modulo 10, poids 3/1 en partant de la droite)"""
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10
+
+
+def is_valid(code: str) -> bool:
+    """Code EAN-13/EAN-8/UPC-A/GTIN-14 de bonne longueur et de chiffre de contrôle correct"""
+    return code.isdigit() and len(code) in BARCODE_LENGTHS and check_digit(code[:-1]) == int(code[-1])
+
+
+def variants(code: str) -> List[str]:
+    """Écritures équivalentes d'un même code (UPC-A <-> EAN-13 préfixé d'un 0)"""
+    if len(code) == 12:
+        return [code, "0" + code]
+    if len(code) == 13 and code.startswith("0"):
+        return [code, code[1:]]
+    return [code]
+
+
+def _weights(length: int) -> List[int]:
+    """Poids GS1 de chaque position d'un code complet (le chiffre de contrôle pèse 1)"""
+    return [3 if (length - 1 - i) % 2 else 1 for i in range(length)]
+
+
+def correction_candidates(code: str) -> List[str]:
+    """Codes valides à une erreur de saisie près: un chiffre faux ou deux chiffres voisins inversés
+
+    Un code est valide quand sa somme pondérée est multiple de 10: pour chaque
+    position, un seul chiffre de remplacement convient (3 est inversible
+    modulo 10), il est calculé directement au lieu d'essayer les 10.
+    """
+    if not code.isdigit() or len(code) not in BARCODE_LENGTHS:
+        return []
+
+    digits = [int(d) for d in code]
+    weights = _weights(len(code))
+    error = sum(d * w for d, w in zip(digits, weights)) % 10
+    if error == 0:
+        return []
+
+    candidates = []
+    for i, (digit, weight) in enumerate(zip(digits, weights)):
+        # weight * (nouveau - ancien) ≡ -error (mod 10); 3⁻¹ ≡ 7 (mod 10)
+        replacement = (digit - error * (7 if weight == 3 else 1)) % 10
+        candidates.append(code[:i] + str(replacement) + code[i + 1:])
+    for i in range(len(code) - 1):
+        delta = (weights[i] - weights[i + 1]) * (digits[i + 1] - digits[i])
+        if digits[i] != digits[i + 1] and (error + delta) % 10 == 0:
+            candidates.append(code[:i] + code[i + 1] + code[i] + code[i + 2:])
+    return list(dict.fromkeys(candidates))
+
+
+class BarcodeIndex:
+    """Index trié des codes-barres connus: recherche exacte, par préfixe et correction de fautes de frappe"""
+
+    def __init__(self, codes: np.ndarray):
+        self.codes = codes
+
+    @classmethod
+    def build(cls, codes: Iterable[str]) -> "BarcodeIndex":
+        """Construit l'index depuis des codes-barres (non numériques et trop longs ignorés)"""
+        unique = {c.strip() for c in codes if c and c.strip().isdigit() and len(c.strip()) <= MAX_CODE_BYTES}
+        return cls(np.array(sorted(unique), dtype=f"S{MAX_CODE_BYTES}"))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return bool(self.contains([code])[0])
+
+    def contains(self, codes: List[str]) -> np.ndarray:
+        """Présence de chaque code dans l'index (une seule recherche dichotomique vectorisée)"""
+        if not codes or not len(self.codes):
+            return np.zeros(len(codes), dtype=bool)
+        keys = np.array([c.encode() for c in codes], dtype=f"S{MAX_CODE_BYTES}")
+        positions = np.minimum(np.searchsorted(self.codes, keys), len(self.codes) - 1)
+        return self.codes[positions] == keys
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """Codes commençant par `prefix` (ordre croissant)"""
+        key = prefix.encode()
+        start = np.searchsorted(self.codes, key, side="left")
+        end = np.searchsorted(self.codes, key + b"\xff", side="left")
+        return [code.decode() for code in self.codes[start:min(end, start + limit)].tolist()]
+
+    def resolve(self, query: str, limit: int = 10) -> List[str]:
+        """Codes connus correspondant à une saisie numérique: exacte, corrigée, ou complétée par préfixe"""
+        query = query.strip()
+        if not query.isdigit():
+            return []
+
+        exact = [code for code, found in zip(variants(query), self.contains(variants(query))) if found]
+        if exact:
+            return exact[:1]
+
+        if len(query) in BARCODE_LENGTHS and not is_valid(query):
+            candidates = [c for v in variants(query) for c in correction_candidates(v)]
+            candidates = list(dict.fromkeys(candidates))
+            corrected = [code for code, found in zip(candidates, self.contains(candidates)) if found]
+            if corrected:
+                return corrected[:limit]
+
+        return self.prefix(query, limit)
+
+    def save(self, path: str) -> None:
+        """Sauvegarde compacte (.npz)"""
+        np.savez(path, codes=self.codes)
+
+    @classmethod
+    def load(cls, path: str) -> "BarcodeIndex":
+        """Recharge un index sauvegardé avec save()"""
+        with np.load(path) as data:
+            return cls(data["codes"])
+
+
+def build_from_store(store, batch_size: int = 100_000) -> BarcodeIndex:
+    """Construit l'index sur tout le miroir local (LocalProductStore)"""
+    return BarcodeIndex.build(row["code"] for row in store.iter_rows(("code",), batch_size))
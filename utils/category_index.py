@@ -0,0 +1,234 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.cache import normalize_query
+
+GRADES = "ABCDE"
+UNKNOWN = 5  # Nutri-Score ou NOVA inconnu: classé après les autres
+MAX_SCANS = (1 << 36) - 1
+INDEXED_COLUMNS = ("code", "categories", "nutriscore_grade", "nova_group", "unique_scans_n", "last_modified_t")
+
+
+def split_categories(categories: str) -> List[str]:
+    """Catégories normalisées, de la plus générale à la plus précise ("Snacks, Snacks sucrés")"""
+    return [c for c in (normalize_query(part) for part in (categories or "").split(",")) if c]
+
+
+def _grade_rank(grade) -> int:
+    grade = str(grade or "").strip().upper()
+    return GRADES.index(grade) if len(grade) == 1 and grade in GRADES else UNKNOWN
+
+
+def _sort_key(product: Dict) -> int:
+    """Clé de tri: Nutri-Score (bits de poids fort), puis NOVA, puis les plus scannés d'abord"""
+    grade = _grade_rank(product.get("nutriscore_grade"))
+    try:
+        nova = int(product.get("nova_group"))
+        nova = nova if 1 <= nova <= 4 else UNKNOWN
+    except (TypeError, ValueError):
+        nova = UNKNOWN
+    scans = min(int(product.get("unique_scans_n") or 0), MAX_SCANS)
+    return (grade << 40) | (nova << 36) | (MAX_SCANS - scans)
+
+
+class CategoryIndex:
+    """Index catégorie -> produits triés par Nutri-Score, NOVA puis popularité.
+
+    Chaque niveau de la hiérarchie `categories` est indexé. Les produits d'une
+    catégorie sont stockés contigus (CSR) et, pour chaque catégorie, l'indice
+    de début de chaque Nutri-Score est précalculé: les alternatives
+    strictement meilleures sont le début de la tranche, sans recherche.
+    Les produits modifiés depuis la construction vivent dans une surcouche
+    mémoire (update/refresh) qui masque leur ancienne entrée.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        doc_keys: np.ndarray,
+        categories: np.ndarray,
+        grade_offsets: np.ndarray,
+        postings: np.ndarray,
+        watermark: int = 0,
+    ):
+        self.codes = codes
+        self.doc_keys = doc_keys
+        self.category_names = categories
+        self.categories = {name: i for i, name in enumerate(categories.tolist())}
+        # grade_offsets[c, g]: début du Nutri-Score g dans les postings de la catégorie c (g = 6: fin de la catégorie)
+        self.grade_offsets = grade_offsets
+        self.postings = postings
+        self.watermark = watermark
+        self.synced_to = watermark
+        self._overlay: Dict[str, List[Tuple[int, str]]] = {}
+        self._overlay_categories: Dict[str, List[str]] = {}
+        self._stale: Set[str] = set()
+        # Version du miroir (LocalProductStore.version) au dernier refresh_if_changed
+        self.store_version: Optional[Tuple] = None
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, products: Iterable[Dict]) -> "CategoryIndex":
+        """Construit l'index depuis des produits (code, categories, nutriscore_grade, nova_group, unique_scans_n)"""
+        codes: List[str] = []
+        doc_keys: List[int] = []
+        vocabulary: Dict[str, int] = {}
+        category_ids: List[int] = []
+        doc_ids: List[int] = []
+        watermark = 0
+
+        for product in products:
+            code = product.get("code")
+            categories = split_categories(product.get("categories"))
+            watermark = max(watermark, int(product.get("last_modified_t") or 0))
+            if not code or not categories:
+                continue
+
+            doc = len(codes)
+            codes.append(str(code))
+            doc_keys.append(_sort_key(product))
+            for category in dict.fromkeys(categories):
+                category_ids.append(vocabulary.setdefault(category, len(vocabulary)))
+                doc_ids.append(doc)
+
+        key_array = np.asarray(doc_keys, dtype=np.int64)
+        category_array = np.asarray(category_ids, dtype=np.int32)
+        doc_array = np.asarray(doc_ids, dtype=np.int32)
+
+        order = np.lexsort((key_array[doc_array], category_array))
+        category_array, doc_array = category_array[order], doc_array[order]
+
+        # Postings triés par (catégorie, Nutri-Score): débuts cumulés par couple (catégorie, Nutri-Score)
+        grades = key_array[doc_array] >> 40
+        counts = np.bincount(category_array * (UNKNOWN + 1) + grades, minlength=len(vocabulary) * (UNKNOWN + 1))
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        grade_offsets = starts[np.arange(len(vocabulary))[:, None] * (UNKNOWN + 1) + np.arange(UNKNOWN + 2)]
+
+        names = np.empty(len(vocabulary), dtype=object)
+        for name, i in vocabulary.items():
+            names[i] = name
+
+        return cls(
+            codes=np.asarray(codes, dtype=str),
+            doc_keys=key_array,
+            categories=names.astype(str),
+            grade_offsets=grade_offsets,
+            postings=doc_array,
+            watermark=watermark,
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _better_in_category(self, category: str, cut: int, n: int) -> List[Tuple[int, str]]:
+        """Les n meilleurs (clé, code) d'une catégorie dont le rang Nutri-Score est < cut"""
+        found: List[Tuple[int, str]] = []
+        c = self.categories.get(category)
+        if c is not None:
+            start, end = self.grade_offsets[c, 0], self.grade_offsets[c, cut]
+            docs = self.postings[start:min(end, start + n + len(self._stale))]
+            found = [
+                (int(key), str(code))
+                for key, code in zip(self.doc_keys[docs], self.codes[docs])
+                if code not in self._stale
+            ]
+
+        overlay = [(key, code) for key, code in self._overlay.get(category, ()) if key >> 40 < cut]
+        if overlay:
+            found = sorted(found + overlay)
+        return found[:n]
+
+    def better_products(self, categories: str, nutriscore_grade: str, limit: int = 3) -> List[str]:
+        """Codes des produits au Nutri-Score strictement meilleur, de la catégorie la plus précise vers la plus générale"""
+        rank = _grade_rank(nutriscore_grade)
+        results: List[str] = []
+        for category in reversed(split_categories(categories)):
+            for _, code in self._better_in_category(category, rank, limit):
+                if code not in results:
+                    results.append(code)
+                    if len(results) == limit:
+                        return results
+        return results
+
+    def update(self, products: Iterable[Dict]) -> int:
+        """Prend en compte des produits ajoutés ou modifiés (surcouche mémoire)"""
+        count = 0
+        for product in products:
+            code = product.get("code")
+            if not code:
+                continue
+            code = str(code)
+            self.synced_to = max(self.synced_to, int(product.get("last_modified_t") or 0))
+
+            self.remove([code])
+
+            key = _sort_key(product)
+            categories = list(dict.fromkeys(split_categories(product.get("categories"))))
+            for category in categories:
+                # Nouvelle liste plutôt que tri sur place: les lectures concurrentes voient l'ancienne ou la nouvelle
+                self._overlay[category] = sorted([*self._overlay.get(category, ()), (key, code)])
+            self._overlay_categories[code] = categories
+            count += 1
+        return count
+
+    def remove(self, codes: Iterable[str]) -> None:
+        """Retire des produits supprimés du miroir"""
+        for code in codes:
+            for category in self._overlay_categories.pop(code, []):
+                self._overlay[category] = [entry for entry in self._overlay[category] if entry[1] != code]
+            self._stale.add(code)
+
+    def refresh(self, store, batch_size: int = 10_000) -> int:
+        """Applique les produits du miroir supprimés puis modifiés depuis la dernière synchronisation de l'index
+
+        Les suppressions d'abord: un produit supprimé puis recréé reste proposé.
+        """
+        since = self.synced_to
+        deleted = store.deleted_since(since)
+        self.remove(code for code, _ in deleted)
+        self.synced_to = max([since, *(deleted_t for _, deleted_t in deleted)])
+        return len(deleted) + self.update(store.iter_rows(INDEXED_COLUMNS, batch_size, since=since))
+
+    def refresh_if_changed(self, store, version: Tuple) -> int:
+        """refresh seulement si la version du miroir (store.version()) a changé depuis le dernier appel
+
+        Un seul refresh à la fois pour l'index partagé entre les sessions de l'application.
+        """
+        with self._refresh_lock:
+            if version == self.store_version:
+                return 0
+            count = self.refresh(store)
+            self.store_version = version
+            return count
+
+    def save(self, path: str) -> None:
+        """Sauvegarde compacte (.npz) de l'index de base (la surcouche se reconstruit avec refresh)"""
+        np.savez(
+            path,
+            codes=self.codes,
+            doc_keys=self.doc_keys,
+            categories=self.category_names,
+            grade_offsets=self.grade_offsets,
+            postings=self.postings,
+            watermark=np.int64(self.watermark),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CategoryIndex":
+        """Recharge un index sauvegardé avec save()"""
+        with np.load(path) as data:
+            return cls(
+                codes=data["codes"],
+                doc_keys=data["doc_keys"],
+                categories=data["categories"],
+                grade_offsets=data["grade_offsets"],
+                postings=data["postings"],
+                watermark=int(data["watermark"]),
+            )
+
+
+def build_from_store(store, batch_size: int = 100_000) -> CategoryIndex:
+    """Construit l'index sur tout le miroir local (LocalProductStore)"""
+    return CategoryIndex.build(store.iter_rows(INDEXED_COLUMNS, batch_size))
@@ -1,11 +1,49 @@
 import os
-from typing import Dict, List, Literal, Tuple
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Literal, Optional, Tuple
 
 from litellm import completion
 
+from utils.cache import LLMCache
+from utils.semantic_cache import SemanticCache
+
 
 Provider = Literal["openai", "gemini", "ollama"]
 
+# Budget (tokens estimés) du résumé et de l'historique renvoyés à chaque message, par provider
+# (NUTRISCAN_MEMORY_TOKENS_<PROVIDER> pour le modifier): au-delà, les anciens échanges sont résumés
+MEMORY_TOKENS = {"openai": 4000, "gemini": 8000, "ollama": 2000}
+# Derniers échanges (question + réponse) toujours gardés tels quels
+KEEP_TURNS = 3
+# Appels simultanés au modèle par provider, pour tout le process (NUTRISCAN_CONCURRENCY_<PROVIDER>):
+# limites de débit des API, un seul modèle local pour Ollama. Tous les appels passent par
+# NutriChatbot._complete ou NutriChatbot._stream, qui prennent le sémaphore du provider
+CONCURRENCY = {"openai": 8, "gemini": 4, "ollama": 1}
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+# Résumés des anciens échanges, faits en arrière-plan pendant que l'utilisateur lit la réponse
+_summaries = ThreadPoolExecutor(max_workers=2, thread_name_prefix="nutriscan-summary")
+
+
+def provider_concurrency(provider: str) -> int:
+    """Nombre maximal d'appels simultanés au modèle pour un provider"""
+    default = CONCURRENCY.get(provider, CONCURRENCY["openai"])
+    return max(int(os.getenv(f"NUTRISCAN_CONCURRENCY_{provider.upper()}", default)), 1)
+
+
+def provider_semaphore(provider: str) -> threading.BoundedSemaphore:
+    """Sémaphore partagé par toutes les sessions qui utilisent ce provider"""
+    with _semaphores_lock:
+        if provider not in _semaphores:
+            _semaphores[provider] = threading.BoundedSemaphore(provider_concurrency(provider))
+        return _semaphores[provider]
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Estimation du nombre de tokens de messages (~4 caractères par token, sans tokenizer)"""
+    return sum(len(message["content"] or "") // 4 + 4 for message in messages)
+
 
 class NutriChatbot:
     """Chatbot nutrition avec LiteLLM (OpenAI, Gemini ou Ollama)."""
@@ -14,11 +52,27 @@ class NutriChatbot:
         self,
         provider: Provider | None = None,
         model: str | None = None,
+        cache: Optional[LLMCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        memory_tokens: Optional[int] = None,
+        keep_turns: int = KEEP_TURNS,
     ):
         # Provider/model configurables via arguments ou variables d'env
         self.provider: Provider = (provider or os.getenv("NUTRISCAN_PROVIDER", "openai")).lower()  # type: ignore[assignment]
         self.model, self._kwargs = self._resolve_model_and_kwargs(model)
         self.conversation_history: List[Dict] = []
+        # Résumé des échanges sortis de l'historique, renvoyé dans le message système
+        self.summary = ""
+        self.memory_tokens = memory_tokens or int(os.getenv(
+            f"NUTRISCAN_MEMORY_TOKENS_{self.provider.upper()}", MEMORY_TOKENS.get(self.provider, MEMORY_TOKENS["openai"])
+        ))
+        self.keep_turns = keep_turns
+        # Résumé en cours (échanges résumés, résultat à venir), appliqué au tour suivant
+        self._compaction: Optional[Tuple[List[Dict], Future]] = None
+        # Réponses déjà générées pour le même prompt (analyses, alternatives), None pour désactiver
+        self.cache = cache
+        # Réponses aux premières questions d'une conversation, retrouvées par similarité, None pour désactiver
+        self.semantic_cache = semantic_cache
 
     def _resolve_model_and_kwargs(self, model: str | None) -> Tuple[str, Dict]:
         """Choisit le modèle et les paramètres LiteLLM en fonction du provider."""
@@ -33,15 +87,25 @@ class NutriChatbot:
         resolved = model or os.getenv("NUTRISCAN_MODEL_OPENAI", "gpt-4o-mini")
         return resolved, {}
     
-    def analyze_product(self, product_info: Dict) -> str:
-        """Génère une analyse IA d'un produit"""
-        prompt = f"""
+    @staticmethod
+    def _ingredient_facts(product_info: Dict) -> str:
+        """Faits précalculés sur les ingrédients (additifs, allergènes, ultra-transformation), une ligne chacun"""
+        facts = [
+            ("Additifs", product_info.get("additives")),
+            ("Allergènes détectés", product_info.get("detected_allergens")),
+            ("Marqueurs d'ultra-transformation", product_info.get("ultra_processing")),
+        ]
+        return "".join(f"{label}: {', '.join(values)}\n" for label, values in facts if values)
+
+    def _analysis_prompt(self, product_info: Dict) -> str:
+        """Prompt d'analyse d'un produit"""
+        return f"""
 Tu es un nutritionniste expert. Analyse ce produit alimentaire et donne des conseils clairs.
 
 Produit: {product_info['name']} ({product_info['brands']})
 Nutri-Score: {product_info['nutriscore']}
 NOVA: {product_info['nova_group']}
-Ingrédients: {product_info['ingredients'][:500]}
+{self._ingredient_facts(product_info)}Ingrédients: {product_info['ingredients'][:500]}
 
 Fournis une analyse en 3 parties:
 1. 📊 Qualité nutritionnelle (2-3 phrases)
@@ -50,26 +114,15 @@ Fournis une analyse en 3 parties:
 
 Reste concis et pédagogue.
 """
-        
-        try:
-            response = completion(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                **self._kwargs,
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"❌ Erreur d'analyse: {str(e)}"
-    
-    def suggest_alternatives(self, product_info: Dict, alternatives: List[Dict]) -> str:
-        """Suggère des alternatives plus saines"""
+
+    def _alternatives_prompt(self, product_info: Dict, alternatives: List[Dict]) -> str:
+        """Prompt d'explication des alternatives"""
         alt_text = "\n".join([
             f"- {alt['name']} (Nutri-Score: {alt['nutriscore']})"
             for alt in alternatives[:3]
         ])
-        
-        prompt = f"""
+
+        return f"""
 Produit actuel: {product_info['name']} (Nutri-Score {product_info['nutriscore']})
 
 Alternatives trouvées:
@@ -77,45 +130,305 @@ Alternatives trouvées:
 
 Explique en 2-3 phrases pourquoi ces alternatives sont meilleures et ce qui les différencie.
 """
-        
+
+    def _comparison_prompt(self, products: List[Dict], analyses: Dict[int, str]) -> str:
+        """Prompt de synthèse d'une comparaison, à partir des analyses de chaque produit"""
+        analyses_text = "\n\n".join(
+            f"{i + 1}. {product['name']} (Nutri-Score {product['nutriscore']}, NOVA {product['nova_group']})\n"
+            f"{analyses.get(i, '')[:800]}"
+            for i, product in enumerate(products)
+        )
+
+        return f"""
+Tu es un nutritionniste expert. Voici l'analyse de chacun des produits comparés:
+
+{analyses_text}
+
+En 3-4 phrases: quel produit privilégier et pourquoi, et dans quels cas les autres restent acceptables.
+"""
+
+    def _chat_messages(self, history: Optional[List[Dict]] = None) -> List[Dict]:
+        """Message système (avec le résumé des anciens échanges) suivi de l'historique; `history`: échange ponctuel"""
+        system = "Tu es un assistant nutrition bienveillant et pédagogue."
+        if history is None:
+            history = self.conversation_history
+            if self.summary:
+                system += f"\n\nRésumé de la conversation jusqu'ici: {self.summary}"
+        return [{"role": "system", "content": system}, *history]
+
+    def _compact(self) -> None:
+        """Lance le résumé des anciens échanges quand le résumé et l'historique dépassent le budget de tokens
+
+        Les `keep_turns` derniers échanges restent tels quels (moins s'ils
+        dépassent à eux seuls le budget, mais jamais le dernier). Le résumé est
+        refait en une fois jusqu'à `keep_turns` échanges: l'appel au modèle ne
+        revient qu'après plusieurs messages, pas à chaque tour. Il tourne en
+        arrière-plan: la réponse est rendue sans l'attendre, _apply_compaction
+        l'applique avant le message suivant.
+        """
+        history = self.conversation_history
+        if self._compaction is not None or estimate_tokens(self._chat_messages()) <= self.memory_tokens:
+            return
+        last_user = max((i for i, m in enumerate(history) if m["role"] == "user"), default=0)
+        split = max(0, len(history) - 2 * self.keep_turns)
+        # L'historique gardé commence par une question et tient dans le budget
+        while split < last_user and (
+            history[split]["role"] != "user" or estimate_tokens(history[split:]) > self.memory_tokens
+        ):
+            split += 1
+        if split == 0:
+            return
+        summarized = history[:split]
+        self._compaction = (summarized, _summaries.submit(self._summarize, summarized))
+
+    def _apply_compaction(self) -> None:
+        """Remplace les échanges résumés par le résumé en cours (attendu s'il n'est pas encore prêt)"""
+        if self._compaction is None:
+            return
+        summarized, future = self._compaction
+        self._compaction = None
+        summary = future.result()
+        # Historique effacé ou remplacé entre-temps: résumé obsolète
+        if self.conversation_history[:len(summarized)] == summarized:
+            self.summary = summary
+            self.conversation_history = self.conversation_history[len(summarized):]
+
+    def _summarize(self, messages: List[Dict]) -> str:
+        """Nouveau résumé: résumé courant complété par les échanges donnés"""
+        transcript = "\n".join(
+            f"{'Utilisateur' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in messages
+        )
+        prompt = f"""Résume cette conversation sur la nutrition en quelques phrases: questions posées, produits évoqués, préférences de l'utilisateur et conseils donnés.
+
+Résumé précédent: {self.summary or "aucun"}
+
+Nouveaux échanges:
+{transcript}
+"""
         try:
+            return self._complete([{"role": "user", "content": prompt}], 0.3) or self.summary
+        except Exception as e:
+            print(f"Erreur résumé conversation: {e}")
+            # Sans résumé du modèle: fin du texte, bornée pour garder la mémoire dans le budget
+            return f"{self.summary}\n{transcript}".strip()[-self.memory_tokens:]
+
+    def _cached(self, messages: List[Dict], temperature: float, use_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+        """(clé, réponse en cache): clé None sans cache; use_cache=False ignore la réponse existante"""
+        if self.cache is None:
+            return None, None
+        key = LLMCache.make_key(self.provider, self.model, temperature, messages)
+        return key, self.cache.get(key) if use_cache else None
+
+    def _store(self, key: Optional[str], content: Optional[str]) -> None:
+        """Met en cache une réponse complète (les erreurs ne passent jamais par ici)"""
+        if key is not None and content:
+            self.cache.set(key, content)
+
+    def _first_turn(
+        self, user_message: str, context: str, use_cache: bool, remember: bool
+    ) -> Tuple[bool, Optional[str]]:
+        """(question en cache sémantique, réponse en cache): questions sans contexte, hors d'une conversation en cours"""
+        if self.semantic_cache is None or context or (remember and (self.conversation_history or self.summary)):
+            return False, None
+        namespace = f"{self.provider}:{self.model}"
+        return True, self.semantic_cache.get(user_message, namespace) if use_cache else None
+
+    def _remember_first_turn(self, user_message: str, answer: str) -> None:
+        """Met la réponse à une première question dans le cache sémantique"""
+        self.semantic_cache.set(user_message, answer, f"{self.provider}:{self.model}")
+
+    def _complete(self, messages: List[Dict], temperature: float) -> Optional[str]:
+        """Texte de la réponse complète (les erreurs remontent)"""
+        with provider_semaphore(self.provider):
+            response = completion(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                **self._kwargs,
+            )
+        return response.choices[0].message.content
+
+    def _stream(self, messages: List[Dict], temperature: float) -> Iterator[str]:
+        """Morceaux de texte de la réponse, au fil de leur génération
+
+        Le sémaphore du provider est tenu jusqu'à la fin du flux (ou l'abandon
+        du générateur): la génération occupe le modèle tout ce temps.
+        """
+        with provider_semaphore(self.provider):
             response = completion(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
                 **self._kwargs,
             )
-            return response.choices[0].message.content
+            for chunk in response:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+
+    def _complete_cached(self, messages: List[Dict], temperature: float, use_cache: bool, error: str) -> str:
+        """Réponse complète, servie depuis le cache si possible"""
+        key, cached = self._cached(messages, temperature, use_cache)
+        if cached is not None:
+            return cached
+        try:
+            content = self._complete(messages, temperature)
         except Exception as e:
-            return f"❌ Erreur: {str(e)}"
+            return f"{error}: {str(e)}"
+        self._store(key, content)
+        return content
+
+    def _stream_cached(self, messages: List[Dict], temperature: float, use_cache: bool, error: str) -> Iterator[str]:
+        """Réponse en streaming; en cache: renvoyée d'un bloc, sinon mise en cache une fois reçue en entier"""
+        key, cached = self._cached(messages, temperature, use_cache)
+        if cached is not None:
+            yield cached
+            return
+        parts: List[str] = []
+        try:
+            for delta in self._stream(messages, temperature):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            yield f"{error}: {str(e)}"
+            return
+        self._store(key, "".join(parts))
+
+    def analyze_product(self, product_info: Dict, use_cache: bool = True) -> str:
+        """Génère une analyse IA d'un produit (use_cache=False: régénère et remplace l'entrée en cache)"""
+        messages = [{"role": "user", "content": self._analysis_prompt(product_info)}]
+        return self._complete_cached(messages, 0.7, use_cache, "❌ Erreur d'analyse")
+
+    def analyze_product_stream(self, product_info: Dict, use_cache: bool = True) -> Iterator[str]:
+        """Analyse IA d'un produit, renvoyée morceau par morceau"""
+        messages = [{"role": "user", "content": self._analysis_prompt(product_info)}]
+        return self._stream_cached(messages, 0.7, use_cache, "❌ Erreur d'analyse")
+    
+    def analyze_products(self, products: List[Dict], use_cache: bool = True) -> Iterator[Tuple[int, str]]:
+        """Analyses IA de plusieurs produits en parallèle: (position, analyse) au fur et à mesure qu'elles se terminent
+
+        Les analyses en cache arrivent tout de suite, sans attendre les appels
+        en cours. Les autres appels sont limités par le sémaphore du provider:
+        la durée totale est celle de l'analyse la plus lente (par vague de
+        `provider_concurrency`), pas la somme. Abandonner l'itération annule
+        les analyses pas encore lancées.
+        """
+        pending: Dict[int, List[Dict]] = {}
+        for i, product in enumerate(products):
+            messages = [{"role": "user", "content": self._analysis_prompt(product)}]
+            _, cached = self._cached(messages, 0.7, use_cache)
+            if cached is not None:
+                yield i, cached
+            else:
+                pending[i] = messages
+        if not pending:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(provider_concurrency(self.provider), len(pending)))
+        try:
+            # Cache déjà consulté: use_cache=False n'interroge que le modèle, la réponse est mise en cache
+            futures = {
+                executor.submit(self._complete_cached, messages, 0.7, False, "❌ Erreur d'analyse"): i
+                for i, messages in pending.items()
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def compare_products_stream(
+        self, products: List[Dict], analyses: Dict[int, str], use_cache: bool = True
+    ) -> Iterator[str]:
+        """Synthèse comparative des produits (analyses de analyze_products par position), morceau par morceau"""
+        messages = [{"role": "user", "content": self._comparison_prompt(products, analyses)}]
+        return self._stream_cached(messages, 0.7, use_cache, "❌ Erreur de comparaison")
+
+    def suggest_alternatives(self, product_info: Dict, alternatives: List[Dict], use_cache: bool = True) -> str:
+        """Suggère des alternatives plus saines"""
+        messages = [{"role": "user", "content": self._alternatives_prompt(product_info, alternatives)}]
+        return self._complete_cached(messages, 0.7, use_cache, "❌ Erreur")
+
+    def suggest_alternatives_stream(
+        self, product_info: Dict, alternatives: List[Dict], use_cache: bool = True
+    ) -> Iterator[str]:
+        """Explication des alternatives, renvoyée morceau par morceau"""
+        messages = [{"role": "user", "content": self._alternatives_prompt(product_info, alternatives)}]
+        return self._stream_cached(messages, 0.7, use_cache, "❌ Erreur")
     
-    def chat(self, user_message: str, context: str = "") -> str:
-        """Chat interactif sur la nutrition"""
-        self.conversation_history.append({
+    def _answered(self, answer: str, remember: bool) -> None:
+        """Ajoute la réponse à l'historique (conversation suivie) puis le ramène dans le budget"""
+        if remember:
+            self.conversation_history.append({"role": "assistant", "content": answer})
+            self._compact()
+
+    def chat(self, user_message: str, context: str = "", use_cache: bool = True, remember: bool = True) -> str:
+        """Chat interactif sur la nutrition
+
+        use_cache=False: pas de réponse du cache sémantique; remember=False:
+        question ponctuelle, envoyée sans l'historique et non mémorisée.
+        """
+        self._apply_compaction()
+        first_turn, cached = self._first_turn(user_message, context, use_cache, remember)
+        turn = {
             "role": "user",
             "content": f"{context}\n\nQuestion: {user_message}" if context else user_message
-        })
+        }
+        if remember:
+            self.conversation_history.append(turn)
+        if cached is not None:
+            self._answered(cached, remember)
+            return cached
         
         try:
-            response = completion(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Tu es un assistant nutrition bienveillant et pédagogue.",
-                    },
-                    *self.conversation_history,
-                ],
-                temperature=0.8,
-                **self._kwargs,
+            assistant_message = self._complete(
+                self._chat_messages() if remember else self._chat_messages([turn]), 0.8
             )
-            
-            assistant_message = response.choices[0].message.content
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
-            })
+            if first_turn and assistant_message:
+                self._remember_first_turn(user_message, assistant_message)
+            self._answered(assistant_message, remember)
             
             return assistant_message
         except Exception as e:
-            return f"❌ Erreur: {str(e)}"
\ No newline at end of file
+            return f"❌ Erreur: {str(e)}"
+
+    def chat_stream(
+        self, user_message: str, context: str = "", use_cache: bool = True, remember: bool = True
+    ) -> Iterator[str]:
+        """Chat interactif, réponse renvoyée morceau par morceau puis ajoutée à l'historique"""
+        self._apply_compaction()
+        first_turn, cached = self._first_turn(user_message, context, use_cache, remember)
+        turn = {
+            "role": "user",
+            "content": f"{context}\n\nQuestion: {user_message}" if context else user_message
+        }
+        if remember:
+            self.conversation_history.append(turn)
+        if cached is not None:
+            if remember:
+                self.conversation_history.append({"role": "assistant", "content": cached})
+            yield cached
+            if remember:
+                self._compact()
+            return
+
+        messages = self._chat_messages() if remember else self._chat_messages([turn])
+        parts: List[str] = []
+        failed = False
+        try:
+            for delta in self._stream(messages, 0.8):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            failed = True
+            yield f"❌ Erreur: {str(e)}"
+        finally:
+            # Réponse reçue conservée dans l'historique, même si l'appelant arrête la lecture en cours de route
+            if parts and not failed and remember:
+                self.conversation_history.append({"role": "assistant", "content": "".join(parts)})
+        if parts and not failed:
+            # Réponse reçue en entier (pas d'arrêt en cours de route): réutilisable pour les questions proches
+            if first_turn:
+                self._remember_first_turn(user_message, "".join(parts))
+            if remember:
+                self._compact()
@@ -1,15 +1,178 @@
-import requests
-from typing import Optional, Dict, List
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Deque, Iterator, Optional, Dict, List, Sequence, Tuple
+
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.cache import ProductCache, SearchCache
+from utils.ingredients import extract_facts
+from utils.nutriscore import compute_grade, nutriscore_grades, product_kind
+from utils.product import NUTRIENT_FIELDS, ProductInfo
+
+if TYPE_CHECKING:
+    from utils.store import LocalProductStore
+
+# Grades Nutri-Score ordonnés du meilleur au moins bon (A < E)
+NUTRISCORE_DTYPE = pd.CategoricalDtype(["A", "B", "C", "D", "E"], ordered=True)
+# Colonnes (hors nutriments) des tableaux produits
+FRAME_COLUMNS = (
+    "code", "product_name", "brands", "nutriscore_grade",
+    "nova_group", "image_url", "categories", "allergens",
+)
+
+
+def raw_nutriscore(product: Dict) -> Optional[str]:
+    """Grade Nutri-Score brut (champ plat, sinon objet nutriscore)"""
+    raw_ns = product.get("nutriscore_grade")
+
+    if not raw_ns and isinstance(product.get("nutriscore"), dict):
+        raw_ns = product.get("nutriscore", {}).get("grade")
+    return raw_ns
+
+
+def official_nutriscore(product: Dict) -> Optional[str]:
+    """Grade Nutri-Score officiel ("A" à "E"), None si absent ou non attribué ("unknown", "not-applicable")"""
+    grade = str(raw_nutriscore(product) or "").upper()
+    return grade if grade in NUTRISCORE_DTYPE.categories else None
 
 class OpenFoodFactsAPI:
     """Classe pour interagir avec l'API OpenFoodFacts"""
     
     BASE_URL = "https://world.openfoodfacts.org"
+
+    # Réglages HTTP du client (modifiables via configure())
+    CONNECT_TIMEOUT: float = 3.05
+    READ_TIMEOUT: float = 10.0
+    POOL_SIZE: int = 10
+    MAX_RETRIES: int = 3
+    BACKOFF_FACTOR: float = 0.5
+    BACKOFF_JITTER: float = 0.3
+    RETRY_STATUSES: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    BATCH_WORKERS: int = 8
+    USER_AGENT: str = "NutriScan/0.1 (projet-opendata-ia)"
+
+    # Champs demandés à l'API (paramètre fields=): ceux lus par extract_product_info.
+    # None pour recevoir le JSON produit complet.
+    FIELDS: Optional[Tuple[str, ...]] = (
+        "code",
+        "product_name",
+        "brands",
+        "nutriscore_grade",
+        "nova_group",
+        "image_url",
+        "ingredients_text",
+        "allergens",
+        "nutriments",
+        "categories",
+    )
+
+    # Cache persistant des produits par code-barres (désactivé par défaut)
+    PRODUCT_CACHE: Optional[ProductCache] = None
+    # Cache mémoire des recherches, partagé par toutes les sessions (désactivé par défaut)
+    SEARCH_CACHE: Optional[SearchCache] = None
+
+    # Source des données: "api" (OFF en ligne), "local" (miroir DuckDB uniquement)
+    # ou "auto" (miroir d'abord, API si le produit n'y est pas)
+    DATA_SOURCE: str = "api"
+    LOCAL_STORE: Optional["LocalProductStore"] = None
+
+    _session: Optional[requests.Session] = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, **settings) -> None:
+        """Modifie les réglages HTTP et recrée la session partagée"""
+        for key, value in settings.items():
+            if not key.isupper() or not hasattr(cls, key):
+                raise ValueError(f"Réglage inconnu: {key}")
+            setattr(cls, key, value)
+
+        with cls._session_lock:
+            if cls._session is not None:
+                cls._session.close()
+            cls._session = None
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """Session keep-alive partagée, avec pool de connexions et retries"""
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    retry = Retry(
+                        total=cls.MAX_RETRIES,
+                        backoff_factor=cls.BACKOFF_FACTOR,
+                        backoff_jitter=cls.BACKOFF_JITTER,
+                        status_forcelist=cls.RETRY_STATUSES,
+                        allowed_methods=frozenset({"GET"}),
+                        respect_retry_after_header=True,
+                        raise_on_status=False,
+                    )
+                    adapter = HTTPAdapter(
+                        pool_connections=cls.POOL_SIZE,
+                        pool_maxsize=cls.POOL_SIZE,
+                        pool_block=True,
+                        max_retries=retry,
+                    )
+                    session = requests.Session()
+                    session.headers.update({"User-Agent": cls.USER_AGENT})
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    cls._session = session
+        return cls._session
+
+    @staticmethod
+    def _get(url: str, params: Optional[Dict] = None) -> requests.Response:
+        """GET via la session partagée, avec timeouts connexion/lecture"""
+        api = OpenFoodFactsAPI
+        response = api.get_session().get(
+            url,
+            params=params,
+            timeout=(api.CONNECT_TIMEOUT, api.READ_TIMEOUT),
+        )
+        response.raise_for_status()
+        return response
     
     @staticmethod
-    def search_products(query: str, page_size: int = 20) -> List[Dict]:
-        """Recherche des produits par nom"""
+    def _local_store() -> Optional["LocalProductStore"]:
+        """Miroir local à interroger selon DATA_SOURCE (None en mode "api")"""
+        if OpenFoodFactsAPI.DATA_SOURCE in ("local", "auto"):
+            return OpenFoodFactsAPI.LOCAL_STORE
+        return None
+
+    @staticmethod
+    def fields_param(extra_fields: Optional[Sequence[str]] = None) -> Optional[str]:
+        """Valeur du paramètre fields=: champs par défaut + champs supplémentaires"""
+        if OpenFoodFactsAPI.FIELDS is None:
+            return None
+        fields = dict.fromkeys(OpenFoodFactsAPI.FIELDS)
+        fields.update(dict.fromkeys(extra_fields or ()))
+        return ",".join(fields)
+
+    @staticmethod
+    def _search_page(
+        query: str, page_size: int, page: int = 1, extra_fields: Optional[Sequence[str]] = None
+    ) -> List[Dict]:
+        """Une page de résultats de recherche (avec cache); les erreurs remontent"""
+        store = OpenFoodFactsAPI._local_store()
+        if store is not None:
+            products = store.search_products(query, page_size, page)
+            if products or OpenFoodFactsAPI.DATA_SOURCE == "local":
+                return products
+
+        cache = OpenFoodFactsAPI.SEARCH_CACHE
+        key_extra = (page,) if page != 1 else ()
+        if extra_fields:
+            key_extra += (OpenFoodFactsAPI.fields_param(extra_fields),)
+        cache_key = SearchCache.make_key(query, page_size, *key_extra)
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         url = f"{OpenFoodFactsAPI.BASE_URL}/cgi/search.pl"
         params = {
             "search_terms": query,
@@ -17,45 +180,183 @@ class OpenFoodFactsAPI:
             "action": "process",
             "json": 1,
             "page_size": page_size,
+            "page": page,
         }
-        
+        fields = OpenFoodFactsAPI.fields_param(extra_fields)
+        if fields:
+            params["fields"] = fields
+
+        response = OpenFoodFactsAPI._get(url, params=params)
+        products = response.json().get("products", [])
+        if cache is not None:
+            cache.set(cache_key, products)
+        return products
+
+    @staticmethod
+    def search_products(
+        query: str, page_size: int = 20, extra_fields: Optional[Sequence[str]] = None
+    ) -> List[Dict]:
+        """Recherche des produits par nom (extra_fields: champs OFF supplémentaires)"""
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("products", [])
+            return OpenFoodFactsAPI._search_page(query, page_size, extra_fields=extra_fields)
         except Exception as e:
             print(f"Erreur recherche: {e}")
             return []
+
+    @staticmethod
+    def iter_search(
+        query: str,
+        page_size: int = 20,
+        max_results: Optional[int] = None,
+        prefetch: int = 0,
+        extra_fields: Optional[Sequence[str]] = None,
+    ) -> Iterator[Dict]:
+        """Parcourt les résultats de recherche page par page, à la demande.
+
+        Les pages suivantes sont chargées en arrière-plan (jusqu'à `prefetch`
+        pages d'avance) pendant que la page courante est consommée.
+        `max_results` borne le nombre total de produits renvoyés.
+        """
+        last_page = None
+        if max_results is not None:
+            if max_results <= 0:
+                return
+            last_page = -(-max_results // page_size)
+
+        executor = ThreadPoolExecutor(max_workers=max(prefetch, 1))
+        pending: Deque[Future] = deque()
+        next_page = 1
+        yielded = 0
+
+        def schedule(depth: int) -> None:
+            nonlocal next_page
+            while len(pending) < depth and (last_page is None or next_page <= last_page):
+                pending.append(
+                    executor.submit(OpenFoodFactsAPI._search_page, query, page_size, next_page, extra_fields)
+                )
+                next_page += 1
+
+        try:
+            while True:
+                schedule(1)
+                if not pending:
+                    return
+
+                try:
+                    products = pending.popleft().result()
+                except Exception as e:
+                    print(f"Erreur recherche: {e}")
+                    return
+
+                schedule(prefetch)
+                for product in products:
+                    yield product
+                    yielded += 1
+                    if max_results is not None and yielded >= max_results:
+                        return
+
+                if len(products) < page_size:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
     
     @staticmethod
-    def get_product(barcode: str) -> Optional[Dict]:
-        """Récupère un produit par son code-barres"""
+    def _fetch_product(barcode: str, extra_fields: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """Appel réseau brut: le produit, None s'il est introuvable (les erreurs remontent)"""
         url = f"{OpenFoodFactsAPI.BASE_URL}/api/v0/product/{barcode}.json"
-        
+        fields = OpenFoodFactsAPI.fields_param(extra_fields)
+        data = OpenFoodFactsAPI._get(url, params={"fields": fields} if fields else None).json()
+
+        if data.get("status") == 1:
+            return data.get("product")
+        return None
+
+    @staticmethod
+    def get_product(barcode: str, extra_fields: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """Récupère un produit par son code-barres (extra_fields: champs OFF supplémentaires)"""
+        store = OpenFoodFactsAPI._local_store()
+        if store is not None:
+            product = store.get_product(barcode)
+            if product is not None or OpenFoodFactsAPI.DATA_SOURCE == "local":
+                return product
+
+        cache = OpenFoodFactsAPI.PRODUCT_CACHE
+        # Le cache ne contient que les champs par défaut
+        if cache is not None and not extra_fields:
+            cached = cache.get(barcode)
+            if cached is not None:
+                return cached
+
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("status") == 1:
-                return data.get("product")
-            return None
+            product = OpenFoodFactsAPI._fetch_product(barcode, extra_fields)
+            if cache is not None and product and not extra_fields:
+                cache.set(barcode, product)
+            return product
         except Exception as e:
             print(f"Erreur produit: {e}")
             return None
+
+    @staticmethod
+    def get_products(
+        barcodes: List[str], max_workers: Optional[int] = None
+    ) -> Tuple[List[Optional[Dict]], Dict[str, str]]:
+        """Récupère plusieurs produits en parallèle.
+
+        Retourne les produits dans l'ordre des codes-barres demandés (None si
+        absent) et un dict code-barres -> message d'erreur.
+        """
+        unique = list(dict.fromkeys(barcodes))
+        found: Dict[str, Dict] = {}
+        errors: Dict[str, str] = {}
+
+        cache = OpenFoodFactsAPI.PRODUCT_CACHE
+        store = OpenFoodFactsAPI._local_store()
+        misses = []
+        for barcode in unique:
+            cached = cache.get(barcode) if cache is not None else None
+            if cached is None and store is not None:
+                cached = store.get_product(barcode)
+            if cached is not None:
+                found[barcode] = cached
+            elif OpenFoodFactsAPI.DATA_SOURCE == "local" and store is not None:
+                errors[barcode] = "Produit introuvable"
+            else:
+                misses.append(barcode)
+
+        if misses:
+            workers = min(max_workers or OpenFoodFactsAPI.BATCH_WORKERS, len(misses))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(OpenFoodFactsAPI._fetch_product, barcode): barcode
+                    for barcode in misses
+                }
+                for future in as_completed(futures):
+                    barcode = futures[future]
+                    try:
+                        product = future.result()
+                    except Exception as e:
+                        errors[barcode] = str(e)
+                        continue
+
+                    if product:
+                        found[barcode] = product
+                        if cache is not None:
+                            cache.set(barcode, product)
+                    else:
+                        errors[barcode] = "Produit introuvable"
+
+        return [found.get(barcode) for barcode in barcodes], errors
     
     @staticmethod
-    def extract_product_info(product: Dict) -> Dict:
+    def extract_product_info(product: Dict) -> ProductInfo:
         """Extrait les infos clés d'un produit"""
-        raw_ns = product.get("nutriscore_grade")
+        # Sans grade officiel: calculé sur les nutriments, comme dans extract_products_frame
+        nutriscore = official_nutriscore(product) or compute_grade(product) or "N/A"
 
-        if not raw_ns and isinstance(product.get("nutriscore"), dict):
-            raw_ns = product.get("nutriscore", {}).get("grade")
-        
-        nutriscore = str(raw_ns).upper() if raw_ns else "N/A"
-
-        raw_ingredients = product.get("ingredients", [])
+        # Liste détaillée si présente, sinon le texte brut (réponses projetées via fields=)
+        raw_ingredients = product.get("ingredients") or product.get("ingredients_text") or []
 
         if isinstance(raw_ingredients, list):
             ingredients_list = []
@@ -71,15 +372,108 @@ class OpenFoodFactsAPI:
         else:
             final_ingredients = str(raw_ingredients) if raw_ingredients else "Non spécifié"
 
-        return {
-            "code": product.get("code", ""),
-            "product_name": product.get("product_name") or "Nom inconnu",
-            "brands": product.get("brands") or "Marque inconnue",
-            "nutriscore_grade": nutriscore,
-            "nova_group": product.get("nova_group") or "N/A",
-            "image_url": product.get("image_url", ""),
-            "ingredients": final_ingredients,
-            "allergens": product.get("allergens") or "Aucun ou non spécifié",
-            "nutriments": product.get("nutriments", {}),
-            "categories": product.get("categories", ""),
-        }
\ No newline at end of file
+        facts = extract_facts(final_ingredients)
+        return ProductInfo(
+            code=product.get("code", ""),
+            product_name=product.get("product_name") or "Nom inconnu",
+            brands=product.get("brands") or "Marque inconnue",
+            nutriscore_grade=nutriscore,
+            nova_group=product.get("nova_group") or "N/A",
+            image_url=product.get("image_url", ""),
+            ingredients=final_ingredients,
+            allergens=product.get("allergens") or "Aucun ou non spécifié",
+            nutriments=product.get("nutriments", {}),
+            categories=product.get("categories", ""),
+            additives=facts.additives,
+            detected_allergens=facts.allergens,
+            ultra_processing=facts.ultra_processing,
+        )
+
+    @staticmethod
+    def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+        """Type les colonnes d'un tableau plat de produits (valeurs manquantes laissées à NA).
+
+        Accepte un export CSV OFF comme la sortie de extract_products_frame:
+        les colonnes attendues absentes sont ajoutées, les autres conservées.
+        """
+        frame = frame.copy()
+        for column in (*FRAME_COLUMNS, *NUTRIENT_FIELDS):
+            if column not in frame.columns:
+                frame[column] = None
+
+        for column in ("code", "product_name", "brands", "image_url", "categories", "allergens"):
+            frame[column] = frame[column].astype("string").replace("", pd.NA)
+        grades = frame["nutriscore_grade"].astype("string").str.upper()
+        frame["nutriscore_grade"] = grades.where(grades.isin(NUTRISCORE_DTYPE.categories)).astype(NUTRISCORE_DTYPE)
+        frame["nova_group"] = pd.to_numeric(frame["nova_group"], errors="coerce").astype("Int8")
+
+        for column in NUTRIENT_FIELDS:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+
+        return frame
+
+    @staticmethod
+    def extract_products_frame(products: List[Dict]) -> pd.DataFrame:
+        """Extrait en une passe les infos clés d'une liste de produits OFF, en colonnes typées.
+
+        Une ligne par produit (même ordre que l'entrée): grades en catégorie
+        ordonnée, NOVA en entier nullable, nutriments pour 100g en float.
+        """
+        frame = pd.DataFrame.from_records(
+            [
+                {
+                    "code": p.get("code"),
+                    "product_name": p.get("product_name"),
+                    "brands": p.get("brands"),
+                    "nutriscore_grade": official_nutriscore(p),
+                    "nova_group": p.get("nova_group"),
+                    "image_url": p.get("image_url"),
+                    "categories": p.get("categories"),
+                    "allergens": p.get("allergens"),
+                }
+                for p in products
+            ],
+            columns=list(FRAME_COLUMNS),
+        )
+        nutrients = pd.DataFrame.from_records(
+            [p.get("nutriments") or {} for p in products],
+            columns=list(NUTRIENT_FIELDS),
+        )
+        frame = OpenFoodFactsAPI.normalize_frame(pd.concat([frame, nutrients], axis=1))
+
+        # Grades absents: Nutri-Score calculé sur les nutriments, en un seul appel vectorisé
+        missing = frame["nutriscore_grade"].isna().to_numpy()
+        if missing.any():
+            kinds = [product_kind(c) for c in frame.loc[missing, "categories"].fillna("")]
+            computed = nutriscore_grades(frame.loc[missing, list(NUTRIENT_FIELDS)].to_numpy(dtype=float), kinds)
+            frame.loc[missing, "nutriscore_grade"] = pd.Series(computed, index=frame.index[missing]).replace("", pd.NA)
+
+        # Mêmes valeurs par défaut que extract_product_info
+        frame["code"] = frame["code"].fillna("")
+        frame["product_name"] = frame["product_name"].fillna("Nom inconnu")
+        frame["brands"] = frame["brands"].fillna("Marque inconnue")
+        for column in ("image_url", "categories", "allergens"):
+            frame[column] = frame[column].fillna("")
+
+        return frame
+
+    @staticmethod
+    def alternatives_query(product_info: Dict) -> str:
+        """Recherche des alternatives d'un produit: sa première catégorie, à défaut le premier mot du nom"""
+        if product_info.get("categories"):
+            return product_info["categories"].split(",")[0]
+        return (product_info.get("product_name") or "").split(" ", 1)[0]
+
+    @staticmethod
+    def better_alternatives(products: List[Dict], nutriscore_grade: str, limit: int = 3) -> List[ProductInfo]:
+        """Produits au Nutri-Score strictement meilleur, triés par Nutri-Score puis NOVA"""
+        if not products:
+            return []
+
+        frame = OpenFoodFactsAPI.extract_products_frame(products)
+        graded = frame[frame["nutriscore_grade"].notna()]
+        if nutriscore_grade in NUTRISCORE_DTYPE.categories:
+            graded = graded[graded["nutriscore_grade"] < nutriscore_grade]
+
+        best = graded.sort_values(["nutriscore_grade", "nova_group"], na_position="last").head(limit)
+        return [OpenFoodFactsAPI.extract_product_info(products[i]) for i in best.index]
@@ -0,0 +1,150 @@
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.store import CSV_COLUMNS, LocalProductStore, _open_text, products_to_frame, to_store_frame
+
+# (lots importés, lignes importées, lignes/s)
+ProgressCallback = Callable[[int, int, float], None]
+
+
+def _is_jsonl(path: str) -> bool:
+    name = os.path.basename(path)
+    return ".jsonl" in name or ".json" in name
+
+
+def iter_raw_chunks(path: str, chunk_size: int) -> Iterator[Tuple[int, List[str]]]:
+    """Découpe le flux (décompressé) en lots de lignes brutes, numérotés à partir de 0"""
+    with _open_text(path) as lines:
+        if not _is_jsonl(path):
+            next(lines, None)  # l'en-tête CSV est lu à part
+        index = 0
+        while True:
+            chunk = list(islice(lines, chunk_size))
+            if not chunk:
+                return
+            yield index, chunk
+            index += 1
+
+
+def read_csv_header(path: str) -> List[str]:
+    with _open_text(path) as lines:
+        return next(lines, "").rstrip("\n").split("\t")
+
+
+def normalize_chunk(lines: List[str], header: Optional[List[str]] = None) -> pd.DataFrame:
+    """Parse un lot de lignes (JSONL, ou CSV si `header`) et le type au schéma du miroir.
+
+    Exécuté dans les processus du pool: toute la normalisation est vectorisée
+    (OpenFoodFactsAPI.normalize_frame), sans boucle par produit.
+    """
+    if header is None:
+        products = []
+        for line in lines:
+            if line.strip():
+                try:
+                    products.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return to_store_frame(products_to_frame(products))
+
+    frame = pd.read_csv(
+        io.StringIO("".join(lines)),
+        sep="\t",
+        names=header,
+        header=None,
+        usecols=lambda column: column in CSV_COLUMNS,
+        dtype=str,
+        quoting=csv.QUOTE_NONE,
+        on_bad_lines="skip",
+    )
+    return to_store_frame(frame)
+
+
+def file_fingerprint(path: str) -> str:
+    """Empreinte d'un fichier (taille et date de modification): un nouvel export au même chemin ne correspond plus"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _print_progress(chunks: int, rows: int, rate: float) -> None:
+    print(f"lot {chunks:,} • {rows:,} produits importés • {rate:,.0f} lignes/s")
+
+
+def parallel_ingest(
+    store: LocalProductStore,
+    path: str,
+    chunk_size: int = 20_000,
+    workers: Optional[int] = None,
+    resume: bool = True,
+    progress: Optional[ProgressCallback] = _print_progress,
+) -> int:
+    """Importe un export OFF en parallèle, lot par lot, avec reprise sur le dernier lot validé.
+
+    Le processus principal décompresse et découpe le flux; les lots sont parsés
+    et normalisés par un pool de processus, puis écrits dans l'ordre, chacun
+    dans sa propre transaction avec sa position (table ingest_progress).
+    La reprise n'a lieu que pour le même fichier (taille et date de
+    modification) et la même taille de lots; sinon l'import recommence au
+    début. Un import terminé n'est pas refait tant que le fichier est inchangé;
+    il fixe le watermark de synchronisation à sa modification la plus récente.
+    Retourne le nombre de lignes importées par cet appel.
+    """
+    source = os.path.abspath(path)
+    fingerprint = file_fingerprint(path)
+    state = store.ingest_state(source) if resume else None
+    if state is not None and state["fingerprint"] == fingerprint and state["completed"]:
+        return 0
+    if state is not None and state["fingerprint"] == fingerprint and state["chunk_size"] == chunk_size:
+        start_after = state["chunk_index"]
+    else:
+        store.start_ingest(source, chunk_size, fingerprint)
+        start_after = -1
+    header = None if _is_jsonl(path) else read_csv_header(path)
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    imported = 0
+    committed = 0
+    pending: Dict[int, Future] = {}
+    next_to_commit = start_after + 1
+
+    def commit_ready() -> None:
+        nonlocal imported, committed, next_to_commit
+        while next_to_commit in pending and pending[next_to_commit].done():
+            frame = pending.pop(next_to_commit).result()
+            store.commit_chunk(frame, source, next_to_commit)
+            imported += len(frame)
+            committed += 1
+            next_to_commit += 1
+            if progress is not None:
+                progress(committed, imported, imported / max(time.perf_counter() - started, 1e-9))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for index, lines in iter_raw_chunks(path, chunk_size):
+            if index <= start_after:
+                continue
+
+            pending[index] = executor.submit(normalize_chunk, lines, header)
+
+            # Mémoire bornée: au plus 2 lots en vol par processus
+            while len(pending) >= workers * 2:
+                pending[next_to_commit].result()
+                commit_ready()
+            commit_ready()
+
+        while pending:
+            pending[next_to_commit].result()
+            commit_ready()
+
+    store.finish_ingest(source)
+    # Les deltas plus anciens que l'export sont déjà dedans: la synchronisation repart de sa date
+    store.seed_watermark()
+    return imported
@@ -0,0 +1,272 @@
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# Familles de termes recherchés dans la liste d'ingrédients
+ADDITIVE, ALLERGEN, ULTRA_PROCESSING, IGNORE = "additive", "allergen", "ultra_processing", "ignore"
+
+# Additifs connus par leur nom -> code E
+ADDITIVE_NAMES: Dict[str, str] = {
+    "acide ascorbique": "E300", "ascorbic acid": "E300",
+    "acide citrique": "E330", "citric acid": "E330",
+    "lecithine": "E322", "lecithines": "E322", "lecithin": "E322",
+    "diglycerides d acides gras": "E471", "diglycerides of fatty acids": "E471",
+    "glutamate monosodique": "E621", "monosodium glutamate": "E621",
+    "aspartame": "E951", "acesulfame k": "E950", "acesulfame de potassium": "E950", "sucralose": "E955",
+    "carraghenanes": "E407", "carraghenane": "E407", "carrageenan": "E407",
+    "gomme xanthane": "E415", "xanthan gum": "E415", "gomme de guar": "E412", "guar gum": "E412",
+    "pectine": "E440", "pectines": "E440", "pectin": "E440",
+    "bicarbonate de sodium": "E500", "carbonates de sodium": "E500", "sodium bicarbonate": "E500",
+    "nitrite de sodium": "E250", "sodium nitrite": "E250", "nitrate de potassium": "E252",
+    "sorbate de potassium": "E202", "potassium sorbate": "E202",
+    "benzoate de sodium": "E211", "sodium benzoate": "E211",
+    "diphosphates": "E450", "polyphosphates": "E452",
+}
+
+# Allergènes à déclaration obligatoire (règlement UE 1169/2011), par nom d'ingrédient
+ALLERGENS: Dict[str, Tuple[str, ...]] = {
+    "gluten": ("gluten", "ble", "froment", "seigle", "orge", "avoine", "epeautre", "kamut",
+               "wheat", "rye", "barley", "oats", "spelt"),
+    "crustacés": ("crustaces", "crevette", "crevettes", "crabe", "homard", "langoustine", "crustaceans", "shrimp"),
+    "oeufs": ("oeuf", "oeufs", "egg", "eggs"),
+    "poisson": ("poisson", "poissons", "anchois", "thon", "saumon", "cabillaud", "fish", "tuna", "salmon"),
+    "arachides": ("arachide", "arachides", "cacahuete", "cacahuetes", "peanut", "peanuts"),
+    "soja": ("soja", "soy", "soya"),
+    "lait": ("lait", "lactose", "beurre", "creme", "fromage", "lactoserum", "petit lait", "caseinate",
+             "milk", "butter", "cream", "cheese", "whey"),
+    "fruits à coque": ("noisette", "noisettes", "amande", "amandes", "noix", "cajou", "pistache", "pistaches",
+                       "pecan", "macadamia", "hazelnut", "hazelnuts", "almond", "almonds", "walnut", "walnuts",
+                       "cashew", "pistachio"),
+    "céleri": ("celeri", "celery"),
+    "moutarde": ("moutarde", "mustard"),
+    "sésame": ("sesame",),
+    "sulfites": ("sulfite", "sulfites", "anhydride sulfureux", "disulfite", "sulphite", "sulphites"),
+    "lupin": ("lupin",),
+    "mollusques": ("mollusques", "moules", "huitres", "calmar", "calamar", "molluscs"),
+}
+# Codes E dont la présence implique un allergène
+ALLERGEN_ADDITIVES: Dict[str, str] = {f"E{n}": "sulfites" for n in range(220, 229)}
+
+# Marqueurs d'ultra-transformation (ingrédients et additifs "cosmétiques" de la classe NOVA 4)
+ULTRA_PROCESSING_MARKERS: Dict[str, Tuple[str, ...]] = {
+    "sirop de glucose": ("sirop de glucose", "sirop de glucose fructose", "glucose syrup", "glucose fructose syrup",
+                         "high fructose corn syrup"),
+    "dextrose": ("dextrose",),
+    "maltodextrine": ("maltodextrine", "maltodextrin"),
+    "sucre inverti": ("sucre inverti", "sirop de sucre inverti", "invert sugar"),
+    "huile hydrogénée": ("huile hydrogenee", "huiles hydrogenees", "graisse hydrogenee", "hydrogenated oil",
+                         "hydrogenated fat"),
+    "protéines hydrolysées": ("proteines hydrolysees", "hydrolysat de proteines", "hydrolysed protein",
+                              "hydrolyzed protein"),
+    "isolat de protéines": ("isolat de proteines", "isolat de proteine", "protein isolate"),
+    "arômes": ("arome", "aromes", "arome naturel", "aromes naturels", "flavouring", "flavourings", "flavoring",
+               "flavorings"),
+    "exhausteur de goût": ("exhausteur de gout", "exhausteurs de gout", "flavour enhancer", "flavor enhancer"),
+    "émulsifiant": ("emulsifiant", "emulsifiants", "emulsifier", "emulsifiers"),
+    "édulcorant": ("edulcorant", "edulcorants", "sweetener", "sweeteners"),
+    "colorant": ("colorant", "colorants", "colour", "colours", "color", "colors"),
+    "épaississant": ("epaississant", "epaississants", "gelifiant", "gelifiants", "thickener", "gelling agent"),
+    "amidon modifié": ("amidon modifie", "amidons modifies", "modified starch"),
+}
+
+# Termes qui en contiennent un autre sans en être (noix de coco n'est pas un fruit à coque, etc.)
+IGNORED = ("noix de coco", "beurre de cacao", "lait de coco", "creme de coco", "coconut milk", "cocoa butter",
+           "beurre de karite")
+
+# Mentions négatives: "sans gluten", "sans lactose ni oeufs", "without milk", "gluten free"
+NEGATIONS_BEFORE = frozenset({"sans", "ni", "without", "nor", "no"})
+NEGATIONS_AFTER = frozenset({"free"})
+NEGATION = re.compile(r"\b(?:%s)\b" % "|".join(sorted(NEGATIONS_BEFORE | NEGATIONS_AFTER)))
+
+# Codes E: E100 à E1599 ("E322", "E 322" ou "E-322"), suivis éventuellement d'une lettre (E150d)
+E_NUMBERS = range(100, 1600)
+
+
+def _fold(char: str) -> str:
+    """Caractère en minuscule sans accent; ponctuation et séparateurs -> espace"""
+    base = unicodedata.normalize("NFKD", char.lower())
+    base = "".join(c for c in base if not unicodedata.combining(c))
+    if base == "œ":
+        return "oe"
+    return base if base.isalnum() else " "
+
+
+_FOLD_TABLE: Dict[int, str] = {}
+
+
+def normalize_text(text: str) -> str:
+    """Texte d'ingrédients normalisé pour la recherche (table de traduction mise en cache par caractère)"""
+    missing = {ord(c) for c in set(text)} - _FOLD_TABLE.keys()
+    for code in missing:
+        _FOLD_TABLE[code] = _fold(chr(code))
+    return text.translate(_FOLD_TABLE)
+
+
+class IngredientFacts(NamedTuple):
+    """Faits extraits d'une liste d'ingrédients (triés, sans doublons)"""
+
+    additives: Tuple[str, ...] = ()
+    allergens: Tuple[str, ...] = ()
+    ultra_processing: Tuple[str, ...] = ()
+
+
+class IngredientMatcher:
+    """Recherche multi-motifs (automate d'Aho-Corasick) sur les listes d'ingrédients.
+
+    Tous les termes (codes E, noms d'additifs, allergènes, marqueurs
+    d'ultra-transformation) sont compilés dans un seul automate dont les
+    transitions sont résolues à la construction: le texte normalisé est lu
+    une seule fois, un accès dict par caractère, quel que soit le nombre de
+    termes. Un terme n'est retenu que s'il forme des mots entiers.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, str, str]]):
+        """`patterns`: triplets (terme, famille, étiquette)"""
+        self.labels: List[Tuple[str, str, int]] = []
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+
+        for term, kind, label in patterns:
+            term = normalize_text(term)
+            state = 0
+            for char in term:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(len(self.labels))
+            self.labels.append((kind, label, len(term)))
+
+        # Liens d'échec (parcours en largeur), puis transitions complètes: plus de retour arrière à la lecture
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0) if goto[fallback].get(char) != child else 0
+                outputs[child] = outputs[child] + outputs[fail[child]]
+
+        # Transitions complètes, sauf celles identiques à la racine (lues en repli sur self.root)
+        self.root = goto[0]
+        order = [0]
+        for state in order:
+            order.extend(goto[state].values())
+        complete: List[Dict[str, int]] = [dict(goto[0]) for _ in goto]
+        self.transitions: List[Dict[str, int]] = [{} for _ in goto]
+        for state in order[1:]:
+            complete[state] = {**complete[fail[state]], **goto[state]}
+            self.transitions[state] = {c: s for c, s in complete[state].items() if self.root.get(c) != s}
+        self.outputs: List[Tuple[int, ...]] = [tuple(o) for o in outputs]
+
+    @classmethod
+    def default(cls) -> "IngredientMatcher":
+        """Automate des dictionnaires du module"""
+        patterns = [(f"e{sep}{n}", ADDITIVE, f"E{n}") for n in E_NUMBERS for sep in ("", " ")]
+        patterns += [(name, ADDITIVE, code) for name, code in ADDITIVE_NAMES.items()]
+        patterns += [(term, ALLERGEN, label) for label, terms in ALLERGENS.items() for term in terms]
+        patterns += [(term, ULTRA_PROCESSING, label) for label, terms in ULTRA_PROCESSING_MARKERS.items() for term in terms]
+        patterns += [(term, IGNORE, term) for term in IGNORED]
+        return cls(patterns)
+
+    def matches(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """Occurrences (début, fin, famille, étiquette) de mots entiers dans un texte d'ingrédients"""
+        return self._matches(normalize_text(text))
+
+    def _matches(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """matches() sur un texte déjà normalisé (positions dans ce texte)"""
+        found = []
+        transitions, root, outputs, labels = self.transitions, self.root, self.outputs, self.labels
+        state = 0
+        for end, char in enumerate(text, 1):
+            state = transitions[state].get(char) or root.get(char, 0)
+            if outputs[state]:
+                for index in outputs[state]:
+                    kind, label, length = labels[index]
+                    start = end - length
+                    if start > 0 and text[start - 1] != " ":
+                        continue
+                    if kind == ADDITIVE and label[1:].isdigit() and label[1:] == text[start + 1:end].strip():
+                        # Code E: lettre de variante éventuelle (E150d), mais pas d'autre chiffre
+                        if end < len(text) and text[end].isdigit():
+                            continue
+                        if end < len(text) and text[end].isalpha() and (end + 1 == len(text) or text[end + 1] == " "):
+                            label, end = label + text[end], end + 1
+                    elif end < len(text) and text[end] != " ":
+                        continue
+                    found.append((start, end, kind, label))
+        return found
+
+    @staticmethod
+    def _negated(text: str, start: int, end: int) -> bool:
+        """Terme nié par le mot qui le précède ("sans", "ni", "without") ou le suit ("free")"""
+        before = text[max(start - 24, 0):start].split()
+        after = text[end:end + 8].split()
+        return bool(before and before[-1] in NEGATIONS_BEFORE) or bool(after and after[0] in NEGATIONS_AFTER)
+
+    def extract(self, text: str) -> IngredientFacts:
+        """Additifs, allergènes et marqueurs d'ultra-transformation d'une liste d'ingrédients
+
+        Les termes niés ("sans gluten", "lactose free") ne sont pas retenus.
+        """
+        if not text:
+            return IngredientFacts()
+        text = normalize_text(text)
+        found = self._matches(text)
+        ignored = [(start, end) for start, end, kind, _ in found if kind == IGNORE]
+        # La plupart des listes n'ont aucune mention négative: vérification par terme évitée
+        negations = NEGATION.search(text) is not None
+        additives, allergens, markers = set(), set(), set()
+        for start, end, kind, label in found:
+            if any(s <= start and end <= e for s, e in ignored) or (negations and self._negated(text, start, end)):
+                continue
+            if kind == ADDITIVE:
+                additives.add(label)
+                if label in ALLERGEN_ADDITIVES:
+                    allergens.add(ALLERGEN_ADDITIVES[label])
+            elif kind == ALLERGEN:
+                allergens.add(label)
+            elif kind == ULTRA_PROCESSING:
+                markers.add(label)
+        return IngredientFacts(
+            additives=tuple(sorted(additives, key=_additive_order)),
+            allergens=tuple(sorted(allergens)),
+            ultra_processing=tuple(sorted(markers)),
+        )
+
+    def extract_many(self, texts: Iterable[str]) -> List[IngredientFacts]:
+        """extract() sur un lot de listes d'ingrédients (textes identiques analysés une fois)"""
+        seen: Dict[str, IngredientFacts] = {}
+        results = []
+        for text in texts:
+            text = text or ""
+            if text not in seen:
+                seen[text] = self.extract(text)
+            results.append(seen[text])
+        return results
+
+
+def _additive_order(code: str) -> Tuple[int, str]:
+    """Codes E dans l'ordre numérique (E150d avant E322)"""
+    digits = "".join(c for c in code[1:] if c.isdigit())
+    return int(digits or 0), code
+
+
+_DEFAULT_MATCHER: List[IngredientMatcher] = []
+
+
+def default_matcher() -> IngredientMatcher:
+    """Automate par défaut, compilé au premier appel puis partagé"""
+    if not _DEFAULT_MATCHER:
+        _DEFAULT_MATCHER.append(IngredientMatcher.default())
+    return _DEFAULT_MATCHER[0]
+
+
+def extract_facts(text: str) -> IngredientFacts:
+    """Faits d'une liste d'ingrédients avec l'automate par défaut"""
+    return default_matcher().extract(text)
@@ -0,0 +1,263 @@
+import os
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.category_index import UNKNOWN, _grade_rank, split_categories
+from utils.product import _to_float
+
+# Nutriments comparés (pour 100g)
+KNN_FIELDS: Tuple[str, ...] = (
+    "energy-kcal_100g",
+    "fat_100g",
+    "saturated-fat_100g",
+    "sugars_100g",
+    "salt_100g",
+    "fiber_100g",
+    "proteins_100g",
+)
+INDEXED_COLUMNS = ("code", "categories", "nutriscore_grade", *KNN_FIELDS)
+# Fichiers .npy du dossier de l'index (tableaux à largeur fixe, projetables en mémoire)
+ARRAYS = ("codes", "matrix", "grades", "category_ids", "barcodes", "barcode_rows", "categories", "mean", "scale", "fill")
+
+
+def nutrient_vector(product: Mapping) -> np.ndarray:
+    """Nutriments d'un produit (dict OFF ou ProductInfo) en vecteur float32, NaN si absents"""
+    nutriments = product.get("nutriments") or {}
+    return np.array(
+        [_to_float(nutriments.get(name, product.get(name))) for name in KNN_FIELDS], dtype=np.float32
+    )
+
+
+def _smallest(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k plus petites valeurs (k petit: k argmin, plus rapide qu'argpartition sur un gros bloc)"""
+    if k >= len(values):
+        return np.arange(len(values))
+    if k > 16:
+        return np.argpartition(values, k - 1)[:k]
+    values = values.copy()
+    top = np.empty(k, dtype=np.int64)
+    for i in range(k):
+        top[i] = np.argmin(values)
+        values[top[i]] = np.inf
+    return top
+
+
+class NutrientKNN:
+    """Plus proches voisins nutritionnels, restreints aux Nutri-Scores strictement meilleurs.
+
+    Matrice float32 (produits x nutriments) centrée-réduite, valeurs manquantes
+    remplacées par la médiane, avec une dernière colonne ||x||²: la distance
+    au carré (à ||q||² près) est alors un seul produit matrice-vecteur avec
+    [-2q, 1]. Les lignes sont triées par (Nutri-Score, catégorie la plus
+    précise): "meilleur Nutri-Score" est un préfixe de la matrice et "même
+    catégorie" une tranche par Nutri-Score, donc le filtrage se fait sans copie
+    ni masque.
+
+    Sauvegardé en tableaux .npy à largeur fixe (codes-barres en octets, index
+    trié code-barres -> ligne), rechargés par np.memmap: les processus du
+    serveur partagent les mêmes pages via le cache disque, sans copie ni
+    décodage au démarrage.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        matrix: np.ndarray,
+        grades: np.ndarray,
+        category_ids: np.ndarray,
+        barcodes: np.ndarray,
+        barcode_rows: np.ndarray,
+        categories: np.ndarray,
+        mean: np.ndarray,
+        scale: np.ndarray,
+        fill: np.ndarray,
+    ):
+        self.codes = codes
+        self.matrix = matrix
+        self.grades = grades
+        self.category_ids = category_ids
+        # Codes-barres triés et ligne correspondante (recherche dichotomique sans tableau auxiliaire)
+        self.barcodes = barcodes
+        self.barcode_rows = barcode_rows
+        self.category_names = categories
+        self.categories = {name: i for i, name in enumerate(categories.tolist())}
+        self.mean = mean
+        self.scale = scale
+        self.fill = fill
+        # Début de chaque Nutri-Score: grade_offsets[g]
+        self.grade_offsets = np.searchsorted(grades, np.arange(UNKNOWN + 2))
+
+    @classmethod
+    def build(cls, products: Iterable[Dict]) -> "NutrientKNN":
+        """Construit la matrice depuis des produits (dicts OFF ou lignes du miroir)"""
+        codes: List[str] = []
+        vectors: List[np.ndarray] = []
+        grades: List[int] = []
+        vocabulary: Dict[str, int] = {}
+        category_ids: List[int] = []
+
+        for product in products:
+            vector = nutrient_vector(product)
+            if not product.get("code") or np.isnan(vector).all():
+                continue
+            categories = split_categories(product.get("categories"))
+            codes.append(str(product["code"]))
+            vectors.append(vector)
+            grades.append(_grade_rank(product.get("nutriscore_grade")))
+            # 0 = sans catégorie
+            category_ids.append(vocabulary.setdefault(categories[-1], len(vocabulary) + 1) if categories else 0)
+
+        raw = np.vstack(vectors) if vectors else np.empty((0, len(KNN_FIELDS)), dtype=np.float32)
+        fill = np.nan_to_num(np.nanmedian(raw, axis=0)) if len(raw) else np.zeros(len(KNN_FIELDS))
+        raw = np.where(np.isnan(raw), fill, raw)
+        mean = raw.mean(axis=0) if len(raw) else np.zeros(len(KNN_FIELDS))
+        scale = raw.std(axis=0) if len(raw) else np.ones(len(KNN_FIELDS))
+        scale[scale == 0] = 1.0
+
+        grade_array = np.asarray(grades, dtype=np.int8)
+        category_array = np.asarray(category_ids, dtype=np.int32)
+        order = np.lexsort((category_array, grade_array))
+        standardized = ((raw - mean) / scale).astype(np.float32)[order]
+        norms = np.einsum("ij,ij->i", standardized, standardized)
+
+        names = [""] * (len(vocabulary) + 1)
+        for name, i in vocabulary.items():
+            names[i] = name
+
+        code_array = np.asarray([code.encode() for code in codes], dtype=bytes)[order]
+        barcode_order = np.argsort(code_array, kind="stable")
+
+        return cls(
+            codes=code_array,
+            matrix=np.ascontiguousarray(np.column_stack([standardized, norms]), dtype=np.float32),
+            grades=grade_array[order],
+            category_ids=category_array[order],
+            barcodes=code_array[barcode_order],
+            barcode_rows=barcode_order.astype(np.int32),
+            categories=np.asarray(names, dtype=str),
+            mean=mean.astype(np.float32),
+            scale=scale.astype(np.float32),
+            fill=fill.astype(np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def row(self, code: str) -> Optional[int]:
+        """Ligne d'un code-barres (recherche dichotomique), None s'il est absent"""
+        key = code.encode()
+        if len(key) > self.barcodes.dtype.itemsize:
+            return None
+        # Clé du même type que le tableau: sinon numpy convertirait tout le tableau avant la recherche
+        position = int(np.searchsorted(self.barcodes, np.array(key, dtype=self.barcodes.dtype)))
+        if position < len(self.barcodes) and self.barcodes[position] == key:
+            return int(self.barcode_rows[position])
+        return None
+
+    def _ranges(self, grade: int, category: Optional[int]) -> List[Tuple[int, int]]:
+        """Tranches de lignes au Nutri-Score strictement meilleur (et de la catégorie donnée)"""
+        if category is None:
+            return [(0, int(self.grade_offsets[grade]))]
+        ranges = []
+        for g in range(grade):
+            # Catégories triées à l'intérieur de chaque Nutri-Score
+            start, end = int(self.grade_offsets[g]), int(self.grade_offsets[g + 1])
+            ids = self.category_ids[start:end]
+            key = ids.dtype.type(category)
+            ranges.append((
+                start + int(np.searchsorted(ids, key, side="left")),
+                start + int(np.searchsorted(ids, key, side="right")),
+            ))
+        return [(s, e) for s, e in ranges if e > s]
+
+    def nearest(
+        self,
+        vector: np.ndarray,
+        nutriscore_grade: str,
+        k: int = 3,
+        category: Optional[str] = None,
+        exclude: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        """Les k produits les plus proches (code, distance) au Nutri-Score strictement meilleur"""
+        if np.isnan(vector).all():
+            return []
+        grade = _grade_rank(nutriscore_grade)
+        category_id = None
+        if category is not None:
+            category_id = self.categories.get(category)
+            if category_id is None:
+                return []
+
+        query = ((np.where(np.isnan(vector), self.fill, vector) - self.mean) / self.scale).astype(np.float32)
+        # ||x - q||² = [x, ||x||²] . [-2q, 1] + ||q||²
+        augmented = np.append(-2 * query, np.float32(1))
+
+        rows, distances = [], []
+        for start, end in self._ranges(grade, category_id):
+            if end <= start:
+                continue
+            block = self.matrix[start:end] @ augmented
+            top = _smallest(block, k + 1)
+            rows.append(top + start)
+            distances.append(block[top])
+        if not rows:
+            return []
+
+        rows, distances = np.concatenate(rows), np.concatenate(distances) + float(query @ query)
+        order = np.argsort(distances, kind="stable")
+        results = [
+            (self.codes[r].decode(), float(np.sqrt(max(d, 0.0))))
+            for r, d in zip(rows[order], distances[order])
+        ]
+        return [(code, distance) for code, distance in results if code != exclude][:k]
+
+    def similar_better(self, product: Mapping, k: int = 3, same_category: bool = True) -> List[str]:
+        """Codes des produits nutritionnellement proches et mieux notés (catégorie la plus précise d'abord)"""
+        code = product.get("code")
+        row = self.row(code) if code else None
+        vector = self.matrix[row, :-1] * self.scale + self.mean if row is not None else nutrient_vector(product)
+
+        results: List[str] = []
+        if same_category:
+            categories = split_categories(product.get("categories"))
+            if categories:
+                results = [c for c, _ in self.nearest(vector, product.get("nutriscore_grade"), k, categories[-1], code)]
+        if len(results) < k:
+            for c, _ in self.nearest(vector, product.get("nutriscore_grade"), k, exclude=code):
+                if c not in results and len(results) < k:
+                    results.append(c)
+        return results
+
+    def save(self, path: str) -> None:
+        """Sauvegarde dans un dossier de tableaux .npy (un par attribut)"""
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "codes": self.codes,
+            "matrix": self.matrix,
+            "grades": self.grades,
+            "category_ids": self.category_ids,
+            "barcodes": self.barcodes,
+            "barcode_rows": self.barcode_rows,
+            "categories": self.category_names,
+            "mean": self.mean,
+            "scale": self.scale,
+            "fill": self.fill,
+        }
+        for name in ARRAYS:
+            # Écriture puis renommage: un processus qui lit l'index ne voit jamais un fichier à moitié écrit
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(arrays[name]))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "NutrientKNN":
+        """Recharge un index sauvegardé avec save(), projeté en mémoire (lecture seule) par défaut"""
+        mode = "r" if mmap else None
+        return cls(**{name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS})
+
+
+def build_from_store(store, batch_size: int = 100_000) -> NutrientKNN:
+    """Construit la matrice sur tout le miroir local (LocalProductStore)"""
+    return NutrientKNN.build(store.iter_rows(INDEXED_COLUMNS, batch_size))
@@ -0,0 +1,164 @@
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.category_index import split_categories
+from utils.product import NUTRIENT_FIELDS, NUTRIENT_INDEX, _to_float
+
+# Calcul du Nutri-Score selon les grilles officielles (Santé publique France, version 2017)
+# sur les nutriments pour 100g. Seuils: nombre de seuils dépassés = nombre de points.
+
+# Points défavorables (N): énergie (kJ), sucres (g), acides gras saturés (g), sodium (mg)
+ENERGY_KJ = np.array([335, 670, 1005, 1340, 1675, 2010, 2345, 2680, 3015, 3350])
+SUGARS = np.array([4.5, 9, 13.5, 18, 22.5, 27, 31, 36, 40, 45])
+SATURATED_FAT = np.arange(1, 11)
+SODIUM_MG = np.arange(90, 901, 90)
+# Matières grasses ajoutées: acides gras saturés en % des lipides (seuil atteint = point)
+SATURATED_RATIO = np.array([10, 16, 22, 28, 34, 40, 46, 52, 58, 64])
+
+# Points favorables (P): fruits, légumes et fruits à coque (%), fibres (g), protéines (g)
+FRUITS = np.array([40, 60, 80])
+FRUIT_POINTS = np.array([0, 1, 2, 5])
+FIBER = np.array([0.9, 1.9, 2.8, 3.7, 4.7])
+PROTEINS = np.array([1.6, 3.2, 4.8, 6.4, 8.0])
+
+# Boissons: grilles propres à l'énergie, aux sucres et aux fruits
+BEVERAGE_ENERGY_KJ = np.arange(0, 271, 30)
+BEVERAGE_SUGARS = np.arange(0, 13.6, 1.5)
+BEVERAGE_FRUIT_POINTS = np.array([0, 2, 4, 10])
+
+# Bornes supérieures des grades A-D (score inclus), au-delà: E
+SOLID_GRADES = np.array([-1, 2, 10, 18])
+BEVERAGE_GRADES = np.array([1, 5, 9])  # B-D, l'eau seule est classée A
+GRADES = np.array(list("ABCDE"))
+
+# Familles de produits aux règles particulières (d'après la catégorie OFF)
+GENERAL, BEVERAGE, WATER, CHEESE, FAT, NOT_APPLICABLE = range(6)
+KIND_CATEGORIES = (
+    (NOT_APPLICABLE, {"boissons alcoolisees", "alcoholic beverages", "vins", "wines", "bieres", "beers"}),
+    (WATER, {"eaux", "waters", "eaux minerales", "eaux de sources", "mineral waters", "spring waters"}),
+    (CHEESE, {"fromages", "cheeses"}),
+    (FAT, {"matieres grasses", "huiles", "huiles vegetales", "beurres", "margarines", "fats", "vegetable oils",
+           "oils", "butters"}),
+    (BEVERAGE, {"boissons", "beverages"}),
+)
+
+
+@lru_cache(maxsize=4096)
+def product_kind(categories: str) -> int:
+    """Famille Nutri-Score d'un produit d'après ses catégories OFF (chaîne partagée par beaucoup de produits)"""
+    names = set(split_categories(categories))
+    for kind, keywords in KIND_CATEGORIES:
+        if names & keywords:
+            return kind
+    return GENERAL
+
+
+def nutrient_matrix(products: Iterable[Mapping]) -> np.ndarray:
+    """Nutriments de produits (dicts OFF ou ProductInfo) en tableau (produits x NUTRIENT_FIELDS), NaN si absents"""
+    rows = []
+    for product in products:
+        nutriments = product.get("nutriments") or {}
+        rows.append([_to_float(nutriments.get(name, product.get(name))) for name in NUTRIENT_FIELDS])
+    return np.array(rows, dtype=np.float64).reshape(-1, len(NUTRIENT_FIELDS))
+
+
+def _points(thresholds: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Nombre de seuils strictement dépassés, pour chaque valeur"""
+    return np.searchsorted(thresholds, values, side="left")
+
+
+def nutriscore_scores(nutrients: np.ndarray, kinds: np.ndarray) -> np.ndarray:
+    """Scores Nutri-Score (entiers, NaN si non calculable) d'un lot de produits
+
+    `nutrients`: tableau (produits x NUTRIENT_FIELDS), `kinds`: famille de chaque produit.
+    Énergie, sucres, acides gras saturés et sel (ou sodium) sont requis; fibres
+    et fruits/légumes absents comptent pour 0, comme sur OpenFoodFacts.
+    """
+    def column(name: str) -> np.ndarray:
+        return nutrients[:, NUTRIENT_INDEX[name]]
+
+    kinds = np.asarray(kinds)
+
+    energy = column("energy_100g")
+    energy = np.where(np.isnan(energy), column("energy-kcal_100g") * 4.184, energy)
+    sodium = column("sodium_100g") * 1000
+    sodium = np.where(np.isnan(sodium), column("salt_100g") * 400, sodium)
+    sugars, saturated, fat = column("sugars_100g"), column("saturated-fat_100g"), column("fat_100g")
+    fiber = np.nan_to_num(column("fiber_100g"))
+    fruits = np.nan_to_num(column("fruits-vegetables-nuts-estimate-from-ingredients_100g"))
+
+    beverage = (kinds == BEVERAGE) | (kinds == WATER)
+    fat_kind = (kinds == FAT) & (fat > 0)
+
+    energy_points = np.where(beverage, _points(BEVERAGE_ENERGY_KJ, energy), _points(ENERGY_KJ, energy))
+    sugar_points = np.where(beverage, _points(BEVERAGE_SUGARS, sugars), _points(SUGARS, sugars))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = saturated / fat * 100
+    saturated_points = np.where(
+        fat_kind, np.searchsorted(SATURATED_RATIO, ratio, side="right"), _points(SATURATED_FAT, saturated)
+    )
+    negative = energy_points + sugar_points + saturated_points + _points(SODIUM_MG, sodium)
+
+    fruit_level = _points(FRUITS, fruits)
+    fruit_points = np.where(beverage, BEVERAGE_FRUIT_POINTS[fruit_level], FRUIT_POINTS[fruit_level])
+    protein_points = _points(PROTEINS, column("proteins_100g"))
+    # Protéines ignorées si N >= 11, sauf pour les fromages ou avec le maximum de fruits/légumes
+    count_proteins = (negative < 11) | (kinds == CHEESE) | (fruit_level == len(FRUITS))
+    positive = fruit_points + _points(FIBER, fiber) + np.where(count_proteins, protein_points, 0)
+
+    scores = (negative - positive).astype(np.float64)
+    required = np.isnan(energy) | np.isnan(sugars) | np.isnan(saturated) | np.isnan(sodium)
+    scores[required | (kinds == NOT_APPLICABLE)] = np.nan
+    return scores
+
+
+def nutriscore_grades(nutrients: np.ndarray, kinds: np.ndarray) -> np.ndarray:
+    """Grades Nutri-Score ("A" à "E", "" si non calculable) d'un lot de produits"""
+    kinds = np.asarray(kinds)
+    scores = nutriscore_scores(nutrients, kinds)
+    beverage = kinds == BEVERAGE
+    ranks = np.where(
+        beverage, np.searchsorted(BEVERAGE_GRADES, scores, side="left") + 1, np.searchsorted(SOLID_GRADES, scores)
+    )
+    ranks = np.where(kinds == WATER, 0, ranks)
+    return np.where(np.isnan(scores), "", GRADES[np.minimum(ranks, len(GRADES) - 1)])
+
+
+def compute_grades(products: Sequence[Mapping]) -> List[Optional[str]]:
+    """Nutri-Score calculé de chaque produit (dicts OFF ou ProductInfo), None si non calculable"""
+    if not products:
+        return []
+    kinds = np.array([product_kind(product.get("categories") or "") for product in products])
+    grades = nutriscore_grades(nutrient_matrix(products), kinds)
+    return [grade or None for grade in grades.tolist()]
+
+
+def compute_grade(product: Mapping) -> Optional[str]:
+    """Nutri-Score calculé d'un produit, None si non calculable"""
+    return compute_grades([product])[0]
+
+
+def validate_against_store(store, batch_size: int = 100_000) -> Dict[str, int]:
+    """Compare le Nutri-Score calculé aux grades officiels du miroir local, par lots vectorisés"""
+    report = {"graded": 0, "computed": 0, "matching": 0, "within_one": 0}
+    columns = ("nutriscore_grade", "categories", *NUTRIENT_FIELDS)
+    rows = store.iter_rows(columns, batch_size)
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            return report
+        official = np.array([str(row["nutriscore_grade"] or "").upper() for row in batch])
+        graded = np.isin(official, GRADES)
+        kinds = np.array([product_kind(row["categories"] or "") for row in batch])
+        nutrients = np.array([[_to_float(row[name]) for name in NUTRIENT_FIELDS] for row in batch])
+        computed = nutriscore_grades(nutrients, kinds)
+
+        both = graded & (computed != "")
+        gap = np.abs(np.searchsorted(GRADES, official[both]) - np.searchsorted(GRADES, computed[both]))
+        report["graded"] += int(graded.sum())
+        report["computed"] += int(both.sum())
+        report["matching"] += int((gap == 0).sum())
+        report["within_one"] += int((gap <= 1).sum())
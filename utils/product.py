@@ -0,0 +1,135 @@
+import math
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+# Nutriments conservés (pour 100g), dans l'ordre du tableau de floats
+NUTRIENT_FIELDS: Tuple[str, ...] = (
+    "energy-kcal_100g",
+    "energy_100g",
+    "fat_100g",
+    "saturated-fat_100g",
+    "carbohydrates_100g",
+    "sugars_100g",
+    "fiber_100g",
+    "proteins_100g",
+    "salt_100g",
+    "sodium_100g",
+    "fruits-vegetables-nuts-estimate-from-ingredients_100g",
+)
+NUTRIENT_INDEX: Dict[str, int] = {name: i for i, name in enumerate(NUTRIENT_FIELDS)}
+
+
+def _to_float(value: Any) -> float:
+    """Convertit une valeur OFF (nombre ou chaîne) en float, NaN si absente ou invalide"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class ProductInfo(Mapping):
+    """Fiche produit compacte (slots + nutriments dans un tableau de floats).
+
+    Se lit comme le dict renvoyé historiquement par extract_product_info:
+    product["product_name"], product.get("nutriments", {}), etc.
+    """
+
+    __slots__ = (
+        "code",
+        "product_name",
+        "brands",
+        "nutriscore_grade",
+        "nova_group",
+        "image_url",
+        "ingredients",
+        "allergens",
+        "categories",
+        "additives",
+        "detected_allergens",
+        "ultra_processing",
+        "_nutrients",
+    )
+
+    KEYS: Tuple[str, ...] = (
+        "code",
+        "product_name",
+        "brands",
+        "nutriscore_grade",
+        "nova_group",
+        "image_url",
+        "ingredients",
+        "allergens",
+        "nutriments",
+        "categories",
+        "additives",
+        "detected_allergens",
+        "ultra_processing",
+    )
+    # Anciens noms de clés encore lus par le chatbot
+    ALIASES: Dict[str, str] = {"name": "product_name", "nutriscore": "nutriscore_grade"}
+
+    def __init__(
+        self,
+        code: str = "",
+        product_name: str = "",
+        brands: str = "",
+        nutriscore_grade: str = "N/A",
+        nova_group: Union[int, str] = "N/A",
+        image_url: str = "",
+        ingredients: str = "",
+        allergens: str = "",
+        categories: str = "",
+        nutriments: Optional[Dict[str, Any]] = None,
+        additives: Tuple[str, ...] = (),
+        detected_allergens: Tuple[str, ...] = (),
+        ultra_processing: Tuple[str, ...] = (),
+    ):
+        self.code = code
+        self.product_name = product_name
+        self.brands = brands
+        self.nutriscore_grade = nutriscore_grade
+        self.nova_group = nova_group
+        self.image_url = image_url
+        self.ingredients = ingredients
+        self.allergens = allergens
+        self.categories = categories
+        # Faits extraits des ingrédients (utils.ingredients)
+        self.additives = tuple(additives)
+        self.detected_allergens = tuple(detected_allergens)
+        self.ultra_processing = tuple(ultra_processing)
+
+        nutriments = nutriments or {}
+        self._nutrients = array("d", (_to_float(nutriments.get(name)) for name in NUTRIENT_FIELDS))
+
+    @property
+    def nutriments(self) -> Dict[str, float]:
+        """Nutriments renseignés, au format OFF ({"proteins_100g": 6.3, ...})"""
+        return {
+            name: value
+            for name, value in zip(NUTRIENT_FIELDS, self._nutrients)
+            if not math.isnan(value)
+        }
+
+    def nutrient(self, name: str) -> float:
+        """Valeur d'un nutriment (NaN si non renseigné)"""
+        return self._nutrients[NUTRIENT_INDEX[name]]
+
+    def __getitem__(self, key: str) -> Any:
+        key = self.ALIASES.get(key, key)
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Copie en dict classique"""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"ProductInfo(code={self.code!r}, product_name={self.product_name!r}, nutriscore_grade={self.nutriscore_grade!r})"
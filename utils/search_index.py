@@ -0,0 +1,221 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from utils.cache import normalize_query
+
+# Mots vides (déjà sans accents, comme les requêtes normalisées)
+STOP_WORDS = frozenset(
+    "a au aux avec ce ces d dans de des du en et l la le les leur ma mes mon ou par pas "
+    "pour sa sans se ses son sous sur ta un une vos votre y".split()
+)
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# Poids des champs (BM25F simplifié: un mot du nom compte plus qu'une catégorie)
+FIELD_WEIGHTS = (("product_name", 3), ("brands", 2), ("categories", 1))
+INDEXED_COLUMNS = ("code", "product_name", "brands", "categories", "unique_scans_n")
+
+
+def stem(word: str) -> str:
+    """Racinisation légère du français: pluriels (s/x) puis e finaux ("sucrées" -> "sucr")"""
+    if word.isdigit():
+        return word
+    if len(word) > 3 and word[-1] in "sx" and not word.endswith("ss"):
+        word = word[:-1]
+    while len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Texte -> termes indexés: minuscules sans accents, sans mots vides, racinisés"""
+    return [
+        stem(token)
+        for token in TOKEN.findall(normalize_query(text or ""))
+        if token not in STOP_WORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+class SearchIndex:
+    """Index inversé BM25 (nom, marque, catégories) en tableaux NumPy.
+
+    Les scores BM25 de chaque couple (terme, produit) sont précalculés à la
+    construction: une recherche se résume à additionner quelques tranches de
+    tableaux puis à garder les meilleurs avec argpartition. Les postings de
+    chaque terme sont rangés par impact (score, puis popularité): une
+    recherche d'un seul mot, même très fréquent, lit directement sa page.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        popularity: np.ndarray,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        weights: np.ndarray,
+        impact_ordered: bool = False,
+    ):
+        self.codes = codes
+        self.popularity = popularity
+        self.terms = terms
+        self.offsets = offsets
+        # impact_ordered: postings déjà rangés par _impact_order (index sauvegardé par save())
+        if not impact_ordered:
+            postings, weights = self._impact_order(offsets, postings, weights, popularity)
+        self.postings = postings
+        self.weights = weights
+
+    @staticmethod
+    def _impact_order(
+        offsets: np.ndarray, postings: np.ndarray, weights: np.ndarray, popularity: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Postings de chaque terme triés par score décroissant, puis popularité, puis produit (ordre de search)"""
+        terms = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        order = np.lexsort((postings, -popularity[postings], -weights, terms))
+        return postings[order], weights[order]
+
+    @classmethod
+    def build(cls, products: Iterable[Dict]) -> "SearchIndex":
+        """Construit l'index à partir de produits au format OFF (code, product_name, brands, categories)"""
+        codes: List[str] = []
+        popularity: List[int] = []
+        lengths: List[int] = []
+        vocabulary: Dict[str, int] = {}
+        doc_ids: List[int] = []
+        term_ids: List[int] = []
+        freqs: List[int] = []
+
+        for product in products:
+            code = product.get("code")
+            if not code:
+                continue
+
+            bag: Counter = Counter()
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(str(product.get(field) or "")):
+                    bag[token] += weight
+
+            doc = len(codes)
+            codes.append(str(code))
+            popularity.append(int(product.get("unique_scans_n") or 0))
+            lengths.append(sum(bag.values()))
+            for token, freq in bag.items():
+                doc_ids.append(doc)
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                freqs.append(freq)
+
+        doc_array = np.asarray(doc_ids, dtype=np.int32)
+        term_array = np.asarray(term_ids, dtype=np.int32)
+        freq_array = np.asarray(freqs, dtype=np.float32)
+        length_array = np.asarray(lengths, dtype=np.float32)
+
+        # Postings triés par terme (CSR): offsets[t]:offsets[t+1]
+        order = np.argsort(term_array, kind="stable")
+        doc_array, term_array, freq_array = doc_array[order], term_array[order], freq_array[order]
+        df = np.bincount(term_array, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        n_docs = max(len(codes), 1)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = float(length_array.mean()) if len(lengths) else 1.0
+        norm = cls.K1 * (1 - cls.B + cls.B * length_array[doc_array] / avg_length)
+        weights = idf[term_array] * freq_array * (cls.K1 + 1) / (freq_array + norm)
+
+        return cls(
+            codes=np.asarray(codes, dtype=str),
+            popularity=np.asarray(popularity, dtype=np.int64),
+            terms=vocabulary,
+            offsets=offsets,
+            postings=doc_array,
+            weights=weights.astype(np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def search(self, query: str, page_size: int = 20, page: int = 1) -> List[str]:
+        """Codes-barres des produits les mieux classés (BM25, puis popularité à score égal)"""
+        term_ids = [self.terms[t] for t in dict.fromkeys(tokenize(query)) if t in self.terms]
+        if not term_ids:
+            return []
+
+        slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        total = sum(s.stop - s.start for s in slices)
+        if len(slices) == 1:
+            # Postings déjà rangés par impact: la page est une tranche, sans tri
+            start = slices[0].start + (page - 1) * page_size
+            docs = self.postings[start:min(start + page_size, slices[0].stop)]
+            return [str(code) for code in self.codes[docs]]
+        if total * 8 > len(self.codes):
+            # Termes fréquents: accumulateur dense (un produit apparaît au plus une fois par terme)
+            accumulator = np.zeros(len(self.codes), dtype=np.float32)
+            for s in slices:
+                accumulator[self.postings[s]] += self.weights[s]
+            docs = np.flatnonzero(accumulator)
+            scores = accumulator[docs]
+        else:
+            docs, inverse = np.unique(
+                np.concatenate([self.postings[s] for s in slices]), return_inverse=True
+            )
+            scores = np.bincount(
+                inverse, weights=np.concatenate([self.weights[s] for s in slices])
+            ).astype(np.float32)
+
+        wanted = page * page_size
+        if len(docs) > wanted:
+            # Meilleurs scores, puis les plus populaires parmi les ex aequo au seuil
+            threshold = np.partition(scores, len(scores) - wanted)[len(scores) - wanted]
+            above = np.flatnonzero(scores > threshold)
+            tied = np.flatnonzero(scores == threshold)
+            missing = wanted - len(above)
+            if len(tied) > missing:
+                tied = tied[np.argpartition(-self.popularity[docs[tied]], missing - 1)[:missing]]
+            keep = np.concatenate([above, tied])
+            docs, scores = docs[keep], scores[keep]
+
+        ranked = np.lexsort((-self.popularity[docs], -scores))
+        start = (page - 1) * page_size
+        return [str(code) for code in self.codes[docs[ranked[start:start + page_size]]]]
+
+    def save(self, path: str) -> None:
+        """Sauvegarde compacte (.npz)"""
+        vocabulary = np.empty(len(self.terms), dtype=object)
+        for term, term_id in self.terms.items():
+            vocabulary[term_id] = term
+        np.savez(
+            path,
+            codes=self.codes,
+            popularity=self.popularity,
+            terms=vocabulary.astype(str),
+            offsets=self.offsets,
+            postings=self.postings,
+            weights=self.weights,
+            impact_ordered=True,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SearchIndex":
+        """Recharge un index sauvegardé avec save()"""
+        with np.load(path) as data:
+            return cls(
+                codes=data["codes"],
+                popularity=data["popularity"],
+                terms={term: i for i, term in enumerate(data["terms"].tolist())},
+                offsets=data["offsets"],
+                postings=data["postings"],
+                weights=data["weights"],
+                # Index sauvegardé avant le rangement par impact: rangé au chargement
+                impact_ordered="impact_ordered" in data.files,
+            )
+
+
+def build_from_store(store, batch_size: int = 100_000) -> SearchIndex:
+    """Construit l'index sur tout le miroir local (LocalProductStore)"""
+    return SearchIndex.build(store.iter_rows(INDEXED_COLUMNS, batch_size))
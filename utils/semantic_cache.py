@@ -0,0 +1,172 @@
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.cache import normalize_query
+from utils.search_index import TOKEN, stem
+
+# Dimension des vecteurs (hachage des n-grammes) et tailles de n-grammes de caractères
+DIMENSION = 1024
+NGRAM_SIZES = (3, 4, 5)
+# Tournures interrogatives et articles sans contenu ("c'est quoi", "qu'est-ce que", "svp"), ignorés
+FILLER_WORDS = frozenset(
+    "qu est ce que quoi svp stp il faut peux tu moi dire le la les un une des du de".split()
+)
+# Élisions ("c'est", "l'étiquette", "qu'est"): retirées avant le découpage, pour garder les lettres isolées
+ELISION = re.compile(r"\b(?:qu|[cdjlmnst])['’]")
+# Mots qui inversent le sens d'une question ("sans gluten" / "avec gluten")
+QUALIFIERS = frozenset({"sans", "avec", "pas", "non", "without", "with", "free"})
+
+
+def question_terms(text: str) -> List[str]:
+    """Mots d'une question: minuscules sans accents, sans tournures interrogatives
+
+    Contrairement à la recherche (search_index.tokenize), lettres isolées et
+    chiffres sont gardés: "Nutri-Score A" et "Nutri-Score E", "vitamine C" et
+    "vitamine D" sont des questions différentes.
+    """
+    return [word for word in TOKEN.findall(ELISION.sub(" ", normalize_query(text or ""))) if word not in FILLER_WORDS]
+
+
+def discriminants(terms: List[str]) -> int:
+    """Empreinte des mots qui changent la réponse sans presque changer le texte
+
+    Lettres isolées (grade, vitamine), mots avec chiffres (NOVA 4, E171) et
+    négations: deux questions ne se répondent que si ces mots sont identiques.
+    """
+    words = sorted({w for w in terms if len(w) == 1 or any(c.isdigit() for c in w) or w in QUALIFIERS})
+    return zlib.crc32(" ".join(words).encode("utf-8"))
+
+
+def vectorize(text: str, dimension: int = DIMENSION) -> np.ndarray:
+    """Vecteur normé des n-grammes de caractères hachés (hors ligne, sans modèle ni vocabulaire)
+
+    Mots de la question (question_terms) racinisés et accolés ("nutri scor" =
+    "nutriscor"): "C'est quoi le Nutri-Score ?" et "Qu'est-ce que le
+    nutriscore" donnent le même texte. crc32 plutôt que hash(): les vecteurs
+    restent identiques d'un process à l'autre. Le bit de poids fort donne un
+    signe ±1 qui compense en moyenne les collisions.
+    """
+    text = " " + "".join(stem(word) for word in question_terms(text)) + " "
+    hashes = np.array(
+        [zlib.crc32(text[i:i + n].encode("utf-8")) for n in NGRAM_SIZES for i in range(len(text) - n + 1)],
+        dtype=np.uint32,
+    )
+    vector = np.zeros(dimension, dtype=np.float32)
+    if not len(hashes):
+        return vector
+    signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dimension, signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Cache mémoire des réponses aux questions proches (similarité cosinus), partagé par toutes les sessions.
+
+    Les questions sont des vecteurs normés rangés dans une matrice (l'index):
+    une recherche est un produit matrice-vecteur et un argmax, environ une
+    milliseconde pour 5 000 entrées. Au-delà de `max_entries`, la plus
+    ancienne entrée est remplacée. Une entrée ne répond que si ses mots
+    discriminants (lettres isolées, chiffres, négations) sont ceux de la
+    question, quelle que soit la similarité.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 5_000,
+        max_length: int = 200,
+        dimension: int = DIMENSION,
+    ):
+        # Cosinus minimal: reformulations ~1.0, questions voisines ("sucres cachés" / "additifs cachés") ~0.5-0.65
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Au-delà, un texte n'est plus une question courte (contexte, liste de produits): jamais mis en cache
+        self.max_length = max_length
+        self.dimension = dimension
+        self.hits = 0
+        self.misses = 0
+        self._matrix = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._namespaces = np.full(max_entries, -1, dtype=np.int32)
+        self._discriminants = np.zeros(max_entries, dtype=np.uint32)
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._namespace_ids: Dict[str, int] = {}
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def accepts(self, question: str) -> bool:
+        """Question assez courte pour être mise en cache"""
+        return 0 < len(question.strip()) <= self.max_length
+
+    def get(self, question: str, namespace: str = "") -> Optional[str]:
+        """Réponse à la question en cache la plus proche (même namespace), si assez similaire et non expirée"""
+        if not self.accepts(question):
+            return None
+        query = vectorize(question, self.dimension)
+        signature = discriminants(question_terms(question))
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None or not self._size:
+                self.misses += 1
+                return None
+            scores = self._matrix[:self._size] @ query
+            valid = (
+                (self._namespaces[:self._size] == namespace_id)
+                & (self._discriminants[:self._size] == signature)
+                & (self._expires_at[:self._size] > time.time())
+            )
+            scores[~valid] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._answers[best]
+
+    def set(self, question: str, answer: str, namespace: str = "") -> None:
+        """Mémorise la réponse à une question (remplace l'entrée la plus ancienne si le cache est plein)"""
+        if not self.accepts(question) or not answer:
+            return
+        vector = vectorize(question, self.dimension)
+        signature = discriminants(question_terms(question))
+        with self._lock:
+            slot = self._next
+            self._matrix[slot] = vector
+            self._discriminants[slot] = signature
+            self._expires_at[slot] = time.time() + self.ttl
+            self._namespaces[slot] = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+            self._answers[slot] = answer
+            self._next = (slot + 1) % self.max_entries
+            self._size = max(self._size, slot + 1)
+
+    def clear(self) -> None:
+        """Vide le cache et remet les compteurs à zéro"""
+        with self._lock:
+            self._namespaces[:] = -1
+            self._answers = [None] * self.max_entries
+            self._next = 0
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, float]:
+        """Compteurs hit/miss depuis le démarrage du process"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
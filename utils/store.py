@@ -0,0 +1,469 @@
+"""Miroir local de la base OpenFoodFacts (DuckDB)
+
+Usage:
+    uv run python -m utils.store ingest en.openfoodfacts.org.products.csv.gz
+    uv run python -m utils.store ingest openfoodfacts-products.jsonl.gz --db .cache/off.duckdb --workers 8
+    uv run python -m utils.store ingest openfoodfacts-products.jsonl.gz --restart
+    uv run python -m utils.store sync --download          # deltas quotidiens OFF
+    uv run python -m utils.store sync products-since-monday.jsonl.gz
+    uv run python -m utils.store index                    # index BM25, autocomplétion, codes-barres, catégories
+    uv run python -m utils.store stats
+"""
+
+import argparse
+import gzip
+import math
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+import pandas as pd
+
+from utils.cache import normalize_query
+from utils.data import OpenFoodFactsAPI, raw_nutriscore
+from utils.product import NUTRIENT_FIELDS
+
+if TYPE_CHECKING:
+    from utils.search_index import SearchIndex
+
+DEFAULT_DB_PATH = os.path.join(".cache", "off.duckdb")
+DEFAULT_INDEX_PATH = os.path.join(".cache", "search_index.npz")
+DEFAULT_AUTOCOMPLETE_PATH = os.path.join(".cache", "autocomplete.npz")
+DEFAULT_BARCODE_INDEX_PATH = os.path.join(".cache", "barcodes.npz")
+DEFAULT_CATEGORY_INDEX_PATH = os.path.join(".cache", "categories.npz")
+DEFAULT_KNN_INDEX_PATH = os.path.join(".cache", "nutrients")
+
+SCHEMA = [
+    ("code", "VARCHAR PRIMARY KEY"),
+    ("product_name", "VARCHAR"),
+    ("brands", "VARCHAR"),
+    ("nutriscore_grade", "VARCHAR"),
+    ("nova_group", "TINYINT"),
+    ("image_url", "VARCHAR"),
+    ("categories", "VARCHAR"),
+    ("allergens", "VARCHAR"),
+    ("ingredients_text", "VARCHAR"),
+    *[(name, "DOUBLE") for name in NUTRIENT_FIELDS],
+    ("unique_scans_n", "BIGINT"),
+    ("last_modified_t", "BIGINT"),
+]
+STORE_COLUMNS = [name for name, _ in SCHEMA]
+CSV_COLUMNS = set(STORE_COLUMNS)
+
+
+def products_to_frame(products: List[Dict]) -> pd.DataFrame:
+    """Aplatit des produits OFF (format JSON) en tableau au schéma du miroir"""
+    records = []
+    for p in products:
+        record = {column: p.get(column) for column in STORE_COLUMNS if column not in NUTRIENT_FIELDS}
+        record["nutriscore_grade"] = raw_nutriscore(p)
+        nutriments = p.get("nutriments") or {}
+        record.update({name: nutriments.get(name) for name in NUTRIENT_FIELDS})
+        records.append(record)
+    return pd.DataFrame.from_records(records, columns=STORE_COLUMNS)
+
+
+def to_store_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Type un tableau plat (export CSV ou products_to_frame) au schéma du miroir"""
+    frame = OpenFoodFactsAPI.normalize_frame(frame)
+    for column in ("ingredients_text", "unique_scans_n", "last_modified_t"):
+        if column not in frame.columns:
+            frame[column] = None
+
+    frame["nutriscore_grade"] = frame["nutriscore_grade"].astype("string")
+    frame["ingredients_text"] = frame["ingredients_text"].astype("string").replace("", pd.NA)
+    for column in ("unique_scans_n", "last_modified_t"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("Int64")
+
+    frame = frame[frame["code"].notna()].drop_duplicates("code", keep="last")
+    return frame[STORE_COLUMNS]
+
+
+def _open_text(path: str):
+    """Ouvre un fichier texte, décompressé à la volée s'il est en .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+# Upsert d'un lot de delta: la version du miroir est gardée si elle est plus récente (dates absentes: remplacée)
+UPSERT_IF_NEWER = (
+    "INSERT INTO products SELECT * FROM batch ON CONFLICT (code) DO UPDATE SET "
+    + ", ".join(f'"{name}" = excluded."{name}"' for name in STORE_COLUMNS if name != "code")
+    + " WHERE excluded.last_modified_t IS NULL OR products.last_modified_t IS NULL"
+    " OR excluded.last_modified_t >= products.last_modified_t"
+)
+
+
+class LocalProductStore:
+    """Miroir local des produits OpenFoodFacts (DuckDB, clé primaire = code-barres)"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        read_only: bool = False,
+        search_index: Optional["SearchIndex"] = None,
+        lock_timeout: float = 5.0,
+    ):
+        self.path = path
+        # Index BM25 (utils.search_index), sinon recherche LIKE en SQL
+        self.search_index = search_index
+        # Lecture seule: attente maximale (s) que le process qui écrit (sync, ingest) libère le fichier
+        self.lock_timeout = lock_timeout
+        if path != ":memory:" and not read_only:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Lecture seule: pas de connexion permanente, qui empêcherait un autre process d'écrire (verrou DuckDB)
+        self._conn = None if read_only else duckdb.connect(path)
+        if read_only:
+            self._cursor().close()
+        else:
+            columns = ", ".join(f'"{name}" {sql_type}' for name, sql_type in SCHEMA)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS products ({columns})")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingest_progress "
+                "(source VARCHAR PRIMARY KEY, chunk_index BIGINT, rows BIGINT)"
+            )
+            # Taille des lots et empreinte du fichier: la reprise n'a de sens qu'à l'identique
+            for column, sql_type in (("chunk_size", "BIGINT"), ("fingerprint", "VARCHAR"), ("completed", "BOOLEAN")):
+                self._conn.execute(f"ALTER TABLE ingest_progress ADD COLUMN IF NOT EXISTS {column} {sql_type}")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key VARCHAR PRIMARY KEY, value BIGINT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS tombstones (code VARCHAR PRIMARY KEY, deleted_t BIGINT)")
+            # Journal des suppressions effectives (compact_tombstones), lu par les index pour les suivre
+            self._conn.execute("CREATE TABLE IF NOT EXISTS deletions (code VARCHAR PRIMARY KEY, deleted_t BIGINT)")
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        """Curseur propre à l'appelant (les connexions DuckDB ne sont pas partagées entre threads)
+
+        En lecture seule, une connexion ouverte pour l'appel et fermée avec le
+        curseur: le fichier n'est verrouillé que le temps des requêtes, et
+        `sync` peut écrire entre deux pages de l'application.
+        """
+        if self._conn is not None:
+            return self._conn.cursor()
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                return duckdb.connect(self.path, read_only=True)
+            except duckdb.IOException:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+    def upsert_frame(self, frame: pd.DataFrame) -> int:
+        """Insère ou remplace (par code-barres) un lot au schéma du miroir"""
+        if frame.empty:
+            return 0
+
+        cursor = self._cursor()
+        cursor.register("batch", frame)
+        try:
+            cursor.execute("INSERT OR REPLACE INTO products SELECT * FROM batch")
+        finally:
+            cursor.unregister("batch")
+        return len(frame)
+
+    def commit_chunk(self, frame: pd.DataFrame, source: str, chunk_index: int) -> None:
+        """Écrit un lot et enregistre sa position dans la même transaction (reprise possible)"""
+        cursor = self._cursor()
+        cursor.register("batch", frame)
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            if not frame.empty:
+                cursor.execute("INSERT OR REPLACE INTO products SELECT * FROM batch")
+            cursor.execute(
+                "INSERT INTO ingest_progress (source, chunk_index, rows) VALUES (?, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET chunk_index = excluded.chunk_index, "
+                "rows = ingest_progress.rows + excluded.rows",
+                [source, chunk_index, len(frame)],
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.unregister("batch")
+
+    def start_ingest(self, source: str, chunk_size: int, fingerprint: str) -> None:
+        """(Re)commence l'import d'une source: position remise à zéro, taille des lots et empreinte enregistrées"""
+        self._cursor().execute(
+            "INSERT OR REPLACE INTO ingest_progress VALUES (?, -1, 0, ?, ?, false)",
+            [source, chunk_size, fingerprint],
+        )
+
+    def finish_ingest(self, source: str) -> None:
+        """Marque l'import d'une source comme terminé"""
+        self._cursor().execute("UPDATE ingest_progress SET completed = true WHERE source = ?", [source])
+
+    def ingest_state(self, source: str) -> Optional[Dict]:
+        """Position de l'import d'une source (chunk_index, rows, chunk_size, fingerprint, completed), None si aucune"""
+        row = self._cursor().execute(
+            "SELECT chunk_index, rows, chunk_size, fingerprint, completed FROM ingest_progress WHERE source = ?",
+            [source],
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("chunk_index", "rows", "chunk_size", "fingerprint", "completed"), row))
+
+    def last_committed_chunk(self, source: str) -> int:
+        """Index du dernier lot importé pour cette source (-1 si aucun)"""
+        row = self._cursor().execute(
+            "SELECT chunk_index FROM ingest_progress WHERE source = ?", [source]
+        ).fetchone()
+        return row[0] if row else -1
+
+    def version(self) -> Tuple[int, int, int]:
+        """Marqueur des changements du miroir (watermark, nombre et date des suppressions): change à chaque sync effectif"""
+        return self._cursor().execute(
+            "SELECT coalesce((SELECT value FROM sync_state WHERE key = 'watermark'), 0), "
+            "(SELECT count(*) FROM deletions), coalesce((SELECT max(deleted_t) FROM deletions), 0)"
+        ).fetchone()
+
+    def get_watermark(self) -> int:
+        """Date (timestamp) de la dernière modification synchronisée, 0 si jamais synchronisé"""
+        row = self._cursor().execute("SELECT value FROM sync_state WHERE key = 'watermark'").fetchone()
+        return row[0] if row else 0
+
+    def apply_delta(self, frame: pd.DataFrame, deleted: Dict[str, int], watermark: int) -> None:
+        """Applique un lot de delta (upserts + suppressions) et avance le watermark, en une transaction
+
+        Un produit n'est remplacé que par une version au moins aussi récente
+        (last_modified_t): un delta plus ancien que l'export importé ne le fait
+        pas revenir en arrière.
+        """
+        cursor = self._cursor()
+        cursor.register("batch", frame)
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            if not frame.empty:
+                cursor.execute(UPSERT_IF_NEWER)
+                # Un produit recréé après sa suppression n'est plus à supprimer
+                cursor.execute("DELETE FROM tombstones WHERE code IN (SELECT code FROM batch)")
+            if deleted:
+                cursor.executemany("INSERT OR REPLACE INTO tombstones VALUES (?, ?)", list(deleted.items()))
+            cursor.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES ('watermark', "
+                "greatest(?, coalesce((SELECT value FROM sync_state WHERE key = 'watermark'), 0)))",
+                [watermark],
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.unregister("batch")
+
+    def seed_watermark(self) -> int:
+        """Aligne le watermark sur la modification la plus récente du miroir (après un import complet)"""
+        cursor = self._cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO sync_state VALUES ('watermark', greatest("
+            "coalesce((SELECT max(last_modified_t) FROM products), 0), "
+            "coalesce((SELECT value FROM sync_state WHERE key = 'watermark'), 0)))"
+        )
+        return self.get_watermark()
+
+    def compact_tombstones(self) -> int:
+        """Supprime les produits marqués supprimés (sauf modifiés depuis), les inscrit au journal et vide les tombstones"""
+        cursor = self._cursor()
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            (removed,) = cursor.execute(
+                "SELECT COUNT(*) FROM products p JOIN tombstones t USING (code) "
+                "WHERE coalesce(p.last_modified_t, 0) <= t.deleted_t"
+            ).fetchone()
+            cursor.execute(
+                "INSERT OR REPLACE INTO deletions SELECT t.code, t.deleted_t FROM tombstones t "
+                "JOIN products p USING (code) WHERE coalesce(p.last_modified_t, 0) <= t.deleted_t"
+            )
+            cursor.execute(
+                "DELETE FROM products WHERE code IN (SELECT t.code FROM tombstones t JOIN products p USING (code) "
+                "WHERE coalesce(p.last_modified_t, 0) <= t.deleted_t)"
+            )
+            cursor.execute("DELETE FROM tombstones")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return removed
+
+    def deleted_since(self, since: int) -> List[Tuple[str, int]]:
+        """Produits supprimés du miroir après `since` (code, date de suppression)"""
+        return self._cursor().execute(
+            "SELECT code, deleted_t FROM deletions WHERE deleted_t > ? ORDER BY deleted_t", [since]
+        ).fetchall()
+
+    def get_product(self, barcode: str) -> Optional[Dict]:
+        """Produit au format OFF (nutriments imbriqués), None s'il est absent"""
+        cursor = self._cursor()
+        row = cursor.execute("SELECT * FROM products WHERE code = ?", [barcode]).fetchone()
+        if row is None:
+            return None
+        return self._to_product(dict(zip(STORE_COLUMNS, row)))
+
+    def get_many(self, barcodes: List[str]) -> List[Dict]:
+        """Produits présents parmi ces codes-barres, dans l'ordre demandé"""
+        if not barcodes:
+            return []
+        rows = self._cursor().execute(
+            "SELECT * FROM products WHERE code IN (SELECT unnest(?::VARCHAR[]))", [list(barcodes)]
+        ).fetchall()
+        by_code = {row[0]: row for row in rows}
+        return [
+            self._to_product(dict(zip(STORE_COLUMNS, by_code[code])))
+            for code in barcodes
+            if code in by_code
+        ]
+
+    def iter_rows(
+        self, columns: Sequence[str], batch_size: int = 100_000, since: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """Parcourt le miroir (quelques colonnes) sans le charger en mémoire, éventuellement les seuls produits modifiés après `since`"""
+        cursor = self._cursor()
+        selected = ", ".join(f'"{name}"' for name in columns)
+        if since is None:
+            cursor.execute(f"SELECT {selected} FROM products")
+        else:
+            cursor.execute(f"SELECT {selected} FROM products WHERE last_modified_t > ?", [since])
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(columns, row))
+
+    def search_products(self, query: str, page_size: int = 20, page: int = 1) -> List[Dict]:
+        """Recherche par mots dans le nom et la marque, produits les plus scannés d'abord"""
+        if self.search_index is not None:
+            return self.get_many(self.search_index.search(query, page_size, page))
+
+        terms = normalize_query(query).split()
+        if not terms:
+            return []
+
+        haystack = "strip_accents(lower(coalesce(product_name, '') || ' ' || coalesce(brands, '')))"
+        conditions = " AND ".join(f"{haystack} LIKE ?" for _ in terms)
+        sql = (
+            f"SELECT * FROM products WHERE {conditions} "
+            "ORDER BY unique_scans_n DESC NULLS LAST, code LIMIT ? OFFSET ?"
+        )
+        rows = self._cursor().execute(
+            sql, [*(f"%{term}%" for term in terms), page_size, (page - 1) * page_size]
+        ).fetchall()
+        return [self._to_product(dict(zip(STORE_COLUMNS, row))) for row in rows]
+
+    @staticmethod
+    def _to_product(row: Dict[str, Any]) -> Dict:
+        """Ligne du miroir -> dict produit au format de l'API (champs vides omis)"""
+        def present(value: Any) -> bool:
+            return value is not None and not (isinstance(value, float) and math.isnan(value))
+
+        product = {
+            name: value
+            for name, value in row.items()
+            if name not in NUTRIENT_FIELDS and present(value)
+        }
+        product["nutriments"] = {name: row[name] for name in NUTRIENT_FIELDS if present(row[name])}
+        return product
+
+    def count(self) -> int:
+        (count,) = self._cursor().execute("SELECT COUNT(*) FROM products").fetchone()
+        return count
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("NUTRISCAN_LOCAL_DB", DEFAULT_DB_PATH), help="fichier DuckDB du miroir")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="importer un export OFF (CSV ou JSONL, .gz accepté)")
+    ingest.add_argument("path")
+    ingest.add_argument("--chunk-size", type=int, default=20_000, help="lignes par lot")
+    ingest.add_argument("--workers", type=int, default=None, help="processus de parsing (défaut: nb de CPU)")
+    ingest.add_argument("--restart", action="store_true", help="ignorer la reprise et tout réimporter")
+
+    sync = commands.add_parser("sync", help="appliquer les deltas OFF plus récents que le dernier sync")
+    sync.add_argument("paths", nargs="*", help="fichiers ou dossiers de deltas JSONL (défaut: --delta-dir)")
+    sync.add_argument("--delta-dir", default=os.path.join(".cache", "deltas"))
+    sync.add_argument("--download", action="store_true", help="télécharger d'abord les nouveaux deltas OFF")
+
+    index = commands.add_parser("index", help="construire les index du miroir (BM25, autocomplétion, codes-barres, catégories, nutriments)")
+    index.add_argument("--output", default=os.getenv("NUTRISCAN_SEARCH_INDEX", DEFAULT_INDEX_PATH))
+    index.add_argument("--autocomplete-output", default=os.getenv("NUTRISCAN_AUTOCOMPLETE", DEFAULT_AUTOCOMPLETE_PATH))
+    index.add_argument("--barcodes-output", default=os.getenv("NUTRISCAN_BARCODE_INDEX", DEFAULT_BARCODE_INDEX_PATH))
+    index.add_argument("--categories-output", default=os.getenv("NUTRISCAN_CATEGORY_INDEX", DEFAULT_CATEGORY_INDEX_PATH))
+    index.add_argument("--knn-output", default=os.getenv("NUTRISCAN_KNN_INDEX", DEFAULT_KNN_INDEX_PATH))
+
+    commands.add_parser("nutriscore", help="comparer le Nutri-Score calculé aux grades officiels du miroir")
+
+    commands.add_parser("stats", help="afficher le nombre de produits du miroir")
+
+    args = parser.parse_args()
+    store = LocalProductStore(args.db, read_only=args.command in ("stats", "index", "nutriscore"))
+    try:
+        if args.command == "ingest":
+            from utils.ingest import parallel_ingest
+
+            total = parallel_ingest(
+                store, args.path, chunk_size=args.chunk_size, workers=args.workers, resume=not args.restart
+            )
+            print(f"✅ {total:,} produits dans {args.db}")
+        elif args.command == "sync":
+            from utils.sync import download_deltas, sync_deltas
+
+            if args.download:
+                download_deltas(args.delta_dir, since=store.get_watermark())
+            report = sync_deltas(store, args.paths or [args.delta_dir])
+            print(
+                f"✅ {report['files']} fichier(s), {report['upserted']:,} mis à jour, "
+                f"{report['deleted']:,} supprimés, watermark={report['watermark']}"
+            )
+        elif args.command == "index":
+            from utils import autocomplete, barcode, category_index, nutrient_knn, search_index
+
+            started = time.perf_counter()
+            bm25 = search_index.build_from_store(store)
+            bm25.save(args.output)
+            print(f"✅ {len(bm25):,} produits indexés dans {args.output} ({time.perf_counter() - started:.0f}s)")
+
+            started = time.perf_counter()
+            completions = autocomplete.build_from_store(store)
+            completions.save(args.autocomplete_output)
+            print(f"✅ {len(completions):,} noms et marques dans {args.autocomplete_output} ({time.perf_counter() - started:.0f}s)")
+
+            barcodes = barcode.build_from_store(store)
+            barcodes.save(args.barcodes_output)
+            print(f"✅ {len(barcodes):,} codes-barres dans {args.barcodes_output}")
+
+            categories = category_index.build_from_store(store)
+            categories.save(args.categories_output)
+            print(f"✅ {len(categories.categories):,} catégories dans {args.categories_output}")
+
+            started = time.perf_counter()
+            knn = nutrient_knn.build_from_store(store)
+            knn.save(args.knn_output)
+            print(f"✅ {len(knn):,} profils nutritionnels dans {args.knn_output} ({time.perf_counter() - started:.0f}s)")
+        elif args.command == "nutriscore":
+            from utils.nutriscore import validate_against_store
+
+            started = time.perf_counter()
+            report = validate_against_store(store)
+            computed = max(report["computed"], 1)
+            print(
+                f"✅ {report['computed']:,} / {report['graded']:,} grades officiels recalculés "
+                f"({time.perf_counter() - started:.0f}s): {report['matching'] / computed:.1%} identiques, "
+                f"{report['within_one'] / computed:.1%} à un grade près"
+            )
+        else:
+            print(f"{store.count():,} produits dans {args.db}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import glob
+import json
+import os
+import re
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.data import OpenFoodFactsAPI
+from utils.store import LocalProductStore, _open_text, products_to_frame, to_store_frame
+
+DELTA_BASE_URL = "https://static.openfoodfacts.org/data/delta"
+# openfoodfacts_products_<début>_<fin>.json.gz (timestamps Unix)
+DELTA_NAME = re.compile(r"_(\d+)_(\d+)\.jsonl?(\.gz)?$")
+DELTA_PATTERNS = ("*.json", "*.json.gz", "*.jsonl", "*.jsonl.gz")
+
+
+def delta_window(path: str) -> Optional[Tuple[int, int]]:
+    """Période couverte par un delta OFF d'après son nom, None pour un fichier JSONL quelconque"""
+    match = DELTA_NAME.search(os.path.basename(path))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def collect_delta_files(paths: Iterable[str]) -> List[str]:
+    """Fichiers à appliquer, deltas OFF dans l'ordre chronologique puis les autres JSONL par nom"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(f for pattern in DELTA_PATTERNS for f in glob.glob(os.path.join(path, pattern)))
+        elif os.path.exists(path):
+            files.append(path)
+
+    def order(path: str) -> Tuple[int, float, str]:
+        window = delta_window(path)
+        return (0, window[1], path) if window else (1, 0, os.path.basename(path))
+
+    return sorted(set(files), key=order)
+
+
+def _modified_t(product: Dict) -> int:
+    try:
+        return int(product.get("last_modified_t") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _is_deleted(product: Dict) -> bool:
+    """Tombstone OFF: produit supprimé ("deleted": "on" / true)"""
+    return product.get("deleted") not in (None, False, "", 0, "0", "off")
+
+
+def sync_deltas(store: LocalProductStore, paths: Iterable[str], batch_size: int = 10_000) -> Dict[str, int]:
+    """Applique au miroir les deltas plus récents que son watermark, puis compacte les tombstones.
+
+    Le coût dépend du nombre de produits modifiés: les deltas déjà couverts par
+    le watermark ne sont pas relus, et dans un fichier les lignes plus anciennes
+    que le watermark sont ignorées (à égalité elles sont réappliquées, l'upsert
+    étant idempotent). Les lignes d'un fichier ne sont pas triées par date: le
+    watermark n'avance qu'une fois le fichier entier appliqué, une
+    synchronisation interrompue reprend donc au début du fichier.
+    """
+    since = store.get_watermark()
+    report = {"files": 0, "upserted": 0, "deleted": 0, "watermark": since}
+
+    for path in collect_delta_files(paths):
+        window = delta_window(path)
+        if window is not None and window[1] <= since:
+            continue
+
+        file_watermark = window[1] if window is not None else 0
+        # Tombstone sans date: fin de la période du delta, sinon date du fichier (jamais le watermark,
+        # nul sur un miroir jamais synchronisé, qui ferait garder le produit au compactage)
+        undated_t = window[1] if window is not None else int(os.path.getmtime(path))
+        with _open_text(path) as lines:
+            while True:
+                raw = list(islice(lines, batch_size))
+                if not raw:
+                    break
+
+                live: Dict[str, Dict] = {}
+                deleted: Dict[str, int] = {}
+                for line in raw:
+                    try:
+                        product = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    code = product.get("code")
+                    modified_t = _modified_t(product)
+                    if not code or (modified_t and modified_t < since):
+                        continue
+
+                    file_watermark = max(file_watermark, modified_t)
+                    if _is_deleted(product):
+                        live.pop(code, None)
+                        deleted[code] = modified_t or undated_t
+                    else:
+                        deleted.pop(code, None)
+                        live[code] = product
+
+                # Watermark inchangé (0) tant que le fichier n'est pas entièrement appliqué
+                frame = to_store_frame(products_to_frame(list(live.values())))
+                store.apply_delta(frame, deleted, 0)
+                report["upserted"] += len(frame)
+
+        store.apply_delta(to_store_frame(products_to_frame([])), {}, file_watermark)
+        report["files"] += 1
+
+    report["deleted"] = store.compact_tombstones()
+    report["watermark"] = store.get_watermark()
+    return report
+
+
+def download_deltas(directory: str, since: int = 0, base_url: str = DELTA_BASE_URL) -> List[str]:
+    """Télécharge les deltas quotidiens OFF postérieurs à `since` (déjà présents: ignorés)"""
+    os.makedirs(directory, exist_ok=True)
+    session = OpenFoodFactsAPI.get_session()
+    timeout = (OpenFoodFactsAPI.CONNECT_TIMEOUT, OpenFoodFactsAPI.READ_TIMEOUT)
+
+    try:
+        response = session.get(f"{base_url}/index.txt", timeout=timeout)
+        response.raise_for_status()
+        names = [name.strip() for name in response.text.splitlines() if name.strip()]
+    except Exception as e:
+        print(f"Erreur index des deltas: {e}")
+        return []
+
+    downloaded = []
+    for name in names:
+        window = delta_window(name)
+        target = os.path.join(directory, name)
+        if window is None or window[1] <= since or os.path.exists(target):
+            continue
+
+        try:
+            with session.get(f"{base_url}/{name}", timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                with open(target + ".part", "wb") as f:
+                    for block in response.iter_content(chunk_size=1 << 20):
+                        f.write(block)
+            os.replace(target + ".part", target)
+            downloaded.append(target)
+        except Exception as e:
+            print(f"Erreur delta {name}: {e}")
+    return downloaded